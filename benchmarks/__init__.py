@@ -0,0 +1,13 @@
+"""
+Benchmarks for bufrpy.
+
+Synthetic messages of several layouts are generated with the tables
+in ``data/bt``, with 1 to 100000 subsets, and decoding and JSON
+conversion of them is timed. Run from the root of the source tree::
+
+    % python -m benchmarks --output results.json
+    % python -m benchmarks --compare results.json
+
+Results are written as JSON with messages/s, values/s and peak memory
+use, as seen by :py:mod:`tracemalloc`, for each case.
+"""
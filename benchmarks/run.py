@@ -0,0 +1,266 @@
+"""
+Benchmark runner.
+
+Times decoding and JSON conversion of synthetic messages and reports
+the results as JSON, so that runs can be compared with each other.
+"""
+
+import bufrpy
+from bufrpy import vector
+from bufrpy.table import libbufr
+from benchmarks import synth
+import argparse
+import codecs
+import datetime
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+FORMAT_VERSION = 1
+
+B_TABLE = "data/bt/B0000000000098013001.TXT"
+D_TABLE = "data/bt/D0000000000098013001.TXT"
+
+#: Numbers of subsets to benchmark each layout with
+SUBSETS = {
+    "synop": [1, 100, 10000, 100000],
+    "synop_compressed": [1, 100, 10000, 100000],
+    "nested": [1, 100, 10000],
+    "nested_compressed": [1, 100, 10000],
+    "operators": [1, 100, 10000],
+    "operators_compressed": [1, 100, 10000],
+}
+
+OPERATIONS = ["decode", "decode_compact", "decode_all", "to_json", "from_json", "to_binary", "from_binary"]
+
+# decode_all is given at least this many subsets, in copies of the messages
+_DECODE_ALL_SUBSETS = 1000
+
+def read_table(root):
+    with codecs.open(os.path.join(root, B_TABLE), 'rb', 'utf-8') as b_file:
+        with codecs.open(os.path.join(root, D_TABLE), 'rb', 'utf-8') as d_file:
+            return libbufr.read_tables(b_file, d_file)
+
+def count_values(messages):
+    """
+    Count decoded values of messages, including values of replications.
+    """
+    def count(values):
+        return sum(count(v) if isinstance(v, list) else 1 for v in values)
+    return sum(count(subset.values) for msg in messages for subset in msg.section4.subsets)
+
+class Case(object):
+    """
+    Messages of one layout and number of subsets, and functions to benchmark on them
+    """
+    def __init__(self, layout, n_subsets, table, seed=0):
+        self.layout = layout
+        self.n_subsets = n_subsets
+        self.table = table
+        self.messages = synth.generate_all(layout, n_subsets, table, seed)
+        self.decoded = [bufrpy.decode(m, table) for m in self.messages]
+        self.n_values = count_values(self.decoded)
+        self._json = None
+        self._binary = None
+
+    def operation(self, name):
+        """
+        Return function to benchmark, the number of messages and values it processes
+        """
+        table = self.table
+        if name == "decode":
+            messages = self.messages
+            return (lambda: [bufrpy.decode(m, table) for m in messages]), len(messages), self.n_values
+        elif name == "decode_compact":
+            messages = self.messages
+            return (lambda: [bufrpy.decode(m, table, compact=True) for m in messages]), len(messages), self.n_values
+        elif name == "decode_all":
+            copies = max(1, _DECODE_ALL_SUBSETS // self.n_subsets)
+            buf = b''.join(self.messages) * copies
+            return (lambda: bufrpy.decode_all(buf, table)), len(self.messages) * copies, self.n_values * copies
+        elif name == "to_json":
+            decoded = self.decoded
+            return (lambda: [bufrpy.to_json(m) for m in decoded]), len(decoded), self.n_values
+        elif name == "from_json":
+            if self._json is None:
+                self._json = [json.loads(json.dumps(bufrpy.to_json(m))) for m in self.decoded]
+            objs = self._json
+            return (lambda: [bufrpy.from_json(o) for o in objs]), len(objs), self.n_values
+        elif name == "to_binary":
+            decoded = self.decoded
+            return (lambda: [bufrpy.to_binary(m) for m in decoded]), len(decoded), self.n_values
+        elif name == "from_binary":
+            if self._binary is None:
+                self._binary = [bufrpy.to_binary(m) for m in self.decoded]
+            datas = self._binary
+            return (lambda: [bufrpy.from_binary(d) for d in datas]), len(datas), self.n_values
+        raise ValueError("Unknown operation: %s" %name)
+
+def measure(func, repeat, min_time):
+    """
+    Time func. Returns the best time of one call and the number of calls made.
+    """
+    best = None
+    calls = 0
+    for _ in range(repeat):
+        n = 0
+        start = time.perf_counter()
+        while True:
+            func()
+            n += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        calls += n
+        best = elapsed / n if best is None else min(best, elapsed / n)
+    return best, calls
+
+def peak_memory(func):
+    """
+    Peak memory allocated by one call of func, in bytes, as seen by tracemalloc
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        func()
+        return tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+
+def environment(root):
+    try:
+        revision = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=root, stderr=subprocess.DEVNULL).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        "bufrpy_version": bufrpy.__version__,
+        "git_revision": revision,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "numpy": vector.numpy.__version__ if vector.numpy is not None else None,
+        "use_numpy": vector.use_numpy,
+        "time": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+
+def run(layouts=None, operations=None, max_subsets=None, repeat=3, min_time=0.2, memory=True, root=".", log=None):
+    """
+    Run benchmarks.
+
+    :param layouts: Names of layouts to run, defaults to all
+    :param operations: Names of operations to run, defaults to all
+    :param int max_subsets: Skip cases with more subsets
+    :param int repeat: Number of timing runs, the best is reported
+    :param float min_time: Minimum duration of one timing run, in seconds
+    :param bool memory: Measure peak memory use
+    :param str root: Directory that contains the data directory
+    :param log: Function called with each result as it completes
+    :return: Benchmark results
+    :rtype: dict
+    """
+    table = read_table(root)
+    results = []
+    for layout in synth.LAYOUTS:
+        if layouts and layout.name not in layouts:
+            continue
+        for n_subsets in SUBSETS[layout.name]:
+            if max_subsets is not None and n_subsets > max_subsets:
+                continue
+            case = Case(layout, n_subsets, table)
+            for name in operations or OPERATIONS:
+                result = {
+                    "layout": layout.name,
+                    "compressed": layout.compressed,
+                    "n_subsets": n_subsets,
+                    "operation": name,
+                    "message_bytes": sum(len(m) for m in case.messages),
+                }
+                try:
+                    func, n_messages, n_values = case.operation(name)
+                    seconds, calls = measure(func, repeat, min_time)
+                    result.update({
+                        "n_messages": n_messages,
+                        "n_values": n_values,
+                        "seconds": seconds,
+                        "calls": calls,
+                        "messages_per_s": n_messages / seconds,
+                        "values_per_s": n_values / seconds,
+                        "peak_memory_bytes": peak_memory(func) if memory else None,
+                    })
+                except Exception as e:
+                    result["error"] = "%s: %s" %(type(e).__name__, e)
+                results.append(result)
+                if log is not None:
+                    log(result)
+    return {"format": FORMAT_VERSION, "environment": environment(root), "results": results}
+
+def _key(result):
+    return (result["layout"], result["n_subsets"], result["operation"])
+
+def compare(baseline, current):
+    """
+    Compare two sets of results.
+
+    :return: List of (layout, n_subsets, operation, baseline seconds, current seconds, speedup) tuples for cases present in both
+    """
+    base = dict((_key(r), r) for r in baseline["results"] if "seconds" in r)
+    rows = []
+    for result in current["results"]:
+        old = base.get(_key(result))
+        if old is None or "seconds" not in result:
+            continue
+        rows.append(_key(result) + (old["seconds"], result["seconds"], old["seconds"] / result["seconds"]))
+    return rows
+
+def format_result(result):
+    if "error" in result:
+        return "%-22s %7d %-14s %s" %(result["layout"], result["n_subsets"], result["operation"], result["error"])
+    memory = result["peak_memory_bytes"]
+    return "%-22s %7d %-14s %10.3f ms %10.1f msg/s %12.0f values/s %10s" %(
+        result["layout"], result["n_subsets"], result["operation"], result["seconds"]*1000,
+        result["messages_per_s"], result["values_per_s"], "%.1f MiB" %(memory / 2.0**20) if memory is not None else "-")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmark bufrpy with synthetic BUFR messages")
+    parser.add_argument("--layout", action="append", choices=[layout.name for layout in synth.LAYOUTS], help="Layout to run, may be repeated, defaults to all")
+    parser.add_argument("--operation", action="append", choices=OPERATIONS, help="Operation to run, may be repeated, defaults to all")
+    parser.add_argument("--max-subsets", type=int, help="Skip cases with more subsets")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timing runs per case, the best is reported")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum duration of a timing run, in seconds")
+    parser.add_argument("--no-memory", action="store_true", help="Do not measure peak memory")
+    parser.add_argument("--quick", action="store_true", help="Same as --max-subsets 100 --repeat 1")
+    parser.add_argument("--output", "-o", help="Write results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare results to an earlier JSON file")
+    parser.add_argument("--root", default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), help="Directory that contains the data directory")
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        args.max_subsets = 100 if args.max_subsets is None else args.max_subsets
+        args.repeat = 1
+
+    results = run(args.layout, args.operation, args.max_subsets, args.repeat, args.min_time, not args.no_memory, args.root,
+                  lambda result: print(format_result(result)))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print()
+        print("%-22s %7s %-14s %12s %12s %8s" %("layout", "subsets", "operation", "baseline ms", "current ms", "speedup"))
+        for layout, n_subsets, operation, old, new, speedup in compare(baseline, results):
+            print("%-22s %7d %-14s %12.3f %12.3f %7.2fx" %(layout, n_subsets, operation, old*1000, new*1000, speedup))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
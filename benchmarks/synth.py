@@ -0,0 +1,216 @@
+"""
+Synthetic BUFR messages for benchmarks.
+
+Messages are generated from descriptors of the tables in ``data/bt``
+by walking the decoding plan of the descriptors like the decoder
+does, building subsets of pseudo-random values instead of reading
+them, and encoded with :func:`bufrpy.bufrenc.encode`. Values are a
+function of the subset, the instruction and the number of times the
+instruction has been visited, so the same layout generates the same
+data whether it is compressed or not.
+"""
+
+from bufrpy.bufrdec import Message, Section1v4, Section3, Section4, FLAG_COMPRESSED, FLAG_OBSERVED, _build_plan
+from bufrpy.bufrenc import encode
+from bufrpy.descriptors import OpCode, ASSOCIATED_FIELD_SIGNIFICANCE, associated_field_descriptor, intern_descriptor
+from bufrpy.plan import ELEMENT, REPLICATE, DELAYED_REPLICATE, OPERATOR, SIGNIFY_CHARACTER, SIGNIFY_LOCAL, REPLICATION
+from bufrpy.util import fxy2int
+from bufrpy.value import BufrValue, BufrSubset, converter
+from collections import namedtuple, defaultdict
+
+#: Largest number of subsets a single message can hold, Section 3 has 16 bits for it
+MAX_SUBSETS = 65535
+
+_SECTION1 = Section1v4(22, 0, 98, 0, 0, 0, 0, 0, 0, 13, 0, 2016, 1, 2, 3, 4, 5)
+
+class Layout(namedtuple("_Layout", ["name", "descriptors", "compressed", "max_count", "fixed_counts"])):
+    """
+    Structure of synthetic messages.
+
+    :ivar str name: Name of the layout
+    :ivar descriptors: FXY strings of the Section 3 descriptors
+    :ivar bool compressed: Whether Section 4 is compressed
+    :ivar int max_count: Largest delayed replication count
+    :ivar bool fixed_counts: Use the same replication counts in all subsets, required for compressed data
+    """
+    __slots__ = ()
+
+def delayed(body, count_descriptor="031001"):
+    """
+    Delayed replication of body.
+
+    :param body: FXY strings of the replicated descriptors
+    :param str count_descriptor: FXY of the replication factor descriptor
+    :return: FXY strings of the replication
+    """
+    if len(body) > 63:
+        raise ValueError("Cannot replicate %d descriptors" %len(body))
+    return ["1%02d000" %len(body), count_descriptor] + list(body)
+
+def nested(depth, count_descriptor="031001"):
+    """
+    Delayed replications nested depth levels deep, two elements at each level.
+    """
+    body = ["012101", "013003"]
+    for level in range(depth-1):
+        body = ["007001", "011001"] + delayed(body, count_descriptor)
+    return delayed(body, count_descriptor)
+
+SYNOP = ["301001", "001015", "301011", "301012", "301021", "007001", "010004", "012101", "011001", "011002", "013003", "020010"]
+
+NESTED = ["301001"] + nested(4) + ["010004"] + nested(2, "031011")
+
+# Operators 201-204 and 207, the ones that can be decoded from compressed data
+OPERATORS = (["301001",
+              "201132", "012101", "201000",
+              "202129", "011002", "202000",
+              "203014", "010004", "203255", "010004",
+              "204007", "031021", "012101", "013003", "204000",
+              "207002", "012101", "207000"])
+# Operators 205, 206 and 208 in addition
+OPERATORS_UNCOMPRESSED = OPERATORS + ["208010", "001015", "208000", "205012", "206012", "012101"]
+
+LAYOUTS = [
+    Layout("synop", SYNOP, False, 0, True),
+    Layout("synop_compressed", SYNOP, True, 0, True),
+    Layout("nested", NESTED, False, 2, False),
+    Layout("nested_compressed", NESTED, True, 2, True),
+    Layout("operators", OPERATORS_UNCOMPRESSED, False, 0, True),
+    Layout("operators_compressed", OPERATORS, True, 0, True),
+]
+
+def layout(name):
+    """
+    Get layout by name.
+    """
+    for candidate in LAYOUTS:
+        if candidate.name == name:
+            return candidate
+    raise KeyError(name)
+
+def _mix(*values):
+    h = 0x345678
+    for value in values:
+        h = ((h ^ value) * 0x9E3779B1 + 0x7F4A7C15) & 0xffffffffffff
+    return h ^ (h >> 17)
+
+class _Generator(object):
+    def __init__(self, program, layout, seed):
+        self.program = program
+        self.layout = layout
+        self.seed = seed
+
+    def raw(self, subset, pc, visit, width, missing=True):
+        # Numeric raw value, with some missing values
+        h = _mix(self.seed, subset, pc, visit)
+        if missing and h % 23 == 0:
+            return (1 << width)-1
+        return (h >> 5) % ((1 << min(width, max(width-3, 2)))-1)
+
+    def text(self, subset, pc, visit, n_chars):
+        h = _mix(self.seed, subset, pc, visit)
+        return bytes(bytearray(65 + (h >> (i % 32)) % 26 for i in range(n_chars)))
+
+    def count(self, subset, pc, visit):
+        if self.layout.fixed_counts:
+            subset = 0
+        return 1 + _mix(self.seed, subset, pc, visit, 1) % self.layout.max_count if self.layout.max_count else 1
+
+    def ref_value(self, pc, width):
+        # New reference value for operator 203, positive and the same for all subsets
+        return _mix(self.seed, pc) % (1 << (width-2))
+
+    def values(self, subset, start, end, operators, overlay, visits):
+        """
+        Values of instructions from start to end, with replications as nested lists.
+        """
+        program = self.program
+        values = []
+        pc = start
+        while pc < end:
+            instruction = program[pc]
+            kind = instruction[0]
+            here = pc
+            pc += 1
+            visit = visits[here]
+            visits[here] += 1
+            if kind == ELEMENT:
+                descriptor = overlay.get(instruction[1].code, instruction[1])
+                op_crf = operators.get(OpCode.CHANGE_REFERENCE_VALUES, None)
+                if op_crf is not None:
+                    ref = self.ref_value(here, op_crf.bits())
+                    overlay[descriptor.code] = intern_descriptor(descriptor.code, descriptor.length, descriptor.scale, ref, descriptor.significance, descriptor.unit)
+                    continue
+                op_aaf = operators.get(OpCode.ADD_ASSOCIATED_FIELD, None)
+                if op_aaf is not None and descriptor.code != ASSOCIATED_FIELD_SIGNIFICANCE:
+                    # Associated fields are never missing, uncompressed ones are not checked for missing values
+                    raw = self.raw(subset, -here, visit, op_aaf.bits(), False)
+                    values.append(BufrValue(raw, raw, associated_field_descriptor(op_aaf.bits())))
+                values.append(self.value(subset, here, visit, descriptor, operators))
+            elif kind == REPLICATE:
+                values.append([self.values(subset, pc, instruction[2], operators, overlay, visits) for _ in range(instruction[1])])
+                pc = instruction[2]
+            elif kind == DELAYED_REPLICATE:
+                body_end, mode = instruction[2], instruction[3]
+                count = self.count(subset, here, visit)
+                if mode == REPLICATION:
+                    values.append([self.values(subset, pc, body_end, operators, overlay, visits) for _ in range(count)])
+                else:
+                    # Body is present once and repeated count times
+                    values.append([self.values(subset, pc, body_end, operators, overlay, visits)] * count)
+                pc = body_end
+            elif kind == OPERATOR:
+                op = instruction[1]
+                if op.neutral():
+                    del operators[op.opcode]
+                else:
+                    operators[op.opcode] = op
+            elif kind == SIGNIFY_CHARACTER or kind == SIGNIFY_LOCAL:
+                values.append(self.value(subset, here, visit, instruction[1], {}))
+        return values
+
+    def value(self, subset, pc, visit, descriptor, operators):
+        conv = converter(descriptor, operators)
+        if descriptor.unit == 'CCITTIA5':
+            return conv(self.text(subset, pc, visit, conv.width // 8))
+        # Missing values of elements with changed width decode differently from compressed data
+        return conv(self.raw(subset, pc, visit, conv.width, conv.width == descriptor.length))
+
+def generate(layout, n_subsets, table, seed=0, first_subset=0):
+    """
+    Generate synthetic BUFR edition 4 message.
+
+    :param Layout layout: Structure of the message
+    :param int n_subsets: Number of subsets, at most :data:`MAX_SUBSETS`
+    :param table: Descriptor table that contains the descriptors of the layout
+    :param int seed: Seed of the values
+    :param int first_subset: Index of the first subset, for splitting data into several messages
+    :return: Encoded message
+    :rtype: bytes
+    """
+    if not 0 < n_subsets <= MAX_SUBSETS:
+        raise ValueError("Invalid number of subsets: %d" %n_subsets)
+    codes = [fxy2int(fxy) for fxy in layout.descriptors]
+    program = _build_plan(tuple(codes), table).instructions
+    generator = _Generator(program, layout, seed)
+
+    subsets = [BufrSubset(generator.values(subset, 0, len(program), {}, {}, defaultdict(int)))
+               for subset in range(first_subset, first_subset + n_subsets)]
+    flags = FLAG_OBSERVED | (FLAG_COMPRESSED if layout.compressed else 0)
+    section3 = Section3(None, n_subsets, flags, [table[code] for code in codes])
+    return encode(Message(None, _SECTION1, None, section3, Section4(None, subsets), None))
+
+def generate_all(layout, n_subsets, table, seed=0):
+    """
+    Generate messages that together hold n_subsets subsets.
+
+    :return: Encoded messages, each with at most :data:`MAX_SUBSETS` subsets
+    :rtype: list of bytes
+    """
+    messages = []
+    start = 0
+    while start < n_subsets:
+        count = min(MAX_SUBSETS, n_subsets - start)
+        messages.append(generate(layout, count, table, seed, start))
+        start += count
+    return messages
@@ -5,13 +5,27 @@ Based on FM 94 BUFR edition 3 as found in WMO306_vl2_BUFR3_Spec_en.pdf
 
 """
 
-from bufrpy.bufrdec import decode, decode_file, decode_all, Section0, Section1v3, Section1v4, Section2, Section3, Section4, Section5, Message
+from bufrpy.bufrdec import decode, decode_file, decode_all, iter_messages, MessageError, Section0, Section1v3, Section1v4, Section2, Section3, Section4, LazySection4, Section5, Message
+
+from bufrpy.binary import from_binary, to_binary
+
+from bufrpy.bufrenc import encode
+
+from bufrpy.cache import MessageCache
+
+from bufrpy.columnar import ColumnarSection4
+
+from bufrpy.compact import CompactSubset
 
 from bufrpy.json import from_json, to_json
 
+from bufrpy.parallel import decode_many, DecodeResult
+
+from bufrpy.stats import DecodeStats
+
 __title__ = 'bufrpy'
 __author__ = 'Tuure Laurinolli / FMI'
 __version__ = "0.2.2"
 __copyright__ = 'Copyright 2013-2016 Finnish Meteorological Institute, Tuure Laurinolli'
 
-__all__ = ["from_json", "to_json", "decode", "decode_file", "decode_all", "Section0", "Section1v3", "Section1v4", "Section2", "Section3", "Section4", "Section5", "Message"]
+__all__ = ["from_json", "to_json", "from_binary", "to_binary", "encode", "decode", "decode_file", "decode_all", "iter_messages", "MessageError", "decode_many", "DecodeResult", "MessageCache", "DecodeStats", "Section0", "Section1v3", "Section1v4", "Section2", "Section3", "Section4", "LazySection4", "Section5", "ColumnarSection4", "CompactSubset", "Message"]
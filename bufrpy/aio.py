@@ -0,0 +1,92 @@
+"""
+Decoding of BUFR messages from asyncio streams.
+
+Messages are framed with the length in Section 0 as data arrives, so
+once the start of a message has been seen, the rest of it is read
+with a single read. Decoding can be done in an executor to keep the
+event loop responsive while large messages are decoded.
+
+Requires Python 3.7 or later, for :py:func:`asyncio.get_running_loop`.
+"""
+
+from bufrpy.bufrdec import _decode_frame, _framing_error
+from bufrpy.framing import Framer, FramingError
+import asyncio
+
+DEFAULT_BLOCK_SIZE = 1 << 16
+
+async def scan_stream(reader, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Scan stream for BUFR messages.
+
+    Yields the same pairs as :func:`bufrpy.framing.scan_file`, pairs
+    of a :class:`.MessageLocation` and the message bytes, or of a
+    :class:`.FramingError` and None. Offsets are relative to the
+    position of the stream when scanning starts.
+
+    :param asyncio.StreamReader reader: Stream to read from
+    :param int block_size: Largest number of bytes to read while searching for the start of a message
+    """
+    framer = Framer()
+    eof = False
+    while True:
+        frame = framer.next(eof)
+        if frame is not None:
+            yield frame
+        elif eof:
+            return
+        else:
+            missing = framer.missing()
+            if missing > 1:
+                # Length of what is needed is known, typically the rest of a message
+                try:
+                    block = await reader.readexactly(missing)
+                except asyncio.IncompleteReadError as e:
+                    block = e.partial
+                    eof = True
+            else:
+                block = await reader.read(block_size)
+                eof = not block
+            framer.feed(block)
+
+async def iter_messages(reader, b_table, columnar=False, lazy=False, executor=None, select=None, predicate=None, compact=False, cache=None, stats=None):
+    """
+    Decode BUFR messages from stream as they arrive.
+
+    Yields a :class:`.Message` for each message that is decoded and a
+    :class:`.MessageError` for each message that fails to decode, like
+    :func:`bufrpy.iter_messages`. Messages rejected by predicate are
+    not yielded.
+
+    Without an executor, messages are decoded in the event loop. With
+    an executor, e.g. a :py:class:`concurrent.futures.ThreadPoolExecutor`,
+    they are decoded in it. The table and the decoded messages must
+    be picklable to use a process pool. True selects the default
+    executor of the event loop. A :class:`.MessageCache` can be used
+    with the event loop and thread pools, but not with process pools.
+
+    :param asyncio.StreamReader reader: Stream to read from
+    :param Mapping|Template b_table: Either a mapping from BUFR descriptor codes to descriptors or a Template describing the message
+    :param bool columnar: Decode Section 4 of the messages into :class:`.ColumnarSection4` objects
+    :param bool lazy: Decode Section 4 of each message only when it is first accessed
+    :param concurrent.futures.Executor executor: Executor to decode messages in
+    :param select: Codes of elements to decode, as integers or FXY strings, all elements if None
+    :param predicate: Function of Section 0, Section 1 and Section 3 that tells whether to decode a message
+    :param bool compact: Decode subsets into :class:`.CompactSubset` objects
+    :param MessageCache cache: Cache to look messages up in and store them in
+    :param DecodeStats stats: Statistics to profile messages into
+    :return: Asynchronous iterator of :class:`.Message` and :class:`.MessageError` objects
+    """
+    loop = asyncio.get_running_loop() if executor is not None else None
+    if executor is True:
+        executor = None
+    async for frame, data in scan_stream(reader):
+        if isinstance(frame, FramingError):
+            yield _framing_error(frame)
+        else:
+            if loop is None:
+                result = _decode_frame(frame, data, b_table, columnar, lazy, select, predicate, compact, cache, stats)
+            else:
+                result = await loop.run_in_executor(executor, _decode_frame, frame, data, b_table, columnar, lazy, select, predicate, compact, cache, stats)
+            if result is not None:
+                yield result
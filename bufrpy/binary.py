@@ -0,0 +1,476 @@
+"""
+Binary serialization of decoded BUFR messages.
+
+:func:`to_binary` stores a decoded message in a compact binary form
+that loads back with :func:`from_binary` considerably faster than
+JSON from :func:`bufrpy.to_json`, and without a descriptor table.
+
+The descriptors of Section 3 and the table of converters of the
+values, with their descriptors, are stored once per message. Raw
+values of all subsets are stored in packed arrays, like those of
+:class:`.CompactSubset`, with replications as ranges of items and
+offset arrays that tell where each subset starts. Textual raw values
+are stored as bytes. The arrays are written in little-endian byte
+order.
+
+A serialized message starts with :data:`MAGIC`, the format version,
+:data:`FORMAT_VERSION`, and the version of the :py:mod:`marshal`
+format, followed by the message in marshal format. CPython does not
+promise to keep the marshal format across Python versions, so only
+data written with the same version of both formats can be read, and
+serialized messages are not suitable for long-term storage. Like
+marshal, :func:`from_binary` is not secure against maliciously
+constructed data. Only load data from trusted sources.
+"""
+
+from bufrpy.bufrdec import Message, Section0, Section1v3, Section1v4, Section2, Section3, Section4, Section5, FLAG_COMPRESSED
+from bufrpy.bufrenc import _next_value, _replications, _raw_value, _update_operators
+from bufrpy.compact import CompactSubset, _SubsetData, _OBJECT, _MAX_RAW
+from bufrpy.descriptors import ElementDescriptor, ReplicationDescriptor, OperatorDescriptor, SequenceDescriptor, StrongSequenceDescriptor, OpCode, ASSOCIATED_FIELD_SIGNIFICANCE, associated_field_descriptor, operators as operator_classes
+from bufrpy.plan import compile_plan, ELEMENT, REPLICATE, DELAYED_REPLICATE, OPERATOR, SIGNIFY_CHARACTER, SIGNIFY_LOCAL, REPETITION
+from bufrpy.value import Converter, converter, TEXT, INT
+from array import array
+import marshal
+import sys
+
+MAGIC = b'BUFRPYMS'
+FORMAT_VERSION = 1
+
+# Tags of descriptor types of Section 3
+_ELEMENT = 0
+_REPLICATION = 1
+_OPERATOR = 2
+_SEQUENCE = 3
+
+_BIG_ENDIAN = sys.byteorder == 'big'
+
+def to_binary(msg):
+    """
+    Serialize a decoded BUFR message into bytes.
+
+    All sections of the message are preserved. Subsets can be
+    :class:`.BufrSubset` or :class:`.CompactSubset` objects, and are
+    stored as raw values and the converters that decode them, so the
+    message reads back without a descriptor table. Raw values that are
+    None are computed from the decoded values, like when encoding.
+
+    :param Message msg: Message to serialize
+    :return: Serialized message
+    :rtype: bytes
+    :raises ValueError: if Section 4 has no subsets, e.g. it was decoded into columns
+    """
+    section4 = msg.section4
+    if not hasattr(section4, 'subsets'):
+        raise ValueError("Can only serialize messages with subsets, not %s" %type(section4).__name__)
+    section3 = msg.section3
+    descriptors = [descriptor.strong() for descriptor in section3.descriptors]
+    compressed = section3.flags is not None and bool(section3.flags & FLAG_COMPRESSED)
+    subsets = _compact_subsets(section4.subsets, descriptors, compressed)
+
+    # Converters and their descriptors, each stored once
+    converter_rows = []
+    converter_indices = {}
+    descriptor_rows = []
+    descriptor_indices = {}
+    def converter_index(conv):
+        index = converter_indices.get(id(conv), None)
+        if index is None:
+            descriptor = tuple(conv.descriptor)
+            d_index = descriptor_indices.get(descriptor, None)
+            if d_index is None:
+                d_index = descriptor_indices[descriptor] = len(descriptor_rows)
+                descriptor_rows.append(descriptor)
+            index = converter_indices[id(conv)] = len(converter_rows)
+            converter_rows.append((d_index, conv.width, conv.missing, conv.factor, conv.ref, conv.kind))
+        return index
+
+    index = array('I')
+    raw = array('Q')
+    items = array('i')
+    starts = array('i')
+    ends = array('i')
+    objects = []
+    value_offsets = array('q', [0])
+    list_offsets = array('q', [0])
+    item_offsets = array('q', [0])
+    object_offsets = array('q', [0])
+    mappings = {}
+    for subset in subsets:
+        converters = subset.converters
+        mapping = mappings.get(id(converters), None)
+        if mapping is None:
+            mapping = mappings[id(converters)] = (converters, [converter_index(conv) for conv in converters])
+        mapping = mapping[1]
+        if mapping == list(range(len(mapping))):
+            index.extend(subset._index)
+        else:
+            index.extend([mapping[i & ~_OBJECT] | (i & _OBJECT) for i in subset._index])
+        raw.extend(subset._raw)
+        value_offsets.append(len(raw))
+        if subset._items is not None:
+            items.extend(subset._items)
+            starts.extend(subset._starts)
+            ends.extend(subset._ends)
+        list_offsets.append(len(starts))
+        item_offsets.append(len(items))
+        if subset._objects is not None:
+            objects.extend([bytes.fromhex(o) if isinstance(o, str) else o for o in subset._objects])
+        object_offsets.append(len(objects))
+
+    arrays = [value_offsets, index, raw, list_offsets, item_offsets, items, starts, ends, object_offsets]
+    if _BIG_ENDIAN:
+        for a in arrays:
+            a.byteswap()
+
+    sections = (_fields(msg.section0),
+                (msg.section1.__class__ is Section1v3, tuple(msg.section1)) if msg.section1 is not None else None,
+                (msg.section2.length, bytes(bytearray(msg.section2.data))) if msg.section2 is not None else None,
+                (section3.length, section3.n_subsets, section3.flags),
+                section4.length,
+                _fields(msg.section5))
+    payload = (sections, tuple(_dump_descriptor(d) for d in descriptors), tuple(descriptor_rows), tuple(converter_rows),
+               tuple(a.tobytes() for a in arrays), tuple(objects))
+    return MAGIC + FORMAT_VERSION.to_bytes(2, 'big') + bytes([marshal.version]) + marshal.dumps(payload, marshal.version)
+
+def from_binary(data):
+    """
+    Load message serialized with :func:`to_binary`.
+
+    The subsets of the message are :class:`.CompactSubset` objects,
+    which decode their values only when they are accessed.
+
+    :param bytes data: Serialized message
+    :return: The message that was serialized
+    :rtype: Message
+    :raises ValueError: if the data is not a serialized message, or was written by another version of the format or of marshal
+    """
+    header = len(MAGIC) + 3
+    if len(data) < header or bytes(data[:len(MAGIC)]) != MAGIC:
+        raise ValueError("Not a serialized BUFR message")
+    version = int.from_bytes(data[len(MAGIC):header-1], 'big')
+    if version != FORMAT_VERSION:
+        raise ValueError("Unsupported format version %d, expected %d" %(version, FORMAT_VERSION))
+    marshal_version = data[header-1]
+    if marshal_version != marshal.version:
+        raise ValueError("Unsupported marshal version %d, expected %d" %(marshal_version, marshal.version))
+    try:
+        return _load(marshal.loads(data[header:]))
+    except (EOFError, TypeError, ValueError, IndexError, KeyError, AttributeError, OverflowError) as e:
+        raise ValueError("Invalid serialized BUFR message: %s" %e)
+
+def _load(payload):
+    sections, descriptor_defs, descriptor_rows, converter_rows, array_data, objects = payload
+
+    if len(array_data) != 9:
+        raise ValueError("Expected 9 arrays, got %d" %len(array_data))
+    arrays = []
+    for typecode, a_data in zip("qIQqqiiiq", array_data):
+        a = array(typecode)
+        a.frombytes(a_data)
+        if _BIG_ENDIAN:
+            a.byteswap()
+        arrays.append(a)
+    value_offsets, index, raw, list_offsets, item_offsets, items, starts, ends, object_offsets = arrays
+    n_subsets = len(value_offsets) - 1
+    if (n_subsets < 0 or len(list_offsets) != n_subsets+1 or len(item_offsets) != n_subsets+1 or len(object_offsets) != n_subsets+1
+        or len(index) != len(raw) or value_offsets[-1] != len(raw) or list_offsets[-1] != len(starts)
+        or len(ends) != len(starts) or item_offsets[-1] != len(items) or object_offsets[-1] != len(objects)):
+        raise ValueError("Inconsistent array lengths")
+
+    element_descriptors = [ElementDescriptor(*row) for row in descriptor_rows]
+    converters = [Converter(element_descriptors[row[0]], *row[1:]) for row in converter_rows]
+    subsets = []
+    for i in range(n_subsets):
+        a, b = value_offsets[i], value_offsets[i+1]
+        l_a, l_b = list_offsets[i], list_offsets[i+1]
+        if l_a == l_b:
+            subset_items = subset_starts = subset_ends = None
+        else:
+            subset_items = items[item_offsets[i]:item_offsets[i+1]]
+            # Starts and ends of lists are relative to the items of the subset
+            subset_starts = starts[l_a:l_b]
+            subset_ends = ends[l_a:l_b]
+        o_a, o_b = object_offsets[i], object_offsets[i+1]
+        subset_objects = list(objects[o_a:o_b]) if o_a != o_b else None
+        subsets.append(CompactSubset(converters, index[a:b], raw[a:b], subset_objects, subset_items, subset_starts, subset_ends))
+
+    section0, section1, section2, section3, section4_length, section5 = sections
+    if section1 is not None:
+        section1 = (Section1v3 if section1[0] else Section1v4)(*section1[1])
+    return Message(Section0(*section0) if section0 is not None else None,
+                   section1,
+                   Section2(*section2) if section2 is not None else None,
+                   Section3(section3[0], section3[1], section3[2], [_load_descriptor(d) for d in descriptor_defs]),
+                   Section4(section4_length, subsets),
+                   Section5(*section5) if section5 is not None else None)
+
+def _fields(section):
+    return tuple(section) if section is not None else None
+
+def _dump_descriptor(descriptor):
+    # Operator objects are created from the operation and operand when loading
+    if isinstance(descriptor, ElementDescriptor):
+        return (_ELEMENT, tuple(descriptor))
+    elif isinstance(descriptor, ReplicationDescriptor):
+        return (_REPLICATION, tuple(descriptor))
+    elif isinstance(descriptor, OperatorDescriptor):
+        return (_OPERATOR, (descriptor.code, descriptor.length, descriptor.operation, descriptor.operand, descriptor.significance))
+    elif isinstance(descriptor, SequenceDescriptor):
+        return (_SEQUENCE, (descriptor.code, descriptor.length, tuple(descriptor.descriptor_codes), descriptor.significance,
+                            tuple(_dump_descriptor(d) for d in descriptor.descriptors)))
+    raise ValueError("Cannot serialize descriptor %r" %(descriptor,))
+
+def _load_descriptor(descriptor_def):
+    kind, fields = descriptor_def
+    if kind == _ELEMENT:
+        return ElementDescriptor(*fields)
+    elif kind == _REPLICATION:
+        return ReplicationDescriptor(*fields)
+    elif kind == _OPERATOR:
+        code, length, operation, operand, significance = fields
+        return OperatorDescriptor(code, length, operation, operand, operator_classes[operation](operand), significance)
+    code, length, codes, significance, descriptors = fields
+    return StrongSequenceDescriptor(code, length, list(codes), significance, tuple(_load_descriptor(d) for d in descriptors))
+
+def _has_operators(descriptors):
+    stack = [descriptors]
+    while stack:
+        for descriptor in stack.pop():
+            if isinstance(descriptor, OperatorDescriptor):
+                return True
+            if isinstance(descriptor, SequenceDescriptor):
+                stack.append(descriptor.descriptors)
+    return False
+
+def _compact_subsets(subsets, descriptors, compressed):
+    """
+    Subsets as :class:`.CompactSubset` objects.
+
+    Without operators, the converter of each value is that of its
+    descriptor. Otherwise the decoding plan is walked to find the
+    operators in effect for each value.
+    """
+    subsets = list(subsets)
+    if all(isinstance(subset, CompactSubset) for subset in subsets):
+        return subsets
+    converters = []
+    indices = {}
+    def index_of(conv):
+        index = indices.get(id(conv), None)
+        if index is None:
+            index = indices[id(conv)] = len(converters)
+            converters.append(conv)
+        return index
+
+    if _has_operators(descriptors):
+        program = compile_plan(descriptors).instructions
+        associated = {}
+        if compressed:
+            associated_converter = lambda width: converter(associated_field_descriptor(width))
+        else:
+            # Associated fields of uncompressed data are never missing
+            def associated_converter(width):
+                conv = associated.get(width, None)
+                if conv is None:
+                    conv = associated[width] = Converter(associated_field_descriptor(width), width, None, 1, 0, INT)
+                return conv
+        compact = lambda values: _walk_subset(program, values, converters, index_of, associated_converter)
+    else:
+        by_descriptor = {}
+        compact = lambda values: _flatten_subset(values, converters, index_of, by_descriptor)
+    return [subset if isinstance(subset, CompactSubset) else compact(subset.values) for subset in subsets]
+
+def _append(data, index, value, conv, operators={}):
+    raw = value.raw_value
+    if raw is None:
+        raw = _raw_value(value, conv.descriptor, operators)[0]
+    elif conv.kind == TEXT and isinstance(raw, str):
+        raw = bytes.fromhex(raw)
+    return data.append(index, raw)
+
+def _flatten_subset(values, converters, index_of, by_descriptor):
+    """
+    Values of a subset without operators, the converter of each value is that of its descriptor.
+
+    Collects the same arrays as :class:`._SubsetData`, in lists that
+    are converted into arrays at the end.
+    """
+    index = []
+    raw = []
+    objects = []
+    items = []
+    starts = []
+    ends = []
+    # Replications being flattened, innermost last. Each frame is
+    # [replications, next replication, tokens of the replications,
+    # enclosing values, enclosing position, enclosing tokens].
+    stack = []
+    tokens = []
+    pos = 0
+    while True:
+        if pos >= len(values):
+            if not stack:
+                break
+            frame = stack[-1]
+            token_lists = frame[2]
+            token_lists.append(tokens)
+            replications = frame[0]
+            n = frame[1]
+            # Repetitions are the same list repeated, stored once
+            while n < len(replications) and replications[n] is values:
+                token_lists.append(tokens)
+                n += 1
+            if n < len(replications):
+                values = replications[n]
+                frame[1] = n + 1
+                tokens = []
+                pos = 0
+                continue
+            stack.pop()
+            values, pos, tokens = frame[3], frame[4], frame[5]
+            aggregation = []
+            previous = None
+            for l in token_lists:
+                if l is not previous:
+                    starts.append(len(items))
+                    items.extend(l)
+                    ends.append(len(items))
+                    previous = l
+                aggregation.append(-len(starts))
+            starts.append(len(items))
+            items.extend(aggregation)
+            ends.append(len(items))
+            tokens.append(-len(starts))
+            continue
+        value = values[pos]
+        pos += 1
+        if value.__class__ is list:
+            if value:
+                stack.append([value, 1, [], values, pos, tokens])
+                values = value[0]
+                pos = 0
+                tokens = []
+            else:
+                starts.append(len(items))
+                ends.append(len(items))
+                tokens.append(-len(starts))
+            continue
+        descriptor = value.descriptor
+        i = by_descriptor.get(id(descriptor), None)
+        if i is None:
+            i = by_descriptor[id(descriptor)] = index_of(converter(descriptor))
+            # Keep the descriptor alive, so that its id is not reused
+            by_descriptor[id(descriptor), None] = descriptor
+        r = value.raw_value
+        tokens.append(len(raw))
+        if r.__class__ is int and 0 <= r <= _MAX_RAW:
+            index.append(i)
+            raw.append(r)
+        else:
+            if r is None:
+                r = _raw_value(value, descriptor, {})[0]
+            elif converters[i].kind == TEXT and isinstance(r, str):
+                r = bytes.fromhex(r)
+            index.append(i | _OBJECT)
+            raw.append(len(objects))
+            objects.append(r)
+
+    if starts:
+        # The subset itself is the last list
+        starts.append(len(items))
+        items.extend(tokens)
+        ends.append(len(items))
+        return CompactSubset(converters, array('I', index), array('Q', raw), objects or None, array('i', items), array('i', starts), array('i', ends))
+    return CompactSubset(converters, array('I', index), array('Q', raw), objects or None, None, None, None)
+
+def _walk_subset(program, values, converters, index_of, associated_converter):
+    """
+    Values of a subset with operators, found by walking the decoding plan like the encoder does.
+
+    Bodies of repetitions are walked once. When a body is repeated
+    zero times, it is walked without values, so that the operators in
+    it still take effect.
+    """
+    data = _SubsetData()
+    operators = {}
+    # Replications being walked, innermost last. Each frame is
+    # [instruction index, replications, next replication, tokens of
+    # the replications, enclosing values, enclosing position,
+    # enclosing end, enclosing tokens, count of repetition or None].
+    stack = []
+    tokens = []
+    pos = 0
+    pc = 0
+    end = len(program)
+    while True:
+        if pc >= end:
+            if values is not None and pos != len(values):
+                raise ValueError("Too many values, %d left over" %(len(values) - pos))
+            if not stack:
+                return data.finish(converters, tokens)
+            frame = stack[-1]
+            frame[3].append(tokens)
+            if frame[2] < len(frame[1]):
+                # Next replication of the body
+                values = frame[1][frame[2]]
+                frame[2] += 1
+                pos = 0
+                pc = frame[0] + 1
+                tokens = []
+                continue
+            stack.pop()
+            pc = end
+            values, pos, end, tokens = frame[4], frame[5], frame[6], frame[7]
+            if values is not None:
+                tokens.append(data.aggregate(frame[3] if frame[8] is None else frame[3][:1] * frame[8]))
+            continue
+        instruction = program[pc]
+        kind = instruction[0]
+        pc += 1
+        if kind == ELEMENT:
+            if OpCode.CHANGE_REFERENCE_VALUES in operators:
+                # New reference value, kept in the descriptors of the values
+                continue
+            op_aaf = operators.get(OpCode.ADD_ASSOCIATED_FIELD, None)
+            if op_aaf is not None and instruction[1].code != ASSOCIATED_FIELD_SIGNIFICANCE:
+                if values is not None:
+                    conv = associated_converter(op_aaf.bits())
+                    tokens.append(_append(data, index_of(conv), _next_value(values, pos), conv))
+                pos += 1
+            if values is not None:
+                value = _next_value(values, pos)
+                conv = converter(value.descriptor if value.descriptor is not None else instruction[1], operators)
+                tokens.append(_append(data, index_of(conv), value, conv, operators))
+            pos += 1
+        elif kind == REPLICATE or kind == DELAYED_REPLICATE:
+            body_end = instruction[2]
+            repeat = None
+            if values is None:
+                # Body of a repetition repeated zero times
+                replications = [None] * (instruction[1] if kind == REPLICATE else 0)
+            elif kind == REPLICATE:
+                replications = _replications(_next_value(values, pos), instruction[1])
+            else:
+                replications = _replications(_next_value(values, pos), None)
+            pos += 1
+            if kind == DELAYED_REPLICATE and instruction[3] == REPETITION:
+                repeat = len(replications)
+                replications = replications[:1] or [None]
+            if replications:
+                stack.append([pc-1, replications, 1, [], values, pos, end, tokens, repeat])
+                values = replications[0]
+                pos = 0
+                end = body_end
+                tokens = []
+            else:
+                if values is not None:
+                    tokens.append(data.aggregate([]))
+                pc = body_end
+        elif kind == OPERATOR:
+            _update_operators(operators, instruction[1])
+        elif kind == SIGNIFY_CHARACTER or kind == SIGNIFY_LOCAL:
+            if values is not None:
+                value = _next_value(values, pos)
+                conv = converter(instruction[1])
+                tokens.append(_append(data, index_of(conv), value, conv))
+            pos += 1
@@ -0,0 +1,176 @@
+"""
+Reading and writing of bit fields of Section 4 data.
+
+Fields are read by converting the bytes that contain them to an
+integer with :py:meth:`int.from_bytes` and shifting and masking the
+result. Reads that start and end on byte boundaries skip the shifting
+and masking. Fields are written by shifting them into an integer that
+is converted to bytes when it grows large.
+"""
+
+# Masks for fields of up to this many bits are precomputed
+_MAX_MASK = 256
+
+MASKS = tuple((1 << n)-1 for n in range(_MAX_MASK+1))
+
+# Number of bits converted to one integer in bulk reads
+_CHUNK_BITS = 512
+
+def mask(n):
+    """
+    Mask of the n lowest bits.
+
+    :param int n: Number of bits
+    :rtype: int
+    """
+    if n <= _MAX_MASK:
+        return MASKS[n]
+    return (1 << n)-1
+
+class BitReader(object):
+    """
+    Reads unsigned integers, bytes and hex strings of arbitrary bit widths from a buffer.
+
+    :ivar data: Buffer to read from, bytes or memoryview
+    :ivar int pos: Current position, in bits
+    :ivar int n_bits: Length of the buffer, in bits
+    """
+    __slots__ = ("data", "pos", "n_bits")
+
+    def __init__(self, data, pos=0):
+        self.data = data
+        self.pos = pos
+        self.n_bits = len(data) * 8
+
+    def _advance(self, n):
+        pos = self.pos
+        end = pos + n
+        if end > self.n_bits:
+            raise IOError("Premature end of stream")
+        self.pos = end
+        return pos, end
+
+    def readuint(self, n):
+        """
+        Read unsigned integer of n bits.
+
+        :param int n: Width of the integer, in bits
+        :rtype: int
+        :raises IOError: if there are fewer than n bits left
+        """
+        pos = self.pos
+        end = pos + n
+        if end > self.n_bits:
+            raise IOError("Premature end of stream")
+        self.pos = end
+        if not (pos | end) & 7:
+            # Byte-aligned
+            return int.from_bytes(self.data[pos >> 3:end >> 3], 'big')
+        value = int.from_bytes(self.data[pos >> 3:(end+7) >> 3], 'big') >> (-end & 7)
+        return value & MASKS[n] if n <= _MAX_MASK else value & ((1 << n)-1)
+
+    def readhex(self, n):
+        """
+        Read n bits as a hex string, with one lower case digit per 4 bits.
+
+        :param int n: Number of bits, a multiple of 4
+        :rtype: str
+        :raises IOError: if there are fewer than n bits left
+        """
+        if n & 3:
+            raise ValueError("Cannot read %d bits as hex, not a multiple of 4" %n)
+        pos, end = self._advance(n)
+        if not (pos | end) & 7 or not n:
+            return self.data[pos >> 3:end >> 3].hex()
+        value = int.from_bytes(self.data[pos >> 3:(end+7) >> 3], 'big') >> (-end & 7)
+        return "%0*x" %(n >> 2, value & mask(n))
+
+    def readbytes(self, n):
+        """
+        Read n bits as bytes.
+
+        :param int n: Number of bits, a multiple of 8
+        :rtype: bytes
+        :raises IOError: if there are fewer than n bits left
+        """
+        if n & 7:
+            raise ValueError("Cannot read %d bits as bytes, not a multiple of 8" %n)
+        pos, end = self._advance(n)
+        if not pos & 7:
+            return bytes(self.data[pos >> 3:end >> 3])
+        value = int.from_bytes(self.data[pos >> 3:(end+7) >> 3], 'big') >> (-end & 7)
+        return (value & mask(n)).to_bytes(n >> 3, 'big')
+
+    def readuints(self, width, count):
+        """
+        Read count consecutive unsigned integers of width bits each.
+
+        :param int width: Width of each integer, in bits
+        :param int count: Number of integers
+        :rtype: list of int
+        :raises IOError: if there are fewer than width*count bits left
+        """
+        pos, end = self._advance(width*count)
+        if width == 0:
+            return [0] * count
+        data = self.data
+        m = mask(width)
+        per_chunk = max(1, _CHUNK_BITS // width)
+        result = []
+        while pos < end:
+            stop = min(pos + per_chunk*width, end)
+            chunk = int.from_bytes(data[pos >> 3:(stop+7) >> 3], 'big') >> (-stop & 7)
+            result.extend([(chunk >> shift) & m for shift in range(stop-pos-width, -1, -width)])
+            pos = stop
+        return result
+
+    def skip(self, n):
+        """
+        Skip n bits.
+
+        :param int n: Number of bits to skip
+        :raises IOError: if there are fewer than n bits left
+        """
+        self._advance(n)
+
+# Number of bits collected before they are converted to bytes
+_FLUSH_BITS = 4096
+
+class BitWriter(object):
+    """
+    Writes unsigned integers of arbitrary bit widths into bytes.
+
+    :ivar int n_bits: Number of bits written
+    """
+    __slots__ = ("_buf", "_acc", "_acc_bits", "n_bits")
+
+    def __init__(self):
+        self._buf = bytearray()
+        self._acc = 0
+        self._acc_bits = 0
+        self.n_bits = 0
+
+    def write(self, value, n):
+        """
+        Write unsigned integer of n bits.
+
+        :param int value: Value to write, less than 2**n
+        :param int n: Width of the integer, in bits
+        """
+        self._acc = (self._acc << n) | value
+        self._acc_bits += n
+        self.n_bits += n
+        if self._acc_bits >= _FLUSH_BITS:
+            rest = self._acc_bits & 7
+            self._buf += (self._acc >> rest).to_bytes(self._acc_bits >> 3, 'big')
+            self._acc &= MASKS[rest]
+            self._acc_bits = rest
+
+    def getvalue(self):
+        """
+        Get written bits, padded with zero bits to whole bytes.
+
+        :rtype: bytes
+        """
+        pad = -self._acc_bits & 7
+        return bytes(self._buf) + (self._acc << pad).to_bytes((self._acc_bits + pad) >> 3, 'big')
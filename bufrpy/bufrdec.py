@@ -1,12 +1,20 @@
 from __future__ import print_function
 
-from bufrpy.util import ByteStream, ReadableStream, int2fxy, fxy2int
-from bufrpy.descriptors import ElementDescriptor, OperatorDescriptor, ReplicationDescriptor, SequenceDescriptor, OpCode
+from bufrpy.util import ByteStream, ReadableStream, ReadableBuffer, BUFFER_TYPES, int2fxy
+from bufrpy.descriptors import OpCode, ASSOCIATED_FIELD_SIGNIFICANCE, associated_field_descriptor, intern_descriptor
 from bufrpy.template import Template
-from bufrpy.value import _decode_raw_value, _calculate_read_length, BufrSubset, BufrValue
+from bufrpy.value import converter, Converter, _calculate_read_length, BufrSubset, BufrValue, TEXT, INT
+from bufrpy.framing import scan_buffer, scan_file, open_buffer, FramingError, MessageLocation
+from bufrpy import vector
+from bufrpy.bits import BitReader, mask
+from bufrpy.columnar import ColumnBuilder, ColumnarSection4
+from bufrpy.compact import CompactBuilder
+from bufrpy.plan import compile_plan, compile_selection, plan_cache, ELEMENT, REPLICATE, DELAYED_REPLICATE, OPERATOR, SIGNIFY_CHARACTER, SIGNIFY_LOCAL, REPLICATION, REPETITION
 import itertools
 from collections import namedtuple, defaultdict
+import mmap
 import re
+import traceback
 
 FLAG_COMPRESSED=64
 FLAG_OBSERVED=128
@@ -105,6 +113,81 @@ class Section4(namedtuple("_Section4", ["length", "subsets"])):
     __slots__ = ()
 
 
+class LazySection4(object):
+    """
+    Undecoded Section 4 of a BUFR message.
+
+    Holds a copy of the raw Section 4 and decodes it on first use. The
+    decoded section is cached, so decoding happens at most once.
+    Attribute access and comparisons are forwarded to the decoded
+    section. Decoding errors are raised when the section is first
+    used.
+
+    :ivar int length: Length of Section 4
+    :ivar bytes data: Section 4, including its 4-byte header
+    """
+    __slots__ = ("length", "data", "_descriptors", "_n_subsets", "_compressed", "_plan", "_columnar", "_select", "_compact", "_section4")
+
+    def __init__(self, data, descriptors, n_subsets, compressed, plan, columnar, select=None, compact=False):
+        self.length = len(data)
+        self.data = data
+        self._descriptors = descriptors
+        self._n_subsets = n_subsets
+        self._compressed = compressed
+        self._plan = plan
+        self._columnar = columnar
+        self._select = select
+        self._compact = compact
+        self._section4 = None
+
+    @property
+    def decoded(self):
+        """
+        True if the section has already been decoded
+        """
+        return self._section4 is not None
+
+    def decode(self):
+        """
+        Decode the section, or return the cached result of an earlier decoding.
+
+        :return: Decoded section
+        :rtype: Section4|ColumnarSection4
+        """
+        if self._section4 is None:
+            self._section4 = decode_section4(ReadableBuffer(self.data), self._descriptors, self._n_subsets, self._compressed, self._plan, self._columnar, self._select, self._compact)
+        return self._section4
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.decode(), name)
+
+    def __getitem__(self, index):
+        return self.decode()[index]
+
+    def __iter__(self):
+        return iter(self.decode())
+
+    def __len__(self):
+        return len(self.decode())
+
+    def __eq__(self, other):
+        if isinstance(other, LazySection4):
+            other = other.decode()
+        return self.decode() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        if self._section4 is not None:
+            return repr(self._section4)
+        return "LazySection4(length=%d)" %self.length
+
+
 class Section5(namedtuple("_Section5", ["data"])):
     """
     Section 5 of a BUFR message.
@@ -122,11 +205,18 @@ class Message(namedtuple("_Message", ["section0", "section1", "section2", "secti
     :ivar Section1v3|Section1v4 section1: Section 1, time and source metadata
     :ivar Section2 section2: Section 2, optional metadata, not processed
     :ivar Section3 section3: Section 3, message structure
-    :ivar Section4 section4: Section 4, message contents
+    :ivar Section4|ColumnarSection4 section4: Section 4, message contents, decoded on first access if the message was decoded lazily
     :ivar Section5 section5: Section 5, end token
     """
     __slots__ = ()
 
+    @property
+    def section4(self):
+        section4 = tuple.__getitem__(self, 4)
+        if isinstance(section4, LazySection4):
+            return section4.decode()
+        return section4
+
 def decode_section0(stream):
     """
     Decode Section 0 of a BUFR message into :class:`.Section0` object.
@@ -217,7 +307,7 @@ def decode_section2(stream):
     data = list(stream.readbytes(length-3))
     return Section2(length, data)
 
-def _decode_descriptors_table(length, stream, descriptor_table):
+def _read_descriptor_codes(length, stream):
     # length is remaining length of descriptor field in bytes
     n_read = 0
     codes = []
@@ -225,31 +315,21 @@ def _decode_descriptors_table(length, stream, descriptor_table):
         codes.append(stream.readint(2))
         n_read += 2
 
+    # read final byte, since length of the section should be even and
+    # descriptors start at odd offset
+    stream.readbytes(length-n_read)
+    return tuple(codes)
+
+def _decode_descriptors_table(codes, descriptor_table):
     descriptors = []
     for code in codes:
         try:
             descriptors.append(descriptor_table[code])
         except KeyError as e:
             raise KeyError("Missing definition for descriptor " + int2fxy(code))
-
-    # read final byte, since length of the section should be even and
-    # descriptors start at odd offset
-    stream.readbytes(length-n_read)
     return descriptors
 
-def _decode_descriptors_template(length, stream, descriptor_template):
-    # length is remaining length of descriptor field in bytes
-    n_read = 0
-    codes = []
-    while n_read + 2 <= length:
-        code = stream.readint(2)
-        codes.append(code)
-        n_read += 2
-
-    # read final byte, since length of the section should be even and
-    # descriptors start at odd offset
-    stream.readbytes(length-n_read)
-
+def _decode_descriptors_template(codes, descriptor_template):
     # check descriptor codes
     if len(codes) == len(descriptor_template.descriptors):
         for i, (code, descriptor) in enumerate(zip(codes, descriptor_template.descriptors)):
@@ -259,30 +339,38 @@ def _decode_descriptors_template(length, stream, descriptor_template):
 
     raise ValueError("Invalid template, length does not match message: template: %d, message: %d" %(len(descriptor_template.descriptors), len(codes)))
 
-def decode_section3(stream, descriptor_table):
-    """
-    Decode Section 3, the descriptor section, of a BUFR message into a :class:`.Section3` object.
+def _build_plan(codes, descriptor_table):
+    if isinstance(descriptor_table, Template):
+        descriptors = _decode_descriptors_template(codes, descriptor_table)
+    else:
+        descriptors = _decode_descriptors_table(codes, descriptor_table)
 
-    If descriptor_table is a Template, it must match the structure of the message.
+    # Strongify the descriptors, lazy sequence descriptors would be difficult to handle otherwise
+    return compile_plan(descriptor.strong() for descriptor in descriptors)
 
-    :param ReadableStream stream: BUFR message, starting at section 3
-    :param Mapping|Template descriptor_table: either a mapping from BUFR descriptor codes to descriptors or a Template describing the message
-    """
+def _decode_section3(stream, descriptor_table):
+    # Decode Section 3 and return it with the decoding plan of its descriptors
     length = stream.readint(3)
     reserved = stream.readint(1)
     n_subsets = stream.readint(2)
     flags = stream.readint(1)
     # 7 bytes of headers so far
 
-    if isinstance(descriptor_table, Template):
-        descriptors = _decode_descriptors_template(length-7, stream, descriptor_table)
-    else:
-        descriptors = _decode_descriptors_table(length-7, stream, descriptor_table)
+    codes = _read_descriptor_codes(length-7, stream)
+    plan = plan_cache.get(codes, descriptor_table, lambda: _build_plan(codes, descriptor_table))
 
-    # Strongify the descriptors, lazy sequence descriptors would be difficult to handle otherwise
-    descriptors = [descriptor.strong() for descriptor in descriptors]
+    return Section3(length, n_subsets, flags, list(plan.descriptors)), plan
 
-    return Section3(length, n_subsets, flags, descriptors)
+def decode_section3(stream, descriptor_table):
+    """
+    Decode Section 3, the descriptor section, of a BUFR message into a :class:`.Section3` object.
+
+    If descriptor_table is a Template, it must match the structure of the message.
+
+    :param ReadableStream stream: BUFR message, starting at section 3
+    :param Mapping|Template descriptor_table: either a mapping from BUFR descriptor codes to descriptors or a Template describing the message
+    """
+    return _decode_section3(stream, descriptor_table)[0]
 
 
 def skip_section4(stream):
@@ -291,141 +379,304 @@ def skip_section4(stream):
     :return: None
     """
 
-    from bitstring import ConstBitStream, Bits
     length = stream.readint(3)
     pad = stream.readint(1)
-    data = stream.readbytes(length-4)
+    stream.skip(length-4)
     return
 
-def decode_section4(stream, descriptors, n_subsets=1, compressed=False):
+def read_section4(stream, descriptors, n_subsets=1, compressed=False, plan=None, columnar=False, select=None, compact=False):
+    """
+    Read Section 4 of a BUFR message into a :class:`.LazySection4` object, without decoding it.
+
+    The parameters are the same as those of :func:`decode_section4`,
+    which is called with them when the section is first used.
+
+    :param ReadableStream stream: BUFR message, starting at section 4
+    :return: Undecoded Section 4
+    :rtype: LazySection4
+    """
+    length = stream.readint(3)
+    if length < 4:
+        raise ValueError("Invalid Section 4 length: %d" %length)
+    # Copy the data, so that the message does not keep the source buffer alive
+    data = length.to_bytes(3, 'big') + bytes(stream.readview(length-3))
+    if plan is None:
+        plan = compile_plan(descriptors)
+    return LazySection4(data, descriptors, n_subsets, compressed, plan, columnar, select, compact)
+
+def decode_section4(stream, descriptors, n_subsets=1, compressed=False, plan=None, columnar=False, select=None, compact=False, stats=None):
     """
     Decode Section 4, the data section, of a BUFR message into a :class:`.Section4` object.
 
+    With columnar, the data is decoded into a
+    :class:`.ColumnarSection4` object instead. With compact, the
+    subsets are :class:`.CompactSubset` objects instead of
+    :class:`.BufrSubset` objects.
+
+    With select, only values of elements whose codes are selected are
+    decoded, see :func:`bufrpy.plan.compile_selection`. Other elements
+    are skipped over by their width, or in compressed data by the
+    width of the values of all subsets. Values of skipped elements are
+    left out of the subsets, as are replications that contain no
+    selected elements. Delayed replication counts and operators are
+    still read, as the layout of the data depends on them. In columnar
+    output, the counts of delayed replications that contain selected
+    elements are kept.
+
+    With stats, the bits read, replication counts and operator
+    activations are added to them. Values are counted by the caller,
+    see :meth:`.DecodeStats.count_values`.
+
     :param ReadableStream stream: BUFR message, starting at section 4
     :param descriptors: List of descriptors specifying message structure
     :param int n_subsets: Number of data subsets, from section 3
     :param bool compressed: Whether message data is compressed or not, from section 3
+    :param DecodePlan plan: Compiled plan of descriptors, compiled from descriptors if not given
+    :param bool columnar: Decode into columns instead of subsets
+    :param select: Codes of elements to decode, as integers or FXY strings, all elements if None
+    :param bool compact: Store values of subsets in arrays
+    :param DecodeStats stats: Statistics to add to, or None
+    :raises ValueError: if both columnar and compact are given
     :raises NotImplementedError: if the message contains operator descriptors
     :raises NotImplementedError: if the message contains sequence descriptors
     """
 
-    REPLICATION_DESCRIPTORS = set([fxy2int("031000"), fxy2int("031001"), fxy2int("031002")])
-    REPETITION_DESCRIPTORS = set([fxy2int("031011"), fxy2int("031012")])
-
-    from bitstring import ConstBitStream, Bits
     length = stream.readint(3)
     pad = stream.readint(1)
-    data = stream.readbytes(length-4)
-    bits = ConstBitStream(bytes=data)
-
-
-    def decode(bits, descriptors, operators, descriptor_overlay):
+    data = stream.readview(length-4)
+    bits = BitReader(data)
+
+    if plan is None:
+        plan = compile_plan(descriptors)
+    program = plan.instructions
+    selected = compile_selection(plan, select) if select is not None else None
+
+    def read_value(bits, descriptor, operators):
+        conv = converter(descriptor, operators)
+        if conv.kind == TEXT:
+            return conv(bits.readbytes(conv.width))
+        else:
+            return conv(bits.readuint(conv.width))
+
+    # Converters of elements of uncompressed data for the operators in
+    # effect, emptied when operators change
+    element_converters = {}
+
+    def read_element(bits, descriptor, operators):
+        conv = element_converters.get(descriptor, None)
+        if conv is None:
+            conv = element_converters[descriptor] = converter(descriptor, operators)
+        if conv.kind == TEXT:
+            raw_value = bits.readbytes(conv.width)
+        else:
+            raw_value = bits.readuint(conv.width)
+        if builder is None:
+            return conv(raw_value)
+        return builder.value(conv, raw_value)
+
+    # Converters of associated fields of uncompressed data by width.
+    # These are never missing, the raw value is the value.
+    associated_converters = {}
+
+    def associated_converter(descriptor):
+        conv = associated_converters.get(descriptor.length, None)
+        if conv is None:
+            conv = associated_converters[descriptor.length] = Converter(descriptor, descriptor.length, None, 1, 0, INT)
+        return conv
+
+    def decode_subset(bits):
+        element_converters.clear()
+        return decode(bits, 0, len(program), {}, {})
+
+    def decode(bits, start, end, operators, descriptor_overlay):
         """
         :param bits: Bit stream to decode from
-        :param descriptors: Descriptor iterator
+        :param int start: Index of first instruction to execute
+        :param int end: Index after last instruction to execute
         :param dict operators: Operators in effect, indexed by opcode
         :param dict descriptor_overlay: Overlay descriptors affected by CHANGE_REFERENCE_VALUES operator
         """
         values = []
-        for descriptor in descriptors:
-            descriptor = descriptor_overlay.get(descriptor.code, descriptor)
-            if isinstance(descriptor, ElementDescriptor):
+        # Replications being decoded, innermost last. Each frame is
+        # [instruction index, body decodings left, aggregation,
+        # enclosing values, enclosing end, repetition count or None,
+        # column mark], and the frame is reused for all decodings of
+        # the body, so replications do not recurse.
+        stack = []
+        pc = start
+        while True:
+            if pc >= end:
+                if not stack:
+                    return values
+                # End of replication body
+                frame = stack[-1]
+                frame[2].append(values)
+                frame[1] -= 1
+                if frame[1] > 0:
+                    values = []
+                    pc = frame[0] + 1
+                    continue
+                stack.pop()
+                rep_pc, _, aggregation, outer_values, outer_end, repeat, mark = frame
+                if repeat is not None:
+                    # Repeated replication, X elements present once in the file, output <element value> times
+                    aggregation = [values for _ in range(repeat)]
+                    if columns is not None:
+                        columns.repeat(mark, rep_pc+1, end, repeat)
+                values = outer_values
+                pc = end
+                end = outer_end
+                if columns is None and (selected is None or selected[rep_pc]):
+                    values.append(aggregation if builder is None else builder.aggregate(aggregation))
+                continue
+            instruction = program[pc]
+            kind = instruction[0]
+            pc += 1
+            if kind == ELEMENT:
+                descriptor = instruction[1]
+                descriptor = descriptor_overlay.get(descriptor.code, descriptor)
                 op_crf = operators.get(OpCode.CHANGE_REFERENCE_VALUES, None)
                 if op_crf is not None:
-                    ref_value = Bits._readuint(bits, op_crf.bits(), bits.pos)
-                    bits.pos += op_crf.bits()
+                    ref_value = bits.readuint(op_crf.bits())
                     top_bit_mask = (1 << op_crf.bits()-1)
                     if ref_value & top_bit_mask:
                         ref_value = -(ref_value & ~top_bit_mask)
-                    overlay_descriptor = ElementDescriptor(descriptor.code, descriptor.length, descriptor.scale, ref_value, descriptor.significance, descriptor.unit)
+                    overlay_descriptor = intern_descriptor(descriptor.code, descriptor.length, descriptor.scale, ref_value, descriptor.significance, descriptor.unit)
                     descriptor_overlay[descriptor.code] = overlay_descriptor
                     continue
-                
+
                 op_aaf = operators.get(OpCode.ADD_ASSOCIATED_FIELD, None)
-                if op_aaf is not None and descriptor.code != fxy2int("031021"):
+                if selected is not None and not selected[pc-1]:
+                    width = _calculate_read_length(descriptor, operators)
+                    if op_aaf is not None and descriptor.code != ASSOCIATED_FIELD_SIGNIFICANCE:
+                        width += op_aaf.bits()
+                    bits.skip(width)
+                    continue
+
+                if op_aaf is not None and descriptor.code != ASSOCIATED_FIELD_SIGNIFICANCE:
                     # Don't apply to ASSOCIATED FIELD SIGNIFICANCE
-                    associated_value = Bits._readuint(bits, op_aaf.bits(), bits.pos)
-                    bits.pos += op_aaf.bits()
+                    associated_value = bits.readuint(op_aaf.bits())
                     # Use dummy descriptor 999999 for associated field, like Geo::BUFR and libbufr
-                    dummy_descriptor = ElementDescriptor(fxy2int("999999"), op_aaf.bits(), 0, 0, "ASSOCIATED FIELD", "NUMERIC")
-                    values.append(BufrValue(associated_value, associated_value, dummy_descriptor))
+                    dummy_descriptor = associated_field_descriptor(op_aaf.bits())
+                    if builder is not None:
+                        values.append(builder.value(associated_converter(dummy_descriptor), associated_value))
+                    elif columns is None:
+                        values.append(BufrValue(associated_value, associated_value, dummy_descriptor))
+                    else:
+                        columns.append(pc-1, BufrValue(associated_value, associated_value, dummy_descriptor), True)
 
-                read_length = _calculate_read_length(descriptor, operators)
-                if descriptor.unit == 'CCITTIA5':
-                    raw_value = Bits._readhex(bits, read_length, bits.pos)
+                if columns is None:
+                    values.append(read_element(bits, descriptor, operators))
                 else:
-                    raw_value = Bits._readuint(bits, read_length, bits.pos)
-                bits.pos += read_length
-                values.append(_decode_raw_value(raw_value, descriptor, operators))
-            elif isinstance(descriptor, ReplicationDescriptor):
-                aggregation = []
-                if descriptor.count:
-                    bval = None
-                    count = descriptor.count
+                    columns.append(pc-1, read_element(bits, descriptor, operators))
+            elif kind == REPLICATE or kind == DELAYED_REPLICATE:
+                body_end = instruction[2]
+                repeat = None
+                if kind == REPLICATE:
+                    # Regular replication, X elements repeated Y times in the file
+                    count = instruction[1]
                 else:
-                    bval = decode(bits, itertools.islice(descriptors, 1), {}, {})[0]
+                    bval = read_value(bits, instruction[1], {})
                     count = bval.value
-                n_fields = descriptor.fields
-                field_descriptors = list(itertools.islice(descriptors, n_fields))
-                if bval is None or bval.descriptor.code in REPLICATION_DESCRIPTORS:
-                    # Regular replication, X elements repeated Y or <element value> times in the file
-                    for _ in range(count):
-                        aggregation.append(decode(bits, iter(field_descriptors), operators, descriptor_overlay))
-                elif bval.descriptor.code in REPETITION_DESCRIPTORS:
-                    # Repeated replication, X elements present once in the file, output <element value> times
-                    repeated_values = decode(bits, iter(field_descriptors), operators, descriptor_overlay)
-                    for _ in range(count):
-                        aggregation.append(repeated_values)
+                    if columns is not None and (selected is None or selected[pc-1]):
+                        columns.append(pc-1, bval)
+                    if instruction[3] == REPETITION:
+                        # Body is decoded once and repeated when it ends
+                        repeat = count
+                        count = 1
+                    elif instruction[3] != REPLICATION:
+                        raise ValueError("Unexpected delayed replication element %s" %(bval,))
+                if stats is not None:
+                    stats.replications[count if repeat is None else repeat] += 1
+                if count > 0:
+                    mark = columns.mark() if columns is not None and repeat is not None else None
+                    stack.append([pc-1, count, [], values, end, repeat, mark])
+                    values = []
+                    end = body_end
                 else:
-                    raise ValueError("Unexpected delayed replication element %s" %bval)
-                values.append(aggregation)
-            elif isinstance(descriptor, OperatorDescriptor):
-                op = descriptor.operator
-                if op.immediate:
-                    if op.opcode == OpCode.SIGNIFY_CHARACTER:
-                        raw_value = Bits._readhex(bits, op.bits(), bits.pos)
-                        bits.pos += op.bits()
-                        char_descriptor = ElementDescriptor(fxy2int(op.code), op.bits(), 0, 0, "CHARACTER INFORMATION", "CCITTIA5")
-                        value = _decode_raw_value(raw_value, char_descriptor, {})
-                        values.append(value)
-                    elif op.opcode == OpCode.SIGNIFY_LOCAL_DESCRIPTOR:
-                        base_descriptor = itertools.islice(descriptors, 1)[0]
-                        mod_descriptor = ElementDescriptor(base_descriptor.code, op.bits(), base_descriptor.scale, base_descriptor.ref, base_descriptor.significance, base_descriptor.unit)
-                        values.add(decode(bits, descriptors, {}, {})[0].value)
-                        
-                    else:
-                        raise NotImplementedError("Unknown immediate operator: %s" % str(descriptor))
+                    if columns is None and (selected is None or selected[pc-1]):
+                        values.append([] if builder is None else builder.aggregate([]))
+                    pc = body_end
+            elif kind == OPERATOR:
+                op = instruction[1]
+                element_converters.clear()
+                if op.neutral():
+                    del operators[op.opcode]
                 else:
-                    if op.neutral():
-                        del operators[op.opcode]
-                    else:
-                        op.check_conflict(operators)
-                        operators[op.opcode] = op
-            elif isinstance(descriptor, SequenceDescriptor):
-                seq = decode(bits, iter(descriptor.descriptors), operators, descriptor_overlay)
-                values.extend(seq)
-            else:
-                raise NotImplementedError("Unknown descriptor type: %s" % descriptor)
-        return values
+                    op.check_conflict(operators)
+                    operators[op.opcode] = op
+                    if stats is not None:
+                        stats.operators[op.opcode] += 1
+            elif kind == SIGNIFY_CHARACTER or kind == SIGNIFY_LOCAL:
+                if stats is not None:
+                    stats.operators[OpCode.SIGNIFY_CHARACTER if kind == SIGNIFY_CHARACTER else OpCode.SIGNIFY_DATA_WIDTH] += 1
+                if selected is not None and not selected[pc-1]:
+                    bits.skip(_calculate_read_length(instruction[1], {}))
+                elif builder is not None:
+                    conv = converter(instruction[1], {})
+                    values.append(builder.value(conv, bits.readbytes(conv.width) if conv.kind == TEXT else bits.readuint(conv.width)))
+                elif columns is None:
+                    values.append(read_value(bits, instruction[1], {}))
+                else:
+                    columns.append(pc-1, read_value(bits, instruction[1], {}))
 
-    def decode_compressed(bits, descriptors, n_subsets, operators, descriptor_overlay):
+    def decode_compressed(bits, start, end, n_subsets, operators, descriptor_overlay):
         """
         :param bits: Bit stream to decode from
-        :param descriptors: Descriptor iterator
+        :param int start: Index of first instruction to execute
+        :param int end: Index after last instruction to execute
         :param n_subsets: Number of subsets to decode
         :param dict operators: Operators in effect, indexed by opcode
         :param dict descriptor_overlay: Overlay descriptors affected by CHANGE_REFERENCE_VALUES operator
         """
-        subsets = [[] for x in range(n_subsets)]
-        for descriptor in descriptors:
-            descriptor = descriptor_overlay.get(descriptor.code, descriptor)
-
-            if isinstance(descriptor, ElementDescriptor):
+        subsets = [[] for x in range(n_subsets)] if columns is None else None
+        # Replications being decoded, like in decode, with lists of
+        # aggregations, one per subset, and enclosing subsets
+        stack = []
+        pc = start
+        while True:
+            if pc >= end:
+                if not stack:
+                    return subsets
+                # End of replication body
+                frame = stack[-1]
+                if columns is None:
+                    for aggregation, subset in zip(frame[2], subsets):
+                        aggregation.append(subset)
+                frame[1] -= 1
+                if frame[1] > 0:
+                    subsets = [[] for x in range(n_subsets)] if columns is None else None
+                    pc = frame[0] + 1
+                    continue
+                stack.pop()
+                rep_pc, _, aggregations, outer_subsets, outer_end, repeat, mark = frame
+                if repeat is not None:
+                    # Repeated replication, X elements present once in the file, output <element value> times
+                    if columns is not None:
+                        columns.repeat(mark, rep_pc+1, end, repeat)
+                    else:
+                        aggregations = [[subset for _ in range(repeat)] for subset in subsets]
+                subsets = outer_subsets
+                pc = end
+                end = outer_end
+                if selected is None or selected[rep_pc]:
+                    if builder is not None:
+                        for subset_idx in range(n_subsets):
+                            subsets[subset_idx].append(builder.aggregate_subset(subset_idx, aggregations[subset_idx]))
+                    elif columns is None:
+                        for subset_idx in range(n_subsets):
+                            subsets[subset_idx].append(aggregations[subset_idx])
+                continue
+            instruction = program[pc]
+            kind = instruction[0]
+            pc += 1
+            if kind == ELEMENT:
+                descriptor = instruction[1]
+                descriptor = descriptor_overlay.get(descriptor.code, descriptor)
                 op_crf = operators.get(OpCode.CHANGE_REFERENCE_VALUES, None)
                 if op_crf is not None:
-                    dummy_descriptors = iter([ElementDescriptor(fxy2int("999999"), op_crf.bits(), 0, 0, "ASSOCIATED FIELD", "NUMERIC")])
-                    _subsets = decode_compressed(bits, dummy_descriptors, n_subsets, {}, {})
-                    raw_vals = [subset[0].raw_value for subset in _subsets]
+                    dummy_descriptor = associated_field_descriptor(op_crf.bits())
+                    raw_vals = [value.raw_value for value in decode_compressed_value(bits, dummy_descriptor, n_subsets, {})]
 
                     if len(set(raw_vals)) != 1:
                         raise ValueError("Encountered different reference values for different subsets: %s", raw_vals)
@@ -435,99 +686,174 @@ def decode_section4(stream, descriptors, n_subsets=1, compressed=False):
                     if ref_value & top_bit_mask:
                         ref_value = -(ref_value & ~top_bit_mask)
 
-                    overlay_descriptor = ElementDescriptor(descriptor.code, descriptor.length, descriptor.scale, ref_value, descriptor.significance, descriptor.unit)
+                    overlay_descriptor = intern_descriptor(descriptor.code, descriptor.length, descriptor.scale, ref_value, descriptor.significance, descriptor.unit)
                     descriptor_overlay[descriptor.code] = overlay_descriptor
                     continue
 
                 op_aaf = operators.get(OpCode.ADD_ASSOCIATED_FIELD, None)
-                if op_aaf is not None and descriptor.code != fxy2int("031021"):
+                if selected is not None and not selected[pc-1]:
+                    if op_aaf is not None and descriptor.code != ASSOCIATED_FIELD_SIGNIFICANCE:
+                        skip_compressed_value(bits, associated_field_descriptor(op_aaf.bits()), n_subsets, {})
+                    skip_compressed_value(bits, descriptor, n_subsets, operators)
+                    continue
+
+                if op_aaf is not None and descriptor.code != ASSOCIATED_FIELD_SIGNIFICANCE:
                     # Don't apply to ASSOCIATED FIELD SIGNIFICANCE
                     # Use dummy descriptor 999999 for associated field, like Geo::BUFR and libbufr
-                    dummy_descriptors = iter([ElementDescriptor(fxy2int("999999"), op_aaf.bits(), 0, 0, "ASSOCIATED FIELD", "NUMERIC")])
-                    vals = decode_compressed(bits, dummy_descriptors, n_subsets, {}, {})
-                    for i,ss in enumerate(vals):
-                        subsets[i].extend(ss)
-
-                read_length = _calculate_read_length(descriptor, operators)
-                if descriptor.unit == 'CCITTIA5':
-                    ref_value = Bits._readhex(bits, read_length, bits.pos)
-                else:
-                    ref_value = Bits._readuint(bits, read_length, bits.pos)
-                bits.pos += read_length
-
-                n_bits = Bits._readuint(bits, 6, bits.pos)
-                bits.pos += 6
-                
-                for i in range(n_subsets):
-                    if descriptor.unit == 'CCITTIA5':
-                        n_chars = n_bits
-                        if n_chars:
-                            raw_value = Bits._readhex(bits, n_chars*8, bits.pos)
-                            bits.pos += n_chars*8
-                            value = _decode_raw_value(raw_value, descriptor, operators)
-                        else:
-                            value = _decode_raw_value(ref_value, descriptor, operators)
+                    dummy_descriptor = associated_field_descriptor(op_aaf.bits())
+                    if columns is None:
+                        for subset, value in zip(subsets, collect_compressed_value(bits, dummy_descriptor, n_subsets, {})):
+                            subset.append(value)
                     else:
-                        if n_bits:
-                            increment = Bits._readuint(bits, n_bits, bits.pos)
-                            bits.pos += n_bits
-                            if increment ^ ((1 << n_bits)-1) == 0: # Missing value, all-ones
-                                value = _decode_raw_value((1 << descriptor.length)-1, descriptor, operators)
-                            else:
-                                value = _decode_raw_value(ref_value + increment, descriptor, operators)
-                        else:
-                            value = _decode_raw_value(ref_value, descriptor, operators)
-                    subsets[i].append(value)
-            elif isinstance(descriptor, ReplicationDescriptor):
-                aggregations = [[] for x in range(n_subsets)]
-                if descriptor.count:
-                    bval = None
-                    count = descriptor.count
+                        columns.extend(pc-1, decode_compressed_value(bits, dummy_descriptor, n_subsets, {}), True)
+
+                if columns is None:
+                    for subset, value in zip(subsets, collect_compressed_value(bits, descriptor, n_subsets, operators)):
+                        subset.append(value)
+                else:
+                    columns.extend(pc-1, decode_compressed_value(bits, descriptor, n_subsets, operators))
+            elif kind == REPLICATE or kind == DELAYED_REPLICATE:
+                body_end = instruction[2]
+                repeat = None
+                if kind == REPLICATE:
+                    # Regular replication, X elements repeated Y times in the file
+                    count = instruction[1]
                 else:
-                    bval = decode_compressed(bits, itertools.islice(descriptors, 1), n_subsets, {}, {})[0][0]
+                    bvals = decode_compressed_value(bits, instruction[1], n_subsets, {})
+                    bval = bvals[0]
                     count = bval.value
-                n_fields = descriptor.fields
-                field_descriptors = list(itertools.islice(descriptors, n_fields))
-
-                if bval is None or bval.descriptor.code in REPLICATION_DESCRIPTORS:
-                    # Regular replication, X elements repeated Y or <element value> times in the file
-                    for _ in range(count):
-                        replication = decode_compressed(bits, iter(field_descriptors), n_subsets, operators, descriptor_overlay)
-                        for subset_idx in range(n_subsets):
-                            aggregations[subset_idx].append(replication[subset_idx])
-                elif bval.descriptor.code in REPETITION_DESCRIPTORS:
-                    # Repeated replication, X elements present once in the file, output <element value> times
-                    replication = decode_compressed(bits, iter(field_descriptors), n_subsets, operators, descriptor_overlay)
-                    for _ in range(count):
-                        for subset_idx in range(n_subsets):
-                            aggregations[subset_idx].append(replication[subset_idx])
+                    if columns is not None and (selected is None or selected[pc-1]):
+                        columns.extend(pc-1, bvals)
+                    if instruction[3] == REPETITION:
+                        # Body is decoded once and repeated when it ends
+                        repeat = count
+                        count = 1
+                    elif instruction[3] != REPLICATION:
+                        raise ValueError("Unexpected delayed replication element %s" %(bval,))
+                if stats is not None:
+                    stats.replications[count if repeat is None else repeat] += 1
+                if count > 0:
+                    mark = columns.mark() if columns is not None and repeat is not None else None
+                    aggregations = [[] for x in range(n_subsets)] if columns is None else None
+                    stack.append([pc-1, count, aggregations, subsets, end, repeat, mark])
+                    subsets = [[] for x in range(n_subsets)] if columns is None else None
+                    end = body_end
                 else:
-                    raise ValueError("Unexpected delayed replication element %s" %bval)
-
-                for subset_idx in range(n_subsets):
-                    subsets[subset_idx].append(aggregations[subset_idx])
-            elif isinstance(descriptor, OperatorDescriptor):
-                op = descriptor.operator
+                    if selected is None or selected[pc-1]:
+                        if builder is not None:
+                            for subset_idx in range(n_subsets):
+                                subsets[subset_idx].append(builder.aggregate_subset(subset_idx, []))
+                        elif columns is None:
+                            for subset in subsets:
+                                subset.append([])
+                    pc = body_end
+            elif kind == OPERATOR:
+                op = instruction[1]
                 if op.opcode in (1,2,3,4,7):
                     if op.neutral():
                         del operators[op.opcode]
                     else:
                         op.check_conflict(operators)
                         operators[op.opcode] = op
+                        if stats is not None:
+                            stats.operators[op.opcode] += 1
                 else:
                     raise NotImplementedError("Can only decode operators 201-204 and 207 for compressed BUFR data at the moment, please file an issue on GitHub, found operator: 2%02d" %op.opcode)
-            elif isinstance(descriptor, SequenceDescriptor):
-                comp = decode_compressed(bits, iter(descriptor.descriptors), n_subsets, operators, descriptor_overlay)
-                for i,subset in enumerate(comp):
-                    subsets[i].extend(subset)
-            else:
-                raise NotImplementedError("Unknown descriptor type: %s" % descriptor)
-        return subsets
+            elif kind == SIGNIFY_CHARACTER or kind == SIGNIFY_LOCAL:
+                opcode = OpCode.SIGNIFY_CHARACTER if kind == SIGNIFY_CHARACTER else OpCode.SIGNIFY_DATA_WIDTH
+                raise NotImplementedError("Can only decode operators 201-204 and 207 for compressed BUFR data at the moment, please file an issue on GitHub, found operator: 2%02d" %opcode)
 
-    if compressed:
-        subsets = [BufrSubset(x) for x in decode_compressed(bits, iter(descriptors), n_subsets, {}, {})]
-    else:
-        subsets = [BufrSubset(decode(bits, iter(descriptors), {}, {})) for _ in range(n_subsets)]
+    def skip_compressed_value(bits, descriptor, n_subsets, operators):
+        """
+        Skip values of one element for all subsets
+
+        :param bits: Bit stream to skip in
+        :param ElementDescriptor descriptor: Descriptor of the element
+        :param n_subsets: Number of subsets
+        :param dict operators: Operators in effect, indexed by opcode
+        """
+        bits.skip(_calculate_read_length(descriptor, operators))
+        n_bits = bits.readuint(6)
+        if descriptor.unit == 'CCITTIA5':
+            # Increments of character data are given in bytes
+            n_bits *= 8
+        bits.skip(n_bits*n_subsets)
+
+    def decode_compressed_value(bits, descriptor, n_subsets, operators, raw=False):
+        """
+        Decode values of one element for all subsets
+
+        :param bits: Bit stream to decode from
+        :param ElementDescriptor descriptor: Descriptor of the element
+        :param n_subsets: Number of subsets to decode
+        :param dict operators: Operators in effect, indexed by opcode
+        :param bool raw: Return the raw values instead of values
+        :return: List of values or of raw values, one per subset
+        """
+        conv = converter(descriptor, operators)
+        if conv.kind == TEXT:
+            ref_value = bits.readbytes(conv.width)
+        else:
+            ref_value = bits.readuint(conv.width)
+
+        n_bits = bits.readuint(6)
+
+        if vector.applicable(conv, n_bits, n_subsets):
+            values = vector.decode_increments(data, bits.pos, n_bits, n_subsets, ref_value, conv, raw)
+            bits.skip(n_bits*n_subsets)
+            return values
+
+        if not n_bits:
+            return [ref_value if raw else conv(ref_value)] * n_subsets
+
+        if conv.kind == TEXT:
+            n_chars = n_bits
+            raws = [bits.readbytes(n_chars*8) for _ in range(n_subsets)]
+        else:
+            all_ones = mask(n_bits)
+            missing = mask(descriptor.length)
+            raws = [missing if increment == all_ones else ref_value + increment
+                    for increment in bits.readuints(n_bits, n_subsets)]
+        return raws if raw else [conv(raw_value) for raw_value in raws]
+
+    def collect_compressed_value(bits, descriptor, n_subsets, operators):
+        """
+        Decode values of one element for all subsets, or collect them into the compact builder
+
+        :return: List of values or of their tokens, one per subset
+        """
+        if builder is None:
+            return decode_compressed_value(bits, descriptor, n_subsets, operators)
+        raws = decode_compressed_value(bits, descriptor, n_subsets, operators, True)
+        return builder.extend(converter(descriptor, operators), raws)
+
+    if columnar and compact:
+        raise ValueError("Data can be decoded either into columns or compact subsets, not both")
+    columns = ColumnBuilder(n_subsets, compressed) if columnar else None
+    builder = CompactBuilder(n_subsets, compressed) if compact else None
+    try:
+        if columnar:
+            if compressed:
+                decode_compressed(bits, 0, len(program), n_subsets, {}, {})
+            else:
+                for _ in range(n_subsets):
+                    decode_subset(bits)
+                    columns.end_subset()
+            return ColumnarSection4(length, n_subsets, columns.columns())
+        elif compact and compressed:
+            subsets = builder.subsets(decode_compressed(bits, 0, len(program), n_subsets, {}, {}))
+        elif compact:
+            subsets = [builder.end_subset(decode_subset(bits)) for _ in range(n_subsets)]
+        elif compressed:
+            subsets = [BufrSubset(x) for x in decode_compressed(bits, 0, len(program), n_subsets, {}, {})]
+        else:
+            subsets = [BufrSubset(decode_subset(bits)) for _ in range(n_subsets)]
+    finally:
+        if stats is not None:
+            stats.bits += bits.pos
+        # The decoding functions refer to each other, don't let them keep the buffer exported
+        if isinstance(data, memoryview):
+            data.release()
     return Section4(length, subsets)
 
 def decode_section5(stream):
@@ -545,18 +871,194 @@ def decode_section5(stream):
         raise ValueError("Invalid end token: %s, expected: %s" %(data, END_TOKEN))
     return Section5(data)
 
-def decode_file(f, b_table):
+def decode_file(f, b_table, columnar=False, lazy=False, select=None, compact=False, cache=None, stats=None):
     """
     Decode BUFR message from a file into a :class:`.Message` object.
 
+    The message is read from the file with two reads, one for
+    Section 0 and one for the rest of the message, and decoded from
+    memory. The file is left positioned after the message.
+
     :param file f: File that contains the bufr message
     :param Mapping|Template b_table: Either a mapping from BUFR descriptor codes to descriptors or a Template describing the message
+    :param bool columnar: Decode Section 4 into a :class:`.ColumnarSection4`
+    :param bool lazy: Decode Section 4 only when it is first accessed
+    :param select: Codes of elements to decode, as integers or FXY strings, all elements if None
+    :param bool compact: Decode subsets into :class:`.CompactSubset` objects
+    :param MessageCache cache: Cache to look the message up in and store it in
+    :param DecodeStats stats: Statistics to profile the message into
     """
-    return decode(ByteStream(f), b_table)
+    header = f.read(8)
+    if len(header) < 8:
+        raise IOError("Premature end of stream")
+    total_length = int.from_bytes(header[4:7], 'big')
+    return decode(header + f.read(max(total_length-8, 0)), b_table, columnar=columnar, lazy=lazy, select=select, compact=compact, cache=cache, stats=stats)
 
 READ_VERSIONS=(3,4)
 
-def decode_all(stream, b_table):
+class MessageError(namedtuple("_MessageError", ["location", "error"])):
+    """
+    Message that could not be decoded, yielded by :func:`iter_messages`.
+
+    :ivar MessageLocation location: Location of the message, or None for streams that are not framed by length
+    :ivar Exception error: Decoding error, or a :class:`.FramingError` for a start token that does not begin a well-formed message
+    """
+    __slots__ = ()
+
+def iter_messages(source, b_table, columnar=False, lazy=False, select=None, predicate=None, compact=False, cache=None, stats=None):
+    """
+    Decode BUFR messages one at a time.
+
+    Yields a :class:`.Message` for each message that is decoded and a
+    :class:`.MessageError` for each message that fails to decode, as
+    soon as the message has been located. Only one message is held in
+    memory at a time, apart from the messages kept by the caller.
+
+    The source may be a path of a file, a file opened in binary mode,
+    a :class:`.ByteStream`, or a buffer, i.e. :py:class:`bytes`,
+    :py:class:`bytearray`, :py:class:`memoryview` or
+    :py:class:`mmap.mmap`. Messages in these are located with
+    :py:mod:`bufrpy.framing` using the length in Section 0, so a
+    message that fails to decode is skipped as a whole. Files given by
+    path are memory mapped. Other iterables of single bytes are
+    searched for start tokens one byte at a time.
+
+    With a predicate, only the messages it accepts are decoded. It is
+    called with the :class:`.Section0`, Section 1 and
+    :class:`.Section3` of each message, and messages it returns a
+    false value for are skipped without decoding Section 4 and are not
+    yielded. Errors raised by the predicate are yielded as
+    :class:`.MessageError` objects.
+
+    With a :class:`.MessageCache`, messages that have already been
+    decoded with the same table and options are taken from the cache
+    instead of being decoded again. Messages are looked up in the
+    cache only when they are located by length, not in other iterables
+    of bytes.
+
+    With a :class:`.DecodeStats`, the messages that are decoded are
+    profiled into it.
+
+    :param str|file|ByteStream|bytes|bytearray|memoryview|mmap source: Source of the bufr messages
+    :param Mapping|Template b_table: Either a mapping from BUFR descriptor codes to descriptors or a Template describing the message
+    :param bool columnar: Decode Section 4 of the messages into :class:`.ColumnarSection4` objects
+    :param bool lazy: Decode Section 4 of each message only when it is first accessed
+    :param select: Codes of elements to decode, as integers or FXY strings, all elements if None
+    :param predicate: Function of Section 0, Section 1 and Section 3 that tells whether to decode a message
+    :param bool compact: Decode subsets into :class:`.CompactSubset` objects
+    :param MessageCache cache: Cache to look messages up in and store them in
+    :param DecodeStats stats: Statistics to profile messages into
+    :return: Iterator of :class:`.Message` and :class:`.MessageError` objects
+    """
+    if isinstance(source, BUFFER_TYPES):
+        return _iter_buffer(source, b_table, columnar, lazy, select, predicate, compact, cache, stats)
+    elif isinstance(source, str) or hasattr(source, '__fspath__'):
+        return _iter_path(source, b_table, columnar, lazy, select, predicate, compact, cache, stats)
+    elif isinstance(source, ByteStream):
+        return _iter_file(source.f, b_table, columnar, lazy, select, predicate, compact, cache, stats)
+    elif hasattr(source, 'read'):
+        return _iter_file(source, b_table, columnar, lazy, select, predicate, compact, cache, stats)
+    else:
+        return _iter_stream(source, b_table, columnar, lazy, select, predicate, compact, stats)
+
+def _decode_cached(data, b_table, columnar, lazy, select, predicate, compact, cache, stats=None):
+    """
+    Decode message in buffer, or take it from cache.
+
+    Returns None for messages rejected by predicate. Messages taken
+    from the cache are checked with predicate again, as they may have
+    been decoded with another one.
+    """
+    if cache is None:
+        return _decode_message(_readable(data), b_table, False, columnar, lazy, select, predicate, compact, stats)
+    decoded = []
+    def build():
+        decoded.append(True)
+        return _decode_message(_readable(data), b_table, False, columnar, lazy, select, predicate, compact, stats)
+    options = (columnar, lazy, tuple(select) if select is not None else None, compact)
+    msg = cache.get(data, b_table, options, build)
+    if msg is not None and predicate is not None and not decoded and not predicate(msg.section0, msg.section1, msg.section3):
+        return None
+    return msg
+
+def _decode_frame(location, data, b_table, columnar, lazy, select=None, predicate=None, compact=False, cache=None, stats=None):
+    # Returns None for messages rejected by predicate
+    try:
+        return _decode_cached(data, b_table, columnar, lazy, select, predicate, compact, cache, stats)
+    except Exception as e:
+        # Don't let the traceback keep the buffer exported
+        traceback.clear_frames(e.__traceback__)
+        return MessageError(location, e)
+
+def _framing_error(error):
+    return MessageError(MessageLocation(error.offset, 0, None), error)
+
+def _iter_buffer(buf, b_table, columnar, lazy, select, predicate, compact, cache=None, stats=None):
+    view = memoryview(buf).cast('B')
+    try:
+        for frame in scan_buffer(view):
+            if isinstance(frame, FramingError):
+                yield _framing_error(frame)
+                continue
+            data = view[frame.offset:frame.offset+frame.length]
+            try:
+                result = _decode_frame(frame, data, b_table, columnar, lazy, select, predicate, compact, cache, stats)
+            finally:
+                data.release()
+            if result is not None:
+                yield result
+    finally:
+        view.release()
+
+def _iter_path(path, b_table, columnar, lazy, select, predicate, compact, cache=None, stats=None):
+    buf = open_buffer(path)
+    try:
+        for result in _iter_buffer(buf, b_table, columnar, lazy, select, predicate, compact, cache, stats):
+            yield result
+    finally:
+        if isinstance(buf, mmap.mmap):
+            buf.close()
+
+def _iter_file(f, b_table, columnar, lazy, select, predicate, compact, cache=None, stats=None):
+    for frame, data in scan_file(f):
+        if isinstance(frame, FramingError):
+            yield _framing_error(frame)
+        else:
+            result = _decode_frame(frame, data, b_table, columnar, lazy, select, predicate, compact, cache, stats)
+            if result is not None:
+                yield result
+
+def _seek_past_bufr(stream):
+    """ Seek stream until BUFR is encountered. Returns True if BUFR found and False if not """
+    try:
+        c = None
+        while True:
+            if c != b'B':
+                c = stream.next()
+                continue
+            if c == b'B':
+                c = stream.next()
+                if c == b'U':
+                    c = stream.next()
+                    if c == b'F':
+                        c = stream.next()
+                        if c == b'R':
+                            return True
+                        
+    except StopIteration:
+        return False
+
+def _iter_stream(stream, b_table, columnar, lazy, select, predicate, compact, stats=None):
+    while _seek_past_bufr(stream):
+        try:
+            msg = _decode_message(_readable(itertools.chain([b'B',b'U',b'F',b'R'], stream)), b_table, False, columnar, lazy, select, predicate, compact, stats)
+        except Exception as e:
+            yield MessageError(None, e)
+        else:
+            if msg is not None:
+                yield msg
+
+def decode_all(stream, b_table, columnar=False, lazy=False, select=None, predicate=None, compact=False, cache=None, stats=None):
     """
     Decode all BUFR messages from stream into a list of :class:`.Message` objects and a list of decoding errors.
     
@@ -565,70 +1067,111 @@ def decode_all(stream, b_table):
     messages must start with BUFR and end with 7777. Data between
     messages is skipped.
 
-    :param ByteStream stream: Stream that contains the bufr message
+    The stream may be any source accepted by :func:`iter_messages`,
+    which this function collects the results of. Start tokens that do
+    not begin a well-formed message are reported as
+    :class:`.FramingError` objects in the list of errors.
+
+    :param str|file|ByteStream|bytes|bytearray|memoryview|mmap stream: Stream or buffer that contains the bufr messages
     :param Mapping|Template b_table: Either a mapping from BUFR descriptor codes to descriptors or a Template describing the message
+    :param bool columnar: Decode Section 4 of the messages into :class:`.ColumnarSection4` objects
+    :param bool lazy: Decode Section 4 of each message only when it is first accessed. Errors in Section 4 are then raised on access instead of being listed in the errors.
+    :param select: Codes of elements to decode, as integers or FXY strings, all elements if None
+    :param predicate: Function of Section 0, Section 1 and Section 3 that tells whether to decode a message, see :func:`iter_messages`. Rejected messages are in neither list.
+    :param bool compact: Decode subsets into :class:`.CompactSubset` objects
+    :param MessageCache cache: Cache to look messages up in and store them in, see :func:`iter_messages`
+    :param DecodeStats stats: Statistics to profile messages into, see :class:`.DecodeStats`
     """
-    def seek_past_bufr(stream):
-        """ Seek stream until BUFR is encountered. Returns True if BUFR found and False if not """
-        try:
-            c = None
-            while True:
-                if c != b'B':
-                    c = stream.next()
-                    continue
-                if c == b'B':
-                    c = stream.next()
-                    if c == b'U':
-                        c = stream.next()
-                        if c == b'F':
-                            c = stream.next()
-                            if c == b'R':
-                                return True
-                        
-        except StopIteration:
-            return False
-
     messages = []
     errors = []
-    while seek_past_bufr(stream):
-        try:
-            msg = decode(itertools.chain([b'B',b'U',b'F',b'R'], stream), b_table)
-            messages.append(msg)
-        except Exception as e:
-            errors.append(e)
-            pass
+    for result in iter_messages(stream, b_table, columnar, lazy, select, predicate, compact, cache, stats):
+        if isinstance(result, MessageError):
+            errors.append(result.error)
+        else:
+            messages.append(result)
     return messages, errors
 
-def decode(stream, b_table, skip_data=False):
+def _readable(stream):
+    if isinstance(stream, (ReadableStream, ReadableBuffer)):
+        return stream
+    elif isinstance(stream, BUFFER_TYPES):
+        return ReadableBuffer(stream)
+    else:
+        return ReadableStream(stream)
+
+def decode(stream, b_table, skip_data=False, columnar=False, lazy=False, select=None, compact=False, cache=None, stats=None):
     """ 
     Decode BUFR message from stream into a :class:`.Message` object.
 
+    The stream may also be a buffer, i.e. :py:class:`bytes`,
+    :py:class:`bytearray`, :py:class:`memoryview` or
+    :py:class:`mmap.mmap`, that starts with the message. Buffers are
+    decoded without copying the message.
+
     See WMO306_vl2_BUFR3_Spec_en.pdf for BUFR format specification.
 
-    :param ByteStream stream: Stream that contains the bufr message
+    :param ByteStream|bytes|bytearray|memoryview|mmap stream: Stream or buffer that contains the bufr message
     :param Mapping|Template b_table: Either a mapping from BUFR descriptor codes to descriptors or a Template describing the message
     :param bool skip_data: Skip decoding data? Can be used to get only extract metadata of a file to e.g. analysis of decoding errors.
+    :param bool columnar: Decode Section 4 into a :class:`.ColumnarSection4` with one typed array per element instead of a list of subsets
+    :param bool lazy: Keep Section 4 undecoded in a :class:`.LazySection4` and decode it when ``section4`` of the message is first accessed. Unlike skip_data, the data remains available.
+    :param select: Codes of elements to decode, as integers or FXY strings. Other elements are skipped without being decoded, see :func:`decode_section4`. All elements are decoded if None.
+    :param bool compact: Decode subsets into :class:`.CompactSubset` objects, which store values in arrays and create :class:`.BufrValue` objects only when accessed
+    :param MessageCache cache: Cache to look the message up in and store it in. Only used for buffers, and not with skip_data.
+    :param DecodeStats stats: Statistics to profile the message into, see :class:`.DecodeStats`
     """
 
-    rs = ReadableStream(stream)
-    section0 = decode_section0(rs)
+    if cache is not None and not skip_data and isinstance(stream, BUFFER_TYPES) and len(stream) >= 8:
+        view = memoryview(stream).cast('B')
+        try:
+            if view[:4] == b'BUFR':
+                data = view[:int.from_bytes(view[4:7], 'big')]
+                try:
+                    return _decode_cached(data, b_table, columnar, lazy, select, None, compact, cache, stats)
+                finally:
+                    data.release()
+        finally:
+            view.release()
+    return _decode_message(_readable(stream), b_table, skip_data, columnar, lazy, select, None, compact, stats)
+
+def _untimed(section, func, *args):
+    return func(*args)
+
+def _decode_message(rs, b_table, skip_data, columnar, lazy, select, predicate, compact, stats=None):
+    # Returns None if predicate rejects the message
+    profile = stats.start() if stats is not None else None
+    if profile is None:
+        return _decode_sections(rs, b_table, skip_data, columnar, lazy, select, predicate, compact, None, _untimed)
+    try:
+        msg = _decode_sections(rs, b_table, skip_data, columnar, lazy, select, predicate, compact, profile, profile.timed)
+        if msg is not None and not skip_data and not lazy:
+            profile.count_values(msg.section4)
+        return msg
+    finally:
+        stats.add(profile)
+
+def _decode_sections(rs, b_table, skip_data, columnar, lazy, select, predicate, compact, profile, timed):
+    section0 = timed(0, decode_section0, rs)
     if section0.edition not in READ_VERSIONS:
         raise ValueError("Encountered BUFR edition %d, only support %s" %(section0.edition, READ_VERSIONS))
     if section0.edition == 3:
-        section1 = decode_section1_v3(rs)
+        section1 = timed(1, decode_section1_v3, rs)
     elif section0.edition == 4:
-        section1 = decode_section1_v4(rs)
+        section1 = timed(1, decode_section1_v4, rs)
     if section1.optional_section != 0:
-        section2 = decode_section2(rs)
+        section2 = timed(2, decode_section2, rs)
     else:
         section2 = None
-    section3 = decode_section3(rs, b_table)
+    section3, plan = timed(3, _decode_section3, rs, b_table)
+    if predicate is not None and not predicate(section0, section1, section3):
+        # Jump over Section 4 for the benefit of streams, Section 5 is not checked
+        timed(4, skip_section4, rs)
+        return None
     if skip_data:
-        section4 = skip_section4(rs)
+        section4 = timed(4, skip_section4, rs)
+    elif lazy:
+        section4 = timed(4, read_section4, rs, section3.descriptors, section3.n_subsets, section3.flags & FLAG_COMPRESSED, plan, columnar, select, compact)
     else:
-        section4 = decode_section4(rs, section3.descriptors, section3.n_subsets, section3.flags & FLAG_COMPRESSED)
-    section5 = decode_section5(rs)
+        section4 = timed(4, decode_section4, rs, section3.descriptors, section3.n_subsets, section3.flags & FLAG_COMPRESSED, plan, columnar, select, compact, profile)
+    section5 = timed(5, decode_section5, rs)
     return Message(section0, section1, section2, section3, section4, section5)
-
-
-    
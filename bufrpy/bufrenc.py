@@ -0,0 +1,476 @@
+"""
+Encoding of BUFR messages.
+
+Messages are encoded by walking the decoding plan of the Section 3
+descriptors like the decoder does, writing the raw values of the
+:class:`.BufrValue` objects of each subset instead of reading them.
+Values whose raw value is None are encoded from their decoded value,
+so subsets can also be built by hand.
+
+Compressed Section 4 is written with the smallest reference value and
+increment width that hold the values of each element, and elements
+whose values are the same in all subsets are written without
+increments.
+"""
+
+from bufrpy.bits import BitWriter, mask
+from bufrpy.bufrdec import Section1v3, Section1v4, FLAG_COMPRESSED, FLAG_OBSERVED
+from bufrpy.descriptors import OpCode, ASSOCIATED_FIELD_SIGNIFICANCE, associated_field_descriptor
+from bufrpy.plan import compile_plan, ELEMENT, REPLICATE, DELAYED_REPLICATE, OPERATOR, SIGNIFY_CHARACTER, SIGNIFY_LOCAL, REPLICATION, REPETITION
+from bufrpy.value import converter, TEXT
+
+#: Edition of messages whose Section 1 is not known, e.g. messages from :func:`bufrpy.from_json`
+DEFAULT_EDITION = 4
+
+# Largest increment width, and number of characters of compressed text, that fit in 6 bits
+_MAX_INCREMENT_BITS = 63
+
+def encode(msg, compressed=None, section1=None):
+    """
+    Encode a :class:`.Message` into a BUFR message.
+
+    The edition is 3 if Section 1 is a :class:`.Section1v3` and 4
+    otherwise. Lengths, the number of subsets and the optional section
+    flag are computed from the contents of the message, other fields
+    are written as they are. Messages created by
+    :func:`bufrpy.from_json` have no Section 1, so one with all fields
+    zero is written unless section1 is given.
+
+    Decoding the encoded message gives back the subsets of the
+    message, except that values whose raw value is None are decoded
+    from the raw values computed for them. Compressed data written
+    uncompressed does not always decode to the same values:
+    uncompressed text is always as wide as its element, so shorter
+    compressed text comes back padded with spaces, and associated
+    fields of uncompressed data are not checked for missing values, so
+    missing ones come back as all ones.
+
+    :param Message msg: Message to encode
+    :param bool compressed: Whether to compress Section 4, as in the flags of Section 3 if None
+    :param Section1v3|Section1v4 section1: Section 1 to write instead of that of the message
+    :return: Encoded message
+    :rtype: bytes
+    :raises ValueError: if the data does not match the descriptors, or cannot be compressed
+    :raises NotImplementedError: if compressed data contains operators other than 201-204 and 207
+    """
+    section3 = msg.section3
+    section4 = msg.section4
+    if not hasattr(section4, 'subsets'):
+        raise ValueError("Can only encode messages with subsets, not %s" %type(section4).__name__)
+    subsets = section4.subsets
+
+    if section1 is None:
+        section1 = msg.section1
+    if section1 is None:
+        edition = DEFAULT_EDITION
+        section1 = Section1v4(22, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0)
+    else:
+        edition = 3 if isinstance(section1, Section1v3) else 4
+
+    flags = section3.flags if section3.flags is not None else FLAG_OBSERVED
+    if compressed is None:
+        compressed = bool(flags & FLAG_COMPRESSED)
+    flags = (flags & ~FLAG_COMPRESSED) | (FLAG_COMPRESSED if compressed else 0)
+
+    section2 = msg.section2
+    if (section2 is not None) != (section1.optional_section != 0):
+        section1 = section1._replace(optional_section=128 if section2 is not None else 0)
+
+    descriptors = [descriptor.strong() for descriptor in section3.descriptors]
+    body = [_encode_section1(section1, edition)]
+    if section2 is not None:
+        body.append(_section(bytes(bytearray(section2.data)), edition))
+    body.append(_encode_section3([descriptor.code for descriptor in descriptors], len(subsets), flags, edition))
+    body.append(encode_section4(subsets, descriptors, compressed, edition=edition))
+    body.append(b'7777')
+    body = b''.join(body)
+    return b'BUFR' + (len(body) + 8).to_bytes(3, 'big') + bytes(bytearray([edition])) + body
+
+def _section(data, edition):
+    # Length and contents of a section, sections of edition 3 have even length
+    if edition == 3:
+        data += b'\0' * ((len(data) + 1) & 1)
+    return (len(data) + 3).to_bytes(3, 'big') + data
+
+def _encode_section1(section1, edition):
+    if edition == 3:
+        data = bytes(bytearray([section1.master_table_id, section1.originating_subcentre, section1.originating_centre,
+                                section1.update_sequence_number, section1.optional_section, section1.data_category,
+                                section1.data_subcategory, section1.master_table_version, section1.local_table_version,
+                                section1.year - 1900, section1.month, section1.day, section1.hour, section1.minute]))
+    else:
+        data = (bytes(bytearray([section1.master_table_id])) + section1.originating_centre.to_bytes(2, 'big')
+                + section1.originating_subcentre.to_bytes(2, 'big')
+                + bytes(bytearray([section1.update_sequence_number, section1.optional_section, section1.data_category,
+                                   section1.data_subcategory, section1.local_subcategory, section1.master_table_version,
+                                   section1.local_table_version]))
+                + section1.year.to_bytes(2, 'big')
+                + bytes(bytearray([section1.month, section1.day, section1.hour, section1.minute, section1.second])))
+    if section1.length is not None and section1.length > len(data) + 3:
+        # Keep the length of the original section, its local contents are not known
+        data += b'\0' * (section1.length - len(data) - 3)
+    return _section(data, edition)
+
+def _encode_section3(codes, n_subsets, flags, edition):
+    if not 0 < n_subsets <= 0xffff:
+        raise ValueError("Invalid number of subsets: %d" %n_subsets)
+    data = b'\0' + n_subsets.to_bytes(2, 'big') + bytes(bytearray([flags])) + b''.join(code.to_bytes(2, 'big') for code in codes)
+    return _section(data, edition)
+
+def encode_section4(subsets, descriptors, compressed=False, plan=None, edition=DEFAULT_EDITION):
+    """
+    Encode subsets into Section 4 of a BUFR message.
+
+    :param subsets: Subsets to encode, :class:`.BufrSubset` objects or other objects with values
+    :param descriptors: Strong descriptors of Section 3
+    :param bool compressed: Whether to compress the data
+    :param DecodePlan plan: Compiled plan of descriptors, compiled from descriptors if not given
+    :param int edition: BUFR edition, Section 4 of edition 3 is padded to even length
+    :return: Encoded Section 4, including its header
+    :rtype: bytes
+    :raises ValueError: if the data does not match the descriptors, or cannot be compressed
+    :raises NotImplementedError: if compressed data contains operators other than 201-204 and 207
+    """
+    if plan is None:
+        plan = compile_plan(descriptors)
+    program = plan.instructions
+    writer = BitWriter()
+    if compressed:
+        _encode_compressed(writer, program, [subset.values for subset in subsets])
+    else:
+        for subset in subsets:
+            _encode_subset(writer, program, subset.values)
+    return _section(b'\0' + writer.getvalue(), edition)
+
+def _next_value(values, pos):
+    # Value at pos, None when the values of a repetition without repetitions are encoded
+    if values is None:
+        return None
+    if pos >= len(values):
+        raise ValueError("Too few values, expected value at position %d" %pos)
+    return values[pos]
+
+def _replications(aggregation, count):
+    if aggregation is None:
+        return [None] * count
+    if not isinstance(aggregation, list):
+        raise ValueError("Expected replication, got %r" %(aggregation,))
+    if count is not None and len(aggregation) != count:
+        raise ValueError("Expected %d replications, got %d" %(count, len(aggregation)))
+    return aggregation
+
+def _raw_value(value, descriptor, operators):
+    """
+    Raw value of a value of descriptor, computed from the decoded value if raw value is None.
+
+    :return: Raw value and its width, the raw value of text is bytes of at most width bits
+    """
+    conv = converter(descriptor, operators)
+    width = conv.width
+    if isinstance(value, list):
+        raise ValueError("Expected value of %s, got replication" %(descriptor,))
+    if conv.kind == TEXT:
+        raw = value.raw_value if value is not None else None
+        if raw is None:
+            if value is None or value.value is None:
+                # Missing value, all ones
+                return b'\xff' * (width >> 3), width
+            raw = value.value.encode('iso-8859-1')
+        elif isinstance(raw, str):
+            raw = bytes.fromhex(raw)
+        if len(raw) > width >> 3:
+            raise ValueError("Text %r of %s does not fit in %d characters" %(raw, descriptor, width >> 3))
+        return raw, width
+    if value is None:
+        return mask(width), width
+    raw = value.raw_value
+    if raw is None:
+        if value.value is None:
+            return mask(width), width
+        if value.descriptor is not None and value.descriptor != descriptor:
+            # Reference value changed by operator 203
+            conv = converter(value.descriptor, operators)
+        if isinstance(value.value, int) and isinstance(conv.factor, int) and value.value % conv.factor == 0:
+            scaled = value.value // conv.factor
+        else:
+            scaled = int(round(value.value / conv.factor))
+        raw = int(scaled - conv.ref)
+    if not 0 <= raw <= mask(width):
+        raise ValueError("Raw value %r of %s does not fit in %d bits" %(raw, descriptor, width))
+    return raw, width
+
+def _write_value(writer, value, descriptor, operators):
+    # Value of uncompressed data, text shorter than the width is padded with spaces
+    raw, width = _raw_value(value, descriptor, operators)
+    if isinstance(raw, bytes):
+        raw = int.from_bytes(raw + b' ' * ((width >> 3) - len(raw)), 'big')
+    writer.write(raw, width)
+
+def _count_raw(count, descriptor):
+    # Raw value of delayed replication count
+    conv = converter(descriptor)
+    raw = int(round(count / conv.factor)) - conv.ref
+    if not 0 <= raw < mask(conv.width):
+        raise ValueError("Replication count %d does not fit in %s" %(count, descriptor))
+    return raw, conv.width
+
+def _signed_ref(ref, n_bits):
+    # New reference value of operator 203, the top bit is the sign
+    if abs(ref) >= 1 << (n_bits-1):
+        raise ValueError("Reference value %d does not fit in %d bits" %(ref, n_bits))
+    return (-ref) | (1 << (n_bits-1)) if ref < 0 else ref
+
+def _overlay_ref(descriptor, pending):
+    """
+    Reference value set by operator 203 for descriptor.
+
+    The reference value is not a value of the subset, so it is taken
+    from the descriptor of the next value of the element. If the
+    element has no more values, the reference value is not used and
+    that of the descriptor is returned.
+
+    :param ElementDescriptor descriptor: Descriptor whose reference value is changed
+    :param pending: Pairs of lists of values still to be encoded and their start positions, in order
+    """
+    iterators = [iter(values[start:]) for values, start in reversed(pending) if values is not None]
+    while iterators:
+        for value in iterators[-1]:
+            if isinstance(value, list):
+                iterators.append(iter(value))
+                break
+            if value is not None and value.descriptor.code == descriptor.code:
+                return value.descriptor.ref
+        else:
+            iterators.pop()
+    return descriptor.ref
+
+def _update_operators(operators, op):
+    if op.neutral():
+        del operators[op.opcode]
+    else:
+        op.check_conflict(operators)
+        operators[op.opcode] = op
+
+def _encode_subset(writer, program, values):
+    """
+    Encode values of one subset of uncompressed data.
+
+    :param BitWriter writer: Writer to write to
+    :param program: Instructions of the decoding plan
+    :param list values: Values of the subset, with replications as nested lists
+    """
+    operators = {}
+    # Replications being encoded, innermost last. Each frame is
+    # [instruction index, replications, next replication, enclosing
+    # values, enclosing position, enclosing end].
+    stack = []
+    pos = 0
+    pc = 0
+    end = len(program)
+    while True:
+        if pc >= end:
+            if values is not None and pos != len(values):
+                raise ValueError("Too many values, %d left over" %(len(values) - pos))
+            if not stack:
+                return
+            frame = stack[-1]
+            if frame[2] < len(frame[1]):
+                # Next replication of the body
+                values = frame[1][frame[2]]
+                frame[2] += 1
+                pos = 0
+                pc = frame[0] + 1
+                continue
+            stack.pop()
+            pc = end
+            values, pos, end = frame[3], frame[4], frame[5]
+            continue
+        instruction = program[pc]
+        kind = instruction[0]
+        pc += 1
+        if kind == ELEMENT:
+            descriptor = instruction[1]
+            op_crf = operators.get(OpCode.CHANGE_REFERENCE_VALUES, None)
+            if op_crf is not None:
+                pending = [(values, pos)]
+                for frame in reversed(stack):
+                    pending.extend([(frame[1], frame[2]), (frame[3], frame[4])])
+                writer.write(_signed_ref(_overlay_ref(descriptor, pending), op_crf.bits()), op_crf.bits())
+                continue
+            op_aaf = operators.get(OpCode.ADD_ASSOCIATED_FIELD, None)
+            if op_aaf is not None and descriptor.code != ASSOCIATED_FIELD_SIGNIFICANCE:
+                _write_value(writer, _next_value(values, pos), associated_field_descriptor(op_aaf.bits()), {})
+                pos += 1
+            _write_value(writer, _next_value(values, pos), descriptor, operators)
+            pos += 1
+        elif kind == REPLICATE or kind == DELAYED_REPLICATE:
+            body_end = instruction[2]
+            aggregation = _next_value(values, pos)
+            pos += 1
+            if kind == REPLICATE:
+                replications = _replications(aggregation, instruction[1])
+            else:
+                replications = _replications(aggregation, None)
+                writer.write(*_count_raw(len(replications), instruction[1]))
+                if instruction[3] == REPETITION:
+                    # Body is present once, even when it is repeated zero times
+                    replications = replications[:1] or [None]
+                elif instruction[3] != REPLICATION:
+                    raise ValueError("Unexpected delayed replication element %s" %(instruction[1],))
+            if replications:
+                stack.append([pc-1, replications, 1, values, pos, end])
+                values = replications[0]
+                pos = 0
+                end = body_end
+            else:
+                pc = body_end
+        elif kind == OPERATOR:
+            _update_operators(operators, instruction[1])
+        elif kind == SIGNIFY_CHARACTER or kind == SIGNIFY_LOCAL:
+            _write_value(writer, _next_value(values, pos), instruction[1], {})
+            pos += 1
+
+def _write_compressed(writer, width, missing, raws):
+    # Reference value and increments of numeric values of all subsets
+    first = raws[0]
+    if raws.count(first) == len(raws):
+        writer.write(first, width)
+        writer.write(0, 6)
+        return
+    present = [raw for raw in raws if raw != missing]
+    ref = min(present)
+    n_bits = (max(present) - ref + 1).bit_length()
+    if n_bits > _MAX_INCREMENT_BITS:
+        raise ValueError("Values of %d bits cannot be compressed, their range is too large" %width)
+    all_ones = mask(n_bits)
+    writer.write(ref, width)
+    writer.write(n_bits, 6)
+    for raw in raws:
+        writer.write(all_ones if raw == missing else raw - ref, n_bits)
+
+def _write_compressed_text(writer, width, raws):
+    # Text of all subsets, either once for all or for each subset. Text
+    # of each subset is as long as the longest one, which may be
+    # shorter than the width.
+    n_chars = max(len(raw) for raw in raws) or width >> 3
+    if n_chars == width >> 3 and raws.count(raws[0]) == len(raws):
+        writer.write(int.from_bytes(raws[0].ljust(n_chars, b' '), 'big'), width)
+        writer.write(0, 6)
+        return
+    if n_chars > _MAX_INCREMENT_BITS:
+        raise ValueError("Text of %d characters cannot be compressed" %n_chars)
+    writer.write(0, width)
+    writer.write(n_chars, 6)
+    for raw in raws:
+        writer.write(int.from_bytes(raw.ljust(n_chars, b' '), 'big'), n_chars << 3)
+
+def _encode_compressed(writer, program, subsets):
+    """
+    Encode values of all subsets of compressed data.
+
+    :param BitWriter writer: Writer to write to
+    :param program: Instructions of the decoding plan
+    :param subsets: Lists of values of the subsets, with replications as nested lists
+    """
+    n_subsets = len(subsets)
+    operators = {}
+    # Replications being encoded, like in _encode_subset, with lists of
+    # replications and of enclosing values, one per subset
+    stack = []
+    # Values of each subset, or None
+    values = subsets
+    pos = 0
+    pc = 0
+    end = len(program)
+    while True:
+        if pc >= end:
+            if values is not None:
+                for subset_values in values:
+                    if pos != len(subset_values):
+                        raise ValueError("Too many values, %d left over" %(len(subset_values) - pos))
+            if not stack:
+                return
+            frame = stack[-1]
+            if frame[2] < frame[3]:
+                # Next replication of the body
+                values = [replications[frame[2]] for replications in frame[1]] if frame[1] is not None else None
+                frame[2] += 1
+                pos = 0
+                pc = frame[0] + 1
+                continue
+            stack.pop()
+            pc = end
+            values, pos, end = frame[4], frame[5], frame[6]
+            continue
+        instruction = program[pc]
+        kind = instruction[0]
+        pc += 1
+        if kind == ELEMENT:
+            descriptor = instruction[1]
+            op_crf = operators.get(OpCode.CHANGE_REFERENCE_VALUES, None)
+            if op_crf is not None:
+                # Reference values must be the same for all subsets, take them from the first
+                pending = [(values[0] if values is not None else None, pos)]
+                for frame in reversed(stack):
+                    pending.extend([(frame[1][0] if frame[1] is not None else None, frame[2]),
+                                    (frame[4][0] if frame[4] is not None else None, frame[5])])
+                ref = _signed_ref(_overlay_ref(descriptor, pending), op_crf.bits())
+                _write_compressed(writer, op_crf.bits(), None, [ref] * n_subsets)
+                continue
+            op_aaf = operators.get(OpCode.ADD_ASSOCIATED_FIELD, None)
+            if op_aaf is not None and descriptor.code != ASSOCIATED_FIELD_SIGNIFICANCE:
+                dummy_descriptor = associated_field_descriptor(op_aaf.bits())
+                if values is not None:
+                    raws = [_raw_value(_next_value(subset_values, pos), dummy_descriptor, {})[0] for subset_values in values]
+                else:
+                    raws = [mask(op_aaf.bits())] * n_subsets
+                _write_compressed(writer, op_aaf.bits(), mask(op_aaf.bits()), raws)
+                pos += 1
+            conv = converter(descriptor, operators)
+            if values is not None:
+                raws = [_raw_value(_next_value(subset_values, pos), descriptor, operators)[0] for subset_values in values]
+            else:
+                raws = [_raw_value(None, descriptor, operators)[0]] * n_subsets
+            if conv.kind == TEXT:
+                _write_compressed_text(writer, conv.width, raws)
+            else:
+                # Missing values are decoded from compressed data as all ones of the width of the descriptor
+                _write_compressed(writer, conv.width, mask(descriptor.length), raws)
+            pos += 1
+        elif kind == REPLICATE or kind == DELAYED_REPLICATE:
+            body_end = instruction[2]
+            if values is not None:
+                replications = [_replications(_next_value(subset_values, pos), instruction[1] if kind == REPLICATE else None) for subset_values in values]
+                counts = set(len(r) for r in replications)
+                if len(counts) != 1:
+                    raise ValueError("Compressed data must have the same replication counts in all subsets, got %s" %sorted(counts))
+                count = counts.pop()
+            else:
+                replications = None
+                count = instruction[1] if kind == REPLICATE else 0
+            pos += 1
+            if kind == DELAYED_REPLICATE:
+                raw, width = _count_raw(count, instruction[1])
+                _write_compressed(writer, width, None, [raw] * n_subsets)
+                if instruction[3] == REPETITION:
+                    # Body is present once, even when it is repeated zero times
+                    if not count:
+                        replications = None
+                    count = 1
+                elif instruction[3] != REPLICATION:
+                    raise ValueError("Unexpected delayed replication element %s" %(instruction[1],))
+            if count:
+                stack.append([pc-1, replications, 1, count, values, pos, end])
+                values = [r[0] for r in replications] if replications is not None else None
+                pos = 0
+                end = body_end
+            else:
+                pc = body_end
+        elif kind == OPERATOR:
+            op = instruction[1]
+            if op.opcode not in (1, 2, 3, 4, 7):
+                raise NotImplementedError("Can only encode operators 201-204 and 207 for compressed BUFR data, found operator: 2%02d" %op.opcode)
+            _update_operators(operators, op)
+        elif kind == SIGNIFY_CHARACTER or kind == SIGNIFY_LOCAL:
+            opcode = OpCode.SIGNIFY_CHARACTER if kind == SIGNIFY_CHARACTER else OpCode.SIGNIFY_DATA_WIDTH
+            raise NotImplementedError("Can only encode operators 201-204 and 207 for compressed BUFR data, found operator: 2%02d" %opcode)
@@ -0,0 +1,200 @@
+"""
+Cache of decoded BUFR messages keyed by their contents.
+
+Feeds such as the GTS often deliver the same bulletin several times,
+e.g. via different routes. With a :class:`MessageCache` passed to
+:func:`bufrpy.decode`, :func:`bufrpy.decode_all` or
+:func:`bufrpy.iter_messages`, each distinct message is decoded once
+and later copies are returned from the cache without decoding them
+again.
+
+Messages are keyed by a BLAKE2b digest of their bytes, together with
+the descriptor table and the options they were decoded with. Cached
+messages are shared by everyone who decodes a copy of them, so they
+must not be modified.
+
+Decoded messages take much more memory than their encoded form,
+typically some tens of times as much with :class:`.BufrValue`
+objects, so the size of the cache is bounded by an estimate of the
+memory of the decoded messages, see :func:`message_size`.
+"""
+
+from bufrpy.bufrdec import LazySection4
+from bufrpy.compact import CompactSubset
+from collections import OrderedDict
+import hashlib
+import sys
+import threading
+
+# Estimated memory of a value of a BufrSubset: the BufrValue, its raw
+# value and value, and its slot in a list
+VALUE_SIZE = 128
+# Estimated memory of a textual value kept in a list
+TEXT_SIZE = 64
+# Estimated memory of the sections of a message other than Section 4
+MESSAGE_SIZE = 2048
+
+def message_size(msg):
+    """
+    Estimate the memory held by a decoded message, in bytes.
+
+    Values of :class:`.BufrSubset` objects are counted at
+    :data:`VALUE_SIZE` bytes each, and the arrays of
+    :class:`.CompactSubset` objects and columns by their size. Values
+    of repeated replications are counted each time they are repeated,
+    although they are stored once. An undecoded
+    :class:`.LazySection4` is counted by the size of its data, and
+    grows when it is decoded.
+
+    :param Message msg: Decoded message
+    :return: Estimated size in bytes
+    :rtype: int
+    """
+    # Not msg.section4, which decodes a lazy section
+    section4 = msg[4]
+    if isinstance(section4, LazySection4):
+        if not section4.decoded:
+            return MESSAGE_SIZE + sys.getsizeof(section4.data)
+        section4 = section4.decode()
+    if section4 is None:
+        return MESSAGE_SIZE
+    columns = getattr(section4, 'columns', None)
+    if columns is not None:
+        return MESSAGE_SIZE + sum(_column_size(column) for column in columns)
+    size = MESSAGE_SIZE
+    n_values = 0
+    for subset in section4.subsets:
+        if isinstance(subset, CompactSubset):
+            size += _compact_size(subset)
+            continue
+        stack = [subset.values]
+        while stack:
+            values = stack.pop()
+            n_values += len(values)
+            stack.extend([value for value in values if isinstance(value, list)])
+    return size + n_values * VALUE_SIZE
+
+def _column_size(column):
+    size = sys.getsizeof(column)
+    for a in (column.values, column.missing, column.offsets):
+        if a is not None:
+            size += sys.getsizeof(a)
+            if isinstance(a, list):
+                size += len(a) * TEXT_SIZE
+    return size
+
+def _compact_size(subset):
+    size = sys.getsizeof(subset)
+    for a in (subset._index, subset._raw, subset._items, subset._starts, subset._ends):
+        if a is not None:
+            size += sys.getsizeof(a)
+    if subset._objects is not None:
+        size += sys.getsizeof(subset._objects) + len(subset._objects) * TEXT_SIZE
+    return size
+
+class MessageCache(object):
+    """
+    Bounded LRU cache of decoded :class:`.Message` objects.
+
+    The cache keeps at most maxsize messages, whose total estimated
+    size in memory, see :func:`message_size`, is at most maxbytes.
+    Least recently used messages are
+    evicted first. Lazy messages are counted undecoded when they are
+    added, and by their decoded size once they have been decoded and
+    the cache adds another message or returns them again. Like
+    :class:`.PlanCache`, the cache keeps a reference to each table it
+    has messages for, so tables must not be modified after they have
+    been used for decoding.
+
+    :ivar int maxsize: Maximum number of messages to keep, 0 disables caching
+    :ivar int maxbytes: Maximum total estimated size of the messages kept, in bytes of memory
+    :ivar int nbytes: Total estimated size of the messages kept, in bytes of memory
+    :ivar int hits: Number of cache hits
+    :ivar int misses: Number of cache misses
+    """
+    def __init__(self, maxsize=1024, maxbytes=64 << 20):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._messages = OrderedDict()
+        # Keys of lazy messages cached before their Section 4 was decoded
+        self._lazy = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, data, b_table, options, build):
+        """
+        Get decoded message for message bytes, decoding it if necessary.
+
+        Results of build that are None are not cached, nor are
+        exceptions raised by it.
+
+        :param bytes|memoryview data: The message, from the start token to the end token
+        :param Mapping|Template b_table: Table or template the message is decoded with
+        :param tuple options: Hashable decoding options, messages decoded with other options are cached separately
+        :param build: Function of no arguments that decodes the message on cache miss
+        :return: Cached or newly decoded message
+        :rtype: Message
+        """
+        key = (hashlib.blake2b(data, digest_size=16).digest(), len(data), id(b_table), options)
+        with self._lock:
+            # Entries keep b_table alive, so its id is not reused while they are cached
+            entry = self._messages.get(key)
+            if entry is not None:
+                self._messages.move_to_end(key)
+                self.hits += 1
+                if key in self._lazy:
+                    self._account(key)
+                    self._evict()
+                return entry[1]
+            self.misses += 1
+
+        msg = build()
+
+        if msg is None or self.maxsize <= 0:
+            return msg
+        size = message_size(msg)
+        if size <= self.maxbytes:
+            with self._lock:
+                old = self._messages.pop(key, None)
+                if old is not None:
+                    self.nbytes -= old[2]
+                self._messages[key] = (b_table, msg, size)
+                self.nbytes += size
+                for lazy in list(self._lazy):
+                    self._account(lazy)
+                section4 = msg[4]
+                if isinstance(section4, LazySection4) and not section4.decoded:
+                    self._lazy[key] = None
+                self._evict()
+        return msg
+
+    def _account(self, key):
+        # Re-estimate the size of a lazy message once it has been decoded
+        entry = self._messages.get(key)
+        if entry is None:
+            del self._lazy[key]
+        elif entry[1][4].decoded:
+            del self._lazy[key]
+            size = message_size(entry[1])
+            self._messages[key] = entry[:2] + (size,)
+            self.nbytes += size - entry[2]
+
+    def _evict(self):
+        while len(self._messages) > self.maxsize or self.nbytes > self.maxbytes:
+            self.nbytes -= self._messages.popitem(last=False)[1][2]
+
+    def clear(self):
+        """
+        Remove all messages from the cache and reset counters
+        """
+        with self._lock:
+            self._messages.clear()
+            self._lazy.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._messages)
@@ -0,0 +1,184 @@
+"""
+Columnar representation of decoded Section 4 data.
+
+Instead of one :class:`.BufrValue` per value, columnar decoding
+produces one :class:`.Column` per element position in the decoding
+plan. Numeric values are stored in :py:class:`array.array` objects,
+which can be passed to e.g. ``numpy.frombuffer`` without copying.
+"""
+
+from array import array
+from collections import namedtuple
+
+class Column(namedtuple("_Column", ["position", "descriptor", "values", "missing", "offsets"])):
+    """
+    Values of one element position for all subsets.
+
+    Values of subset ``i`` are ``values[offsets[i]:offsets[i+1]]``. If
+    the element occurs exactly once in every subset, ``offsets`` is
+    None and the value of subset ``i`` is ``values[i]``. Elements
+    inside replications occur once per replication.
+
+    :ivar int position: Index of the instruction in the decoding plan
+    :ivar ElementDescriptor descriptor: Descriptor of the element, shared by all values
+    :ivar values: Decoded values, array of doubles ('d') or 64-bit integers ('q') for numeric and list of strings for textual elements. Missing numeric values are stored as 0.
+    :ivar array missing: Missing value mask, 1 for missing values and 0 otherwise
+    :ivar array offsets: Start offset of each subset in values, plus total length, or None
+    """
+    __slots__ = ()
+
+class ColumnarSection4(namedtuple("_ColumnarSection4", ["length", "n_subsets", "columns"])):
+    """
+    Section 4 of a BUFR message, decoded into columns.
+
+    :ivar int length: Length of Section 4
+    :ivar int n_subsets: Number of data subsets
+    :ivar columns: List of :class:`.Column` objects, in plan order
+    """
+    __slots__ = ()
+
+class _ColumnData(object):
+    __slots__ = ("position", "descriptor", "values", "missing", "counts")
+
+    def __init__(self, position, descriptor):
+        self.position = position
+        self.descriptor = descriptor
+        self.values = None
+        self.missing = array('b')
+        self.counts = []
+
+    def append(self, value):
+        if self.values is None:
+            if isinstance(value, str):
+                self.values = []
+            elif isinstance(value, float):
+                self.values = array('d')
+            else:
+                self.values = array('q')
+        if value is None:
+            self.missing.append(1)
+            value = 0 if not isinstance(self.values, list) else None
+        else:
+            self.missing.append(0)
+            if isinstance(value, float) and not isinstance(self.values, list) and self.values.typecode == 'q':
+                self.values = array('d', self.values)
+        self.values.append(value)
+
+class ColumnBuilder(object):
+    """
+    Collects decoded values into columns.
+
+    Uncompressed data is collected one subset at a time, with
+    :py:meth:`end_subset` called after each subset. Compressed data is
+    collected one element at a time, with values for all subsets
+    appended at once.
+
+    :ivar int n_subsets: Number of subsets
+    :ivar bool compressed: Whether the values come from compressed data
+    """
+    def __init__(self, n_subsets, compressed):
+        self.n_subsets = n_subsets
+        self.compressed = compressed
+        self._columns = {}
+        self._subsets_done = 0
+
+    def _column(self, key, position, descriptor):
+        column = self._columns.get(key, None)
+        if column is None:
+            column = _ColumnData(position, descriptor)
+            # Subsets decoded before this element was first seen had no values
+            column.counts = [0] * self._subsets_done
+            self._columns[key] = column
+        return column
+
+    def append(self, position, value, associated=False):
+        """
+        Append value of element at position of the plan.
+
+        :param int position: Index of the instruction in the decoding plan
+        :param BufrValue value: Value to append
+        :param bool associated: Whether the value is an associated field of the element
+        """
+        self._column((position, not associated), position, value.descriptor).append(value.value)
+
+    def extend(self, position, values, associated=False):
+        """
+        Append values of all subsets of compressed element at position of the plan.
+
+        :param int position: Index of the instruction in the decoding plan
+        :param values: Values to append, one per subset
+        :param bool associated: Whether the values are associated fields of the element
+        """
+        if values:
+            column = self._column((position, not associated), position, values[0].descriptor)
+            for value in values:
+                column.append(value.value)
+
+    def mark(self):
+        """
+        Mark current lengths of columns, for use with :py:meth:`repeat`.
+        """
+        return dict((key, len(column.missing)) for key, column in self._columns.items())
+
+    def repeat(self, mark, start, end, count):
+        """
+        Repeat values of plan positions start..end appended after mark.
+
+        Used for delayed repetition, where values present once in the
+        data are output count times.
+        """
+        for key, column in self._columns.items():
+            if not start <= key[0] < end or column.values is None:
+                continue
+            begin = mark.get(key, 0)
+            values = column.values[begin:]
+            missing = column.missing[begin:]
+            del column.values[begin:]
+            del column.missing[begin:]
+            for _ in range(count):
+                column.values.extend(values)
+                column.missing.extend(missing)
+
+    def end_subset(self):
+        """
+        Finish subset of uncompressed data.
+        """
+        for column in self._columns.values():
+            column.counts.append(len(column.missing))
+        self._subsets_done += 1
+
+    def columns(self):
+        """
+        Build the columns.
+
+        :return: Columns, in plan order, associated fields before their elements
+        :rtype: list of Column
+        """
+        result = []
+        n = self.n_subsets
+        for key in sorted(self._columns):
+            column = self._columns[key]
+            values = column.values if column.values is not None else array('q')
+            missing = column.missing
+            if self.compressed:
+                per_subset = len(missing) // n if n else 0
+                if per_subset == 1:
+                    offsets = None
+                else:
+                    # Values were appended one element at a time, reorder subset by subset
+                    values = _transpose(values, n)
+                    missing = _transpose(missing, n)
+                    offsets = array('q', [i * per_subset for i in range(n + 1)])
+            else:
+                if column.counts == list(range(1, n + 1)):
+                    offsets = None
+                else:
+                    offsets = array('q', [0] + column.counts)
+            result.append(Column(column.position, column.descriptor, values, missing, offsets))
+        return result
+
+def _transpose(values, n):
+    result = values[:0]
+    for subset in range(n):
+        result.extend(values[subset::n])
+    return result
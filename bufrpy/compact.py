@@ -0,0 +1,247 @@
+"""
+Compact representation of decoded subsets.
+
+Instead of nested lists of :class:`.BufrValue` objects, compact
+decoding stores the raw values of each subset in an
+:py:class:`array.array`, together with the index of the
+:class:`.Converter` of each value in a list shared by all subsets of
+the message. Replications are stored as ranges of items. Decoded
+values are computed from the raw values when they are accessed, so a
+value takes 12 bytes instead of more than a hundred.
+"""
+
+from array import array
+
+# Set in the converter index of values whose raw value is stored in
+# the list of objects instead of the array of raw values, e.g. text
+_OBJECT = 1 << 31
+
+_MAX_RAW = (1 << 64) - 1
+
+class CompactSubset(object):
+    """
+    Data subset that stores its values in arrays.
+
+    Can be used in place of a :class:`.BufrSubset`. Accessing
+    :py:attr:`values` builds the same nested lists of
+    :class:`.BufrValue` objects as a :class:`.BufrSubset` holds. The
+    lists are built anew on each access, so keep a reference to them
+    when they are used repeatedly.
+
+    :ivar list converters: Converters of the values of the message, shared by its subsets
+    """
+    __slots__ = ("converters", "_index", "_raw", "_objects", "_items", "_starts", "_ends")
+
+    def __init__(self, converters, index, raw, objects, items, starts, ends):
+        self.converters = converters
+        self._index = index
+        self._raw = raw
+        self._objects = objects
+        self._items = items
+        self._starts = starts
+        self._ends = ends
+
+    def __len__(self):
+        """
+        Number of values stored, values of repeated replications are stored once
+        """
+        return len(self._raw)
+
+    def value(self, i):
+        """
+        Decode i'th stored value, in order of the data.
+
+        :rtype: BufrValue
+        """
+        index = self._index[i]
+        if index & _OBJECT:
+            return self.converters[index & ~_OBJECT](self._objects[self._raw[i]])
+        return self.converters[index](self._raw[i])
+
+    @property
+    def values(self):
+        """
+        Subset data as a list of BufrValues, with replications as nested lists
+        """
+        if self._items is None:
+            # No replications
+            value = self.value
+            return [value(i) for i in range(len(self._raw))]
+        return self._build(len(self._starts)-1, {})
+
+    def _build(self, k, built):
+        # Lists of repetitions are shared, like in BufrSubset
+        result = built.get(k, None)
+        if result is None:
+            result = built[k] = []
+            value = self.value
+            for item in self._items[self._starts[k]:self._ends[k]]:
+                result.append(value(item) if item >= 0 else self._build(-item-1, built))
+        return result
+
+    @property
+    def nbytes(self):
+        """
+        Size of the arrays of the subset, in bytes
+        """
+        size = len(self._raw) * (self._raw.itemsize + self._index.itemsize)
+        if self._items is not None:
+            size += (len(self._items) + len(self._starts) + len(self._ends)) * self._items.itemsize
+        return size
+
+    def __eq__(self, other):
+        if isinstance(other, CompactSubset) or hasattr(other, 'values'):
+            return self.values == other.values
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "CompactSubset(values=%r)" %(self.values,)
+
+class _SubsetData(object):
+    __slots__ = ("index", "raw", "objects", "items", "starts", "ends")
+
+    def __init__(self):
+        self.index = array('I')
+        self.raw = array('Q')
+        self.objects = None
+        self.items = None
+        self.starts = None
+        self.ends = None
+
+    def append(self, index, raw):
+        token = len(self.raw)
+        if isinstance(raw, int) and 0 <= raw <= _MAX_RAW:
+            self.index.append(index)
+            self.raw.append(raw)
+        else:
+            if self.objects is None:
+                self.objects = []
+            self.index.append(index | _OBJECT)
+            self.raw.append(len(self.objects))
+            self.objects.append(raw)
+        return token
+
+    def list(self, tokens):
+        if self.items is None:
+            self.items = array('i')
+            self.starts = array('i')
+            self.ends = array('i')
+        self.starts.append(len(self.items))
+        self.items.extend(tokens)
+        self.ends.append(len(self.items))
+        return -len(self.starts)
+
+    def aggregate(self, lists):
+        # Replication of lists of tokens, the same list repeated is stored once
+        tokens = []
+        stored = {}
+        for l in lists:
+            token = stored.get(id(l), None)
+            if token is None:
+                token = stored[id(l)] = self.list(l)
+            tokens.append(token)
+        return self.list(tokens)
+
+    def finish(self, converters, tokens):
+        if self.items is not None:
+            # The subset itself is the last list
+            self.list(tokens)
+        return CompactSubset(converters, self.index, self.raw, self.objects, self.items, self.starts, self.ends)
+
+class CompactBuilder(object):
+    """
+    Collects decoded raw values into :class:`.CompactSubset` objects.
+
+    The decoder passes tokens that stand for values and replications
+    instead of :class:`.BufrValue` objects and lists of them.
+    Uncompressed data is collected one subset at a time, with
+    :py:meth:`end_subset` called after each subset. Compressed data is
+    collected one element at a time for all subsets.
+
+    :ivar int n_subsets: Number of subsets
+    :ivar bool compressed: Whether the values come from compressed data
+    :ivar list converters: Converters of the values, shared by the subsets
+    """
+    def __init__(self, n_subsets, compressed):
+        self.n_subsets = n_subsets
+        self.compressed = compressed
+        self.converters = []
+        self._indices = {}
+        if compressed:
+            self._subsets = [_SubsetData() for _ in range(n_subsets)]
+        else:
+            self._current = _SubsetData()
+
+    def _index(self, conv):
+        # Converters are kept in the list, so their ids stay unique
+        index = self._indices.get(id(conv), None)
+        if index is None:
+            index = self._indices[id(conv)] = len(self.converters)
+            self.converters.append(conv)
+        return index
+
+    def value(self, conv, raw):
+        """
+        Add raw value of uncompressed data.
+
+        :param Converter conv: Converter of the value
+        :param int|str raw: Raw value
+        :return: Token of the value
+        """
+        return self._current.append(self._index(conv), raw)
+
+    def aggregate(self, lists):
+        """
+        Add replication of uncompressed data.
+
+        :param lists: Lists of tokens, one per replication
+        :return: Token of the replication
+        """
+        return self._current.aggregate(lists)
+
+    def end_subset(self, tokens):
+        """
+        Finish subset of uncompressed data.
+
+        :param tokens: Tokens of the values of the subset
+        :rtype: CompactSubset
+        """
+        subset = self._current.finish(self.converters, tokens)
+        self._current = _SubsetData()
+        return subset
+
+    def extend(self, conv, raws):
+        """
+        Add raw values of compressed element for all subsets.
+
+        :param Converter conv: Converter of the values
+        :param raws: Raw values, one per subset
+        :return: List of tokens, one per subset
+        """
+        index = self._index(conv)
+        return [subset.append(index, raw) for subset, raw in zip(self._subsets, raws)]
+
+    def aggregate_subset(self, subset_idx, lists):
+        """
+        Add replication of compressed data to one subset.
+
+        :param int subset_idx: Index of the subset
+        :param lists: Lists of tokens, one per replication
+        :return: Token of the replication
+        """
+        return self._subsets[subset_idx].aggregate(lists)
+
+    def subsets(self, tokens):
+        """
+        Finish compressed data.
+
+        :param tokens: Lists of tokens of the values, one per subset
+        :return: List of :class:`.CompactSubset` objects
+        """
+        return [subset.finish(self.converters, t) for subset, t in zip(self._subsets, tokens)]
@@ -1,4 +1,4 @@
-from bufrpy.util import int2fxy
+from bufrpy.util import int2fxy, fxy2int
 from collections import namedtuple
 from abc import ABCMeta, abstractproperty
 try:
@@ -253,6 +253,45 @@ class ElementDescriptor(namedtuple('_ElementDescriptor', ['code', 'length', 'sca
     def code_descriptor(self):
         return 'FLAG' in self.unit or 'TABLE' in self.unit
 
+#: Code of the dummy descriptor of associated fields, 999999, like in Geo::BUFR and libbufr
+ASSOCIATED_FIELD = fxy2int("999999")
+
+#: Code of ASSOCIATED FIELD SIGNIFICANCE, 031021, which has no associated field itself
+ASSOCIATED_FIELD_SIGNIFICANCE = fxy2int("031021")
+
+#: Maximum number of descriptors to intern, the pool is emptied when full
+DESCRIPTOR_POOL_SIZE = 4096
+
+_descriptor_pool = {}
+
+def intern_descriptor(code, length, scale, ref, significance, unit):
+    """
+    Get shared element descriptor with given fields.
+
+    Used for descriptors derived while decoding, e.g. by operators
+    that change reference values or add associated fields, so that
+    each distinct derived descriptor is created once and shared by
+    all values and messages that use it.
+
+    :rtype: ElementDescriptor
+    """
+    key = (code, length, scale, ref, significance, unit)
+    descriptor = _descriptor_pool.get(key, None)
+    if descriptor is None:
+        if len(_descriptor_pool) >= DESCRIPTOR_POOL_SIZE:
+            _descriptor_pool.clear()
+        descriptor = _descriptor_pool[key] = ElementDescriptor(*key)
+    return descriptor
+
+def associated_field_descriptor(width):
+    """
+    Get shared dummy descriptor of associated fields of width bits.
+
+    :param int width: Width of the associated field, in bits
+    :rtype: ElementDescriptor
+    """
+    return intern_descriptor(ASSOCIATED_FIELD, width, 0, 0, "ASSOCIATED FIELD", "NUMERIC")
+
 class ReplicationDescriptor(namedtuple('ReplicationDescriptor', ['code', 'length', 'fields', 'count', 'significance'])):
     """Describes a repeating collection of values
     
@@ -0,0 +1,253 @@
+"""
+Locating BUFR messages in buffers and files without decoding them.
+
+Message candidates are found by searching for the BUFR start token
+and accepted only if the total length in Section 0 points to a 7777
+end token. Accepted messages are skipped over as a whole, so start
+tokens that occur inside message data are never considered.
+"""
+
+from bufrpy.util import BUFFER_TYPES
+from collections import namedtuple
+import mmap
+import os
+import re
+
+START_TOKEN = b'BUFR'
+END_TOKEN = b'7777'
+# Section 0 and Section 5 are always present
+MIN_LENGTH = 12
+DEFAULT_BLOCK_SIZE = 1 << 20
+
+_START_PATTERN = re.compile(START_TOKEN)
+
+class MessageLocation(namedtuple("_MessageLocation", ["offset", "length", "edition"])):
+    """
+    Location of a BUFR message in a buffer or file.
+
+    :ivar int offset: Offset of the start token, in bytes
+    :ivar int length: Total length of the message from Section 0, in bytes
+    :ivar int edition: BUFR edition number from Section 0
+    """
+    __slots__ = ()
+
+class FramingError(ValueError):
+    """
+    Start token that does not begin a well-formed BUFR message.
+
+    :ivar int offset: Offset of the start token, in bytes
+    """
+    def __init__(self, offset, reason):
+        ValueError.__init__(self, "Invalid BUFR message at offset %d: %s" %(offset, reason))
+        self.offset = offset
+        self.reason = reason
+
+    def __reduce__(self):
+        return (FramingError, (self.offset, self.reason))
+
+def _check_frame(buf, offset, available):
+    """
+    Check message candidate at offset of buf, where available bytes are present.
+
+    Returns (length, edition, reason), where reason is None for valid messages.
+    """
+    if available < 8:
+        return 0, None, "truncated Section 0"
+    length = int.from_bytes(buf[offset+4:offset+7], 'big')
+    edition = buf[offset+7]
+    if length < MIN_LENGTH:
+        return length, edition, "invalid length %d" %length
+    if length > available:
+        return length, edition, "truncated message, length %d, only %d bytes available" %(length, available)
+    if buf[offset+length-4:offset+length] != END_TOKEN:
+        return length, edition, "no end token at length %d" %length
+    return length, edition, None
+
+def scan_buffer(buf, start=0):
+    """
+    Scan buffer for BUFR messages.
+
+    Yields a :class:`.MessageLocation` for each well-formed message and
+    a :class:`.FramingError` for each start token that does not begin
+    one.
+
+    :param bytes|bytearray|memoryview|mmap buf: Buffer to scan
+    :param int start: Offset to start scanning from
+    """
+    view = memoryview(buf).cast('B')
+    try:
+        end = len(view)
+        pos = start
+        while True:
+            match = _START_PATTERN.search(view, pos)
+            if match is None:
+                return
+            offset = match.start()
+            length, edition, reason = _check_frame(view, offset, end - offset)
+            if reason is None:
+                yield MessageLocation(offset, length, edition)
+                pos = offset + length
+            else:
+                yield FramingError(offset, reason)
+                pos = offset + len(START_TOKEN)
+    finally:
+        view.release()
+
+class Framer(object):
+    """
+    Incremental framing of BUFR messages from chunks of data.
+
+    Data is added with :py:meth:`feed` and frames are taken out with
+    :py:meth:`next`, so the same framing can be used with any source of
+    data. Offsets are relative to the first byte fed.
+
+    :ivar int needed: Number of bytes that must be buffered for the next frame, valid after :py:meth:`next` returns None
+    """
+    def __init__(self):
+        self.buf = bytearray()
+        self.base = 0 # offset of buf[0] relative to the first byte fed
+        self.pos = 0 # position in buf to search from
+        self.needed = 1
+
+    def feed(self, data):
+        """
+        Add data to the end of the buffer.
+        """
+        self.buf.extend(data)
+
+    def missing(self):
+        """
+        Number of bytes to feed before calling :py:meth:`next` again.
+        """
+        return max(self.needed - len(self.buf), 1)
+
+    def next(self, eof=False):
+        """
+        Take next frame out of the buffer.
+
+        Returns a pair of a :class:`.MessageLocation` and the message
+        bytes for a well-formed message, a pair of a
+        :class:`.FramingError` and None for a start token that does
+        not begin one, or None if more data is needed. At the end of
+        data, eof should be True, in which case None means that there
+        are no more frames.
+
+        :param bool eof: Whether all data has been fed
+        """
+        buf = self.buf
+        while True:
+            offset = buf.find(START_TOKEN, self.pos)
+            if offset < 0:
+                # Keep the tail in case the start token spans chunks
+                keep = max(len(buf) - (len(START_TOKEN) - 1), self.pos)
+                del buf[:keep]
+                self.base += keep
+                self.pos = 0
+                self.needed = len(buf) + 1
+                return None
+
+            available = len(buf) - offset
+            if available < 8 and not eof:
+                self.needed = offset + 8
+                return None
+            length, edition, reason = _check_frame(buf, offset, available)
+            if reason is not None and length >= MIN_LENGTH and length > available and not eof:
+                # Length is plausible, wait for the rest of the message
+                self.needed = offset + length
+                return None
+
+            if reason is None:
+                frame = MessageLocation(self.base + offset, length, edition), bytes(buf[offset:offset+length])
+                del buf[:offset+length]
+                self.base += offset + length
+                self.pos = 0
+                return frame
+            self.pos = offset + len(START_TOKEN)
+            return FramingError(self.base + offset, reason), None
+
+def scan_file(f, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Scan file for BUFR messages, reading it in blocks.
+
+    Yields pairs of a :class:`.MessageLocation` and the message bytes
+    for each well-formed message, and pairs of a
+    :class:`.FramingError` and None for each start token that does not
+    begin one. Memory use is bounded by the block size and the size of
+    the largest message. Offsets are relative to the position of the
+    file when scanning starts.
+
+    :param file f: File opened in binary mode
+    :param int block_size: Number of bytes to read at a time
+    """
+    framer = Framer()
+    eof = False
+    while True:
+        frame = framer.next(eof)
+        if frame is not None:
+            yield frame
+        elif eof:
+            return
+        else:
+            block = f.read(max(block_size, framer.missing()))
+            if block:
+                framer.feed(block)
+            else:
+                eof = True
+
+def open_buffer(path):
+    """
+    Map file to memory for scanning and decoding.
+
+    :param str path: Path of the file
+    :return: Read-only memory map of the file, or empty bytes for an empty file
+    :rtype: mmap|bytes
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def iter_locations(source, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Locate well-formed BUFR messages in a buffer, file or path.
+
+    :param source: Buffer, file opened in binary mode or path of a file
+    :param int block_size: Number of bytes to read at a time from files
+    :return: Iterator of :class:`.MessageLocation` objects
+    """
+    if isinstance(source, BUFFER_TYPES):
+        for frame in scan_buffer(source):
+            if not isinstance(frame, FramingError):
+                yield frame
+    elif isinstance(source, str) or hasattr(source, '__fspath__'):
+        buf = open_buffer(source)
+        try:
+            for frame in iter_locations(buf):
+                yield frame
+        finally:
+            if isinstance(buf, mmap.mmap):
+                buf.close()
+    else:
+        for frame, data in scan_file(source, block_size):
+            if not isinstance(frame, FramingError):
+                yield frame
+
+def index_messages(source):
+    """
+    Build an index of well-formed BUFR messages without decoding them.
+
+    :param source: Buffer, file opened in binary mode or path of a file
+    :return: Locations of the messages, in order of appearance
+    :rtype: list of MessageLocation
+    """
+    return list(iter_locations(source))
+
+def count_messages(source):
+    """
+    Count well-formed BUFR messages without decoding them.
+
+    :param source: Buffer, file opened in binary mode or path of a file
+    :return: Number of messages
+    :rtype: int
+    """
+    return sum(1 for _ in iter_locations(source))
@@ -1,5 +1,5 @@
 from bufrpy.descriptors import ElementDescriptor, ReplicationDescriptor, OperatorDescriptor, SequenceDescriptor, LazySequenceDescriptor, StrongSequenceDescriptor
-from bufrpy.value import _decode_raw_value, BufrSubset
+from bufrpy.value import converter, BufrValue, BufrSubset, TEXT
 from bufrpy.bufrdec import Message, Section3, Section4
 from bufrpy.util import int2fxy
 
@@ -32,41 +32,56 @@ def to_json(msg):
 
     """
 
+    return {"descriptors":msg.section3.descriptors, "data":list(to_json_subsets(msg))}
+
+def to_json_subsets(msg):
+    """Convert the subsets of a BUFR message into JSON-encodable form one at a time.
+
+    Yields the items of ``"data"`` in the dict returned by
+    :py:func:`to_json`, so that messages with many subsets can be
+    written out without converting all of them first.
+
+    :param Message msg: Message to convert
+    :returns: Iterator of lists that can be converted to JSON using the standard json module
+    """
+
     flat_descriptors = flatten_descriptors(msg.section3.descriptors)
 
     descriptor_index = {} # code -> index
     for i,descriptor in enumerate(flat_descriptors):
         descriptor_index[descriptor.code] = i
 
-    def to_json_data(subsets):
-        return [to_json_subset(subset.values) for subset in subsets]
-        
     def to_json_subset(values):
         result = []
         for el in values:
             if isinstance(el, list):
                 result.append(to_json_subset(el))
             else:
-                result.append({"desc":descriptor_index[el.descriptor.code], "val":el.raw_value})
+                result.append({"desc":descriptor_index[el.descriptor.code], "val":el.raw_hex})
         return result
 
-    result = {"descriptors":msg.section3.descriptors, "data":to_json_data(msg.section4.subsets)}
-    return result
+    for subset in msg.section4.subsets:
+        yield to_json_subset(subset.values)
 
-def from_json(json_obj):
-    """Convert an object decoded from JSON into a BUFR message
+#: Maximum number of descriptor sets to cache, the cache is emptied when full
+DESCRIPTOR_CACHE_SIZE = 256
 
-    The conversion reads partial contents of BUFR sections 3 and 4 from a dict
-    generated by :py:func:`to_json`.
+_descriptor_sets = {}
 
-    The resulting :class:`bufrpy.Message` contains only section 3 and 4, and the
-    sections only contain descriptors and data, respectively.
+def _hashable(descriptor_def):
+    return tuple(_hashable(x) if isinstance(x, list) else x for x in descriptor_def)
 
-    :param dict json_obj: JSON object to decode
-    :returns: BUFR message with original descriptors and data
-    :rtype: Message
+def _descriptor_set(descriptor_defs):
+    """
+    Descriptors decoded from JSON, their flattened descriptors and the converters of the flattened descriptors.
 
+    Cached by the JSON form of the descriptors, so messages with the
+    same descriptors share them.
     """
+    key = _hashable(descriptor_defs)
+    entry = _descriptor_sets.get(key, None)
+    if entry is not None:
+        return entry
 
     def sequence_decoder(code, length, codes, significance, sub_descriptors):
         sub_descriptors = [decode_descriptor(s) for s in sub_descriptors]
@@ -74,31 +89,115 @@ def from_json(json_obj):
 
     descriptor_types = {0:ElementDescriptor, 1:ReplicationDescriptor, 2:OperatorDescriptor, 3:sequence_decoder}
     def decode_descriptor(descriptor_def):
-        descriptors = []
         dtype = descriptor_def[0] >> 14 & 0x3
-        klass = descriptor_types[dtype]
         return descriptor_types[dtype](*descriptor_def)
 
-        
-    descriptors = []
-    for descriptor_def in json_obj["descriptors"]:
-        descriptors.append(decode_descriptor(descriptor_def))
-
+    descriptors = [decode_descriptor(descriptor_def) for descriptor_def in descriptor_defs]
     flat_descriptors = flatten_descriptors(descriptors)
+    converters = [converter(d) if isinstance(d, ElementDescriptor) else None for d in flat_descriptors]
+    entry = (descriptors, flat_descriptors, converters)
+    if len(_descriptor_sets) >= DESCRIPTOR_CACHE_SIZE:
+        _descriptor_sets.clear()
+    _descriptor_sets[key] = entry
+    return entry
+
+def _convert_column(conv, raw_values):
+    # Values of one descriptor at once, with the scale and reference value of the converter
+    if conv.kind == TEXT:
+        return list(map(conv, raw_values))
+    factor, ref, missing, descriptor = conv.factor, conv.ref, conv.missing, conv.descriptor
+    new = tuple.__new__
+    return [new(BufrValue, (raw, None if raw == missing else factor * (raw + ref), descriptor)) for raw in raw_values]
+
+def _decode_subsets(subsets, converters):
+    """
+    Decode subsets from JSON into nested lists of values.
 
-    def decode_data(subsets):
-        return [BufrSubset(decode_subset(subset)) for subset in subsets]
-
-    def decode_subset(json_data):
-        result = []
+    Raw values are collected by descriptor, converted a descriptor at a
+    time and put back in place.
+    """
+    columns = [[] for _ in converters]
+    def collect(json_data):
         for el in json_data:
             if isinstance(el, dict):
-                descriptor = flat_descriptors[el["desc"]]
-                result.append(_decode_raw_value(el["val"], descriptor))
+                columns[el["desc"]].append(el["val"])
             else:
-                result.append(decode_subset(el))
-        return result
+                collect(el)
+    for subset in subsets:
+        collect(subset)
+
+    values = [iter(_convert_column(conv, column)) if column else None for conv, column in zip(converters, columns)]
+    def build(json_data):
+        return [next(values[el["desc"]]) if isinstance(el, dict) else build(el) for el in json_data]
+    return [build(subset) for subset in subsets]
+
+class JsonSubset(object):
+    """
+    Data subset read from JSON whose values are decoded when accessed.
+
+    Can be used in place of a :class:`.BufrSubset`. Keeps the subset in
+    the form produced by :py:func:`to_json`, accessing
+    :py:attr:`values` decodes it into the same nested lists of
+    :class:`.BufrValue` objects as a :class:`.BufrSubset` holds. The
+    lists are built anew on each access, so keep a reference to them
+    when they are used repeatedly.
+
+    :ivar list converters: Converters of the flattened descriptors of the message
+    :ivar list data: Subset in JSON form
+    """
+    __slots__ = ("converters", "data")
+
+    def __init__(self, converters, data):
+        self.converters = converters
+        self.data = data
+
+    @property
+    def values(self):
+        """
+        Subset data as a list of BufrValues, with replications as nested lists
+        """
+        return _decode_subsets([self.data], self.converters)[0]
+
+    def __eq__(self, other):
+        if hasattr(other, 'values'):
+            return self.values == other.values
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "JsonSubset(values=%r)" %(self.values,)
+
+def from_json(json_obj, lazy=False):
+    """Convert an object decoded from JSON into a BUFR message
+
+    The conversion reads partial contents of BUFR sections 3 and 4 from a dict
+    generated by :py:func:`to_json`.
+
+    The resulting :class:`bufrpy.Message` contains only section 3 and 4, and the
+    sections only contain descriptors and data, respectively.
+
+    Values are decoded a descriptor at a time for all subsets of the
+    message. With lazy, subsets are :class:`.JsonSubset` objects that
+    decode their values only when they are accessed. Descriptors are
+    decoded once for all messages with the same descriptors.
+
+    :param dict json_obj: JSON object to decode
+    :param bool lazy: Decode the values of each subset only when it is accessed
+    :returns: BUFR message with original descriptors and data
+    :rtype: Message
+
+    """
+
+    descriptors, flat_descriptors, converters = _descriptor_set(json_obj["descriptors"])
+
+    if lazy:
+        data = [JsonSubset(converters, subset) for subset in json_obj["data"]]
+    else:
+        data = [BufrSubset(values) for values in _decode_subsets(json_obj["data"], converters)]
 
-    data = decode_data(json_obj["data"])
-            
-    return Message(None, None, None, Section3(None, None, None, descriptors), Section4(None, data), None)
+    return Message(None, None, None, Section3(None, None, None, list(descriptors)), Section4(None, data), None)
@@ -0,0 +1,182 @@
+"""
+Parallel decoding of BUFR messages with a process pool.
+
+Messages are located in the parent process with
+:py:mod:`bufrpy.framing` and decoded in worker processes in chunks of
+consecutive messages. Files given by path are memory mapped in the
+workers, so only message locations are sent to them. The descriptor
+table is sent to each worker once, when the worker starts.
+"""
+
+from bufrpy.bufrdec import decode
+from bufrpy.framing import scan_buffer, scan_file, open_buffer, FramingError, MessageLocation
+from bufrpy.util import BUFFER_TYPES
+from collections import namedtuple
+import mmap
+import multiprocessing
+import traceback
+
+DEFAULT_CHUNK_SIZE = 64
+
+class DecodeResult(namedtuple("_DecodeResult", ["source", "location", "message", "error"])):
+    """
+    Outcome of decoding one message.
+
+    Exactly one of message and error is set. Start tokens that do not
+    begin a well-formed message are reported with a
+    :class:`.FramingError` and a location whose length is 0.
+
+    :ivar int source: Index of the source in the list of sources
+    :ivar MessageLocation location: Location of the message in the source
+    :ivar Message message: Decoded message, or None
+    :ivar Exception error: Decoding error, or None
+    """
+    __slots__ = ()
+
+class _WorkerState(object):
+    """
+    Per-process decoding state: the descriptor table and the currently open file
+    """
+    def __init__(self, table):
+        if callable(table):
+            table = table()
+        self.table = table
+        self.path = None
+        self.buf = None
+
+    def open(self, path):
+        if path != self.path:
+            self.close()
+            self.buf = open_buffer(path)
+            self.path = path
+        return self.buf
+
+    def close(self):
+        if isinstance(self.buf, mmap.mmap):
+            self.buf.close()
+        self.path = None
+        self.buf = None
+
+    def run(self, task):
+        source, path, frames, columnar = task
+        buf = self.open(path) if path is not None else None
+        results = []
+        for location, data in frames:
+            if data is None:
+                data = memoryview(buf)[location.offset:location.offset+location.length]
+            try:
+                results.append(DecodeResult(source, location, decode(data, self.table, columnar=columnar), None))
+            except Exception as e:
+                # Don't let the traceback keep the memory map exported
+                traceback.clear_frames(e.__traceback__)
+                results.append(DecodeResult(source, location, None, e))
+            finally:
+                if isinstance(data, memoryview):
+                    data.release()
+        return results
+
+_state = None
+
+def _init_worker(table):
+    global _state
+    _state = _WorkerState(table)
+
+def _run(state, task):
+    if isinstance(task, list):
+        # Framing errors, already complete
+        return task
+    return state.run(task)
+
+def _run_task(task):
+    return _run(_state, task)
+
+def _framing_result(source, error):
+    return DecodeResult(source, MessageLocation(error.offset, 0, None), None, error)
+
+def _tasks(sources, columnar, chunk_size):
+    """
+    Split sources into tasks. Framing errors are passed as lists of results instead of tasks.
+    """
+    for source, item in enumerate(sources):
+        if isinstance(item, BUFFER_TYPES):
+            view = memoryview(item).cast('B')
+            frames = ((frame, None if isinstance(frame, FramingError) else bytes(view[frame.offset:frame.offset+frame.length])) for frame in scan_buffer(view))
+            path = None
+        elif hasattr(item, 'read'):
+            frames = scan_file(item)
+            path = None
+        else:
+            buf = open_buffer(item)
+            try:
+                frames = [(frame, None) for frame in scan_buffer(buf)]
+            finally:
+                if isinstance(buf, mmap.mmap):
+                    buf.close()
+            path = item
+
+        chunk = []
+        for frame, data in frames:
+            if isinstance(frame, FramingError):
+                if chunk:
+                    yield (source, path, chunk, columnar)
+                    chunk = []
+                yield [_framing_result(source, frame)]
+            else:
+                chunk.append((frame, data))
+                if len(chunk) >= chunk_size:
+                    yield (source, path, chunk, columnar)
+                    chunk = []
+        if chunk:
+            yield (source, path, chunk, columnar)
+
+def decode_many(sources, b_table, workers=None, ordered=True, columnar=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Decode all BUFR messages of several sources in parallel.
+
+    Results are yielded as :class:`.DecodeResult` objects, one per
+    message, either in the order of the messages in the sources or in
+    the order they are decoded. Decoding errors are reported in the
+    results and do not stop decoding of other messages.
+
+    The table is sent to each worker process once. Instead of a table,
+    b_table may also be a picklable function of no arguments that
+    returns a table, e.g. a :py:func:`functools.partial` of a function
+    that reads the table files, in which case each worker loads the
+    table itself.
+
+    :param sources: Paths of files, files opened in binary mode, or buffers that contain BUFR messages
+    :param Mapping|Template b_table: Either a mapping from BUFR descriptor codes to descriptors or a Template describing the message, or a function that returns one
+    :param int workers: Number of worker processes, defaults to the number of CPUs. With 0 or 1, decodes in the calling process.
+    :param bool ordered: Yield results in message order instead of as they complete
+    :param bool columnar: Decode Section 4 of the messages into :class:`.ColumnarSection4` objects
+    :param int chunk_size: Maximum number of messages to decode in one task
+    :return: Iterator of :class:`.DecodeResult` objects
+    """
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+
+    tasks = _tasks(sources, columnar, chunk_size)
+
+    if workers <= 1:
+        state = _WorkerState(b_table)
+        try:
+            for task in tasks:
+                for result in _run(state, task):
+                    yield result
+        finally:
+            state.close()
+        return
+
+    pool = multiprocessing.Pool(workers, _init_worker, (b_table,))
+    try:
+        if ordered:
+            results = pool.imap(_run_task, tasks)
+        else:
+            results = pool.imap_unordered(_run_task, tasks)
+        for chunk in results:
+            for result in chunk:
+                yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
@@ -0,0 +1,215 @@
+"""
+Compiled decoding plans for Section 4 data.
+
+A decoding plan is a flat program compiled from the strongified
+descriptors of Section 3. Sequences are inlined and replications are
+turned into instructions that refer to the range of instructions that
+make up their body, so decoding a subset does not need to inspect the
+descriptor tree again.
+
+Plans only depend on the descriptors, so they are cached in a bounded
+LRU cache keyed by the descriptor codes and the descriptor table or
+template used to resolve them.
+"""
+
+from bufrpy.descriptors import ElementDescriptor, ReplicationDescriptor, OperatorDescriptor, SequenceDescriptor, OpCode, intern_descriptor
+from bufrpy.util import fxy2int
+from collections import namedtuple, OrderedDict
+import itertools
+import threading
+
+# Instruction kinds. Each instruction is a tuple whose first item is
+# its kind.
+
+# (ELEMENT, descriptor): read a single value
+ELEMENT = 0
+# (REPLICATE, count, body_end): decode instructions up to body_end count times
+REPLICATE = 1
+# (DELAYED_REPLICATE, count_descriptor, body_end, mode): read count, then replicate or repeat body
+DELAYED_REPLICATE = 2
+# (OPERATOR, operator): set or cancel a long-term operator
+OPERATOR = 3
+# (SIGNIFY_CHARACTER, descriptor): read character data described by operator 205
+SIGNIFY_CHARACTER = 4
+# (SIGNIFY_LOCAL, descriptor): read local descriptor with width given by operator 206
+SIGNIFY_LOCAL = 5
+
+# Modes of delayed replication, determined by the count descriptor
+REPLICATION = 0
+REPETITION = 1
+
+REPLICATION_DESCRIPTORS = frozenset([fxy2int("031000"), fxy2int("031001"), fxy2int("031002")])
+REPETITION_DESCRIPTORS = frozenset([fxy2int("031011"), fxy2int("031012")])
+
+class DecodePlan(namedtuple("_DecodePlan", ["descriptors", "instructions"])):
+    """
+    Compiled form of a descriptor list.
+
+    :ivar descriptors: Strongified descriptors the plan was compiled from
+    :ivar instructions: Flat tuple of instructions
+    """
+    __slots__ = ()
+
+def compile_plan(descriptors):
+    """
+    Compile strongified descriptors into a :class:`.DecodePlan`.
+
+    :param descriptors: Strong descriptors, e.g. from Section 3
+    :return: Compiled plan
+    :rtype: DecodePlan
+    :raises NotImplementedError: if the descriptors contain unknown descriptor types
+    :raises ValueError: if a delayed replication is not followed by an element descriptor
+    """
+    descriptors = tuple(descriptors)
+    instructions = []
+    _compile(iter(descriptors), instructions)
+    return DecodePlan(descriptors, tuple(instructions))
+
+def _compile(descriptors, instructions):
+    # Descriptors of enclosing replications and sequences, with the
+    # index of the replication instruction and its count descriptor,
+    # so that nesting does not recurse
+    stack = []
+    while True:
+        descriptor = next(descriptors, None)
+        if descriptor is None:
+            if not stack:
+                return
+            descriptors, start, replication, count_descriptor = stack.pop()
+            if replication is None:
+                # End of sequence
+                continue
+            body_end = len(instructions)
+            if count_descriptor is None:
+                instructions[start] = (REPLICATE, replication.count, body_end)
+            else:
+                if count_descriptor.code in REPLICATION_DESCRIPTORS:
+                    mode = REPLICATION
+                elif count_descriptor.code in REPETITION_DESCRIPTORS:
+                    mode = REPETITION
+                else:
+                    mode = None
+                instructions[start] = (DELAYED_REPLICATE, count_descriptor, body_end, mode)
+        elif isinstance(descriptor, ElementDescriptor):
+            instructions.append((ELEMENT, descriptor))
+        elif isinstance(descriptor, ReplicationDescriptor):
+            if descriptor.count:
+                count_descriptor = None
+            else:
+                count_descriptor = next(descriptors, None)
+                if not isinstance(count_descriptor, ElementDescriptor):
+                    raise ValueError("Unexpected delayed replication element %s" %(count_descriptor,))
+            field_descriptors = list(itertools.islice(descriptors, descriptor.fields))
+            stack.append((descriptors, len(instructions), descriptor, count_descriptor))
+            instructions.append(None) # placeholder, body end is not known yet
+            descriptors = iter(field_descriptors)
+        elif isinstance(descriptor, OperatorDescriptor):
+            op = descriptor.operator
+            if op.immediate:
+                if op.opcode == OpCode.SIGNIFY_CHARACTER:
+                    char_descriptor = intern_descriptor(descriptor.code, op.bits(), 0, 0, "CHARACTER INFORMATION", "CCITTIA5")
+                    instructions.append((SIGNIFY_CHARACTER, char_descriptor))
+                elif op.opcode == OpCode.SIGNIFY_DATA_WIDTH:
+                    base_descriptor = next(descriptors)
+                    mod_descriptor = intern_descriptor(base_descriptor.code, op.operand, base_descriptor.scale, base_descriptor.ref, base_descriptor.significance, base_descriptor.unit)
+                    instructions.append((SIGNIFY_LOCAL, mod_descriptor))
+                else:
+                    raise NotImplementedError("Unknown immediate operator: %s" % str(descriptor))
+            else:
+                instructions.append((OPERATOR, op))
+        elif isinstance(descriptor, SequenceDescriptor):
+            stack.append((descriptors, None, None, None))
+            descriptors = iter(descriptor.descriptors)
+        else:
+            raise NotImplementedError("Unknown descriptor type: %s" % descriptor)
+
+def compile_selection(plan, codes):
+    """
+    Mark the instructions of a plan that produce selected values.
+
+    An element, character data or local descriptor is selected if its
+    code is one of codes. A replication is selected if its body
+    contains a selected instruction, and a delayed replication also if
+    the code of its count is one of codes. Instructions that are not
+    selected are skipped over when decoding.
+
+    :param DecodePlan plan: Plan to select from
+    :param codes: Descriptor codes of the elements to decode, as integers or FXY strings
+    :return: Tuple with one boolean per instruction of the plan
+    """
+    codes = frozenset(fxy2int(code) if isinstance(code, str) else code for code in codes)
+    program = plan.instructions
+    selected = [False] * len(program)
+    # Bodies of replications follow them, so mark backwards
+    for pc in range(len(program)-1, -1, -1):
+        instruction = program[pc]
+        kind = instruction[0]
+        if kind == ELEMENT or kind == SIGNIFY_CHARACTER or kind == SIGNIFY_LOCAL:
+            selected[pc] = instruction[1].code in codes
+        elif kind == REPLICATE:
+            selected[pc] = any(selected[pc+1:instruction[2]])
+        elif kind == DELAYED_REPLICATE:
+            selected[pc] = instruction[1].code in codes or any(selected[pc+1:instruction[2]])
+    return tuple(selected)
+
+class PlanCache(object):
+    """
+    Bounded LRU cache of :class:`.DecodePlan` objects.
+
+    Plans are keyed by the tuple of descriptor codes in Section 3 and
+    the identity of the descriptor table or template. The cache keeps
+    a reference to each table it has plans for, so tables must not be
+    modified after they have been used for decoding.
+
+    :ivar int maxsize: Maximum number of plans to keep, 0 disables caching
+    :ivar int hits: Number of cache hits
+    :ivar int misses: Number of cache misses
+    """
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, codes, descriptor_table, build):
+        """
+        Get plan for descriptor codes, building it if necessary.
+
+        :param tuple codes: Descriptor codes from Section 3
+        :param Mapping|Template descriptor_table: Table or template that resolves the codes
+        :param build: Function of no arguments that builds the plan on cache miss
+        :return: Cached or newly built plan
+        :rtype: DecodePlan
+        """
+        key = (id(descriptor_table), codes)
+        with self._lock:
+            entry = self._plans.pop(key, None)
+            if entry is not None and entry[0] is descriptor_table:
+                self._plans[key] = entry
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        plan = build()
+
+        if self.maxsize > 0:
+            with self._lock:
+                self._plans[key] = (descriptor_table, plan)
+                while len(self._plans) > self.maxsize:
+                    self._plans.popitem(last=False)
+        return plan
+
+    def clear(self):
+        """
+        Remove all plans from the cache and reset counters
+        """
+        with self._lock:
+            self._plans.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._plans)
+
+plan_cache = PlanCache()
@@ -0,0 +1,142 @@
+"""
+Profiling statistics of decoding.
+
+With a :class:`DecodeStats` passed as ``stats`` to
+:func:`bufrpy.decode`, :func:`bufrpy.decode_all` or
+:func:`bufrpy.iter_messages`, the decoder records the time spent in
+each section of the messages, the bits of data read from Section 4,
+the number of values produced per descriptor code, the replication
+counts and the operators activated. Without it, the decoder only
+checks for statistics once per section, replication and operator, so
+the hooks can stay in place in production. There, statistics can be
+collected for a sample of the messages with ``interval``.
+"""
+
+from collections import Counter
+import threading
+import time
+
+# Number of sections in a message, Sections 0 to 5
+N_SECTIONS = 6
+
+class DecodeStats(object):
+    """
+    Statistics of decoded messages.
+
+    The statistics of each profiled message are first collected into
+    a DecodeStats of their own, which is then added to this one and
+    passed to callback. Statistics can be shared by threads. Messages
+    taken from a :class:`.MessageCache` are not profiled, and neither
+    is Section 4 of messages decoded lazily, apart from reading it.
+    Messages that fail to decode are profiled up to the error.
+
+    :ivar int interval: Profile one message in every interval messages
+    :ivar callback: Function called with the statistics of each profiled message, or None
+    :ivar int messages: Number of messages profiled
+    :ivar list times: Seconds spent decoding each of Sections 0 to 5
+    :ivar int bits: Bits of Section 4 data read
+    :ivar Counter values: Number of values produced per descriptor code, associated fields under 999999
+    :ivar Counter replications: Number of replications per replication count, repetitions by the number of times they are repeated
+    :ivar Counter operators: Number of activations per operator, by XX of 2XXYYY
+    """
+    def __init__(self, interval=1, callback=None):
+        self.interval = interval
+        self.callback = callback
+        self.messages = 0
+        self.times = [0.0] * N_SECTIONS
+        self.bits = 0
+        self.values = Counter()
+        self.replications = Counter()
+        self.operators = Counter()
+        self._seen = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        """
+        Start profiling a message, if it is sampled.
+
+        :return: Statistics to collect for the message, or None if it is not profiled
+        :rtype: DecodeStats
+        """
+        if self.interval > 1:
+            with self._lock:
+                seen = self._seen
+                self._seen += 1
+            if seen % self.interval:
+                return None
+        stats = DecodeStats()
+        stats.messages = 1
+        return stats
+
+    def timed(self, section, func, *args):
+        """
+        Call func with args, adding the time spent to section.
+
+        :param int section: Number of the section, from 0 to 5
+        :param func: Function that decodes the section
+        :return: Result of func
+        """
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.times[section] += time.perf_counter() - start
+
+    def count_values(self, section4):
+        """
+        Count values of decoded Section 4 per descriptor code.
+
+        Values of columns are counted by column, including the columns
+        of delayed replication counts.
+
+        :param Section4|ColumnarSection4 section4: Decoded data
+        """
+        values = self.values
+        columns = getattr(section4, 'columns', None)
+        if columns is not None:
+            for column in columns:
+                values[column.descriptor.code] += len(column.values)
+            return
+        codes = []
+        for subset in section4.subsets:
+            stack = [subset.values]
+            while stack:
+                for value in stack.pop():
+                    if isinstance(value, list):
+                        stack.append(value)
+                    else:
+                        codes.append(value.descriptor.code)
+        values.update(codes)
+
+    def add(self, other):
+        """
+        Add statistics of a message to these, and pass them to callback.
+
+        :param DecodeStats other: Statistics from :meth:`start`
+        """
+        with self._lock:
+            self.messages += other.messages
+            for section in range(N_SECTIONS):
+                self.times[section] += other.times[section]
+            self.bits += other.bits
+            self.values.update(other.values)
+            self.replications.update(other.replications)
+            self.operators.update(other.operators)
+        if self.callback is not None:
+            self.callback(other)
+
+    def clear(self):
+        """
+        Reset statistics
+        """
+        with self._lock:
+            self.messages = 0
+            self.times = [0.0] * N_SECTIONS
+            self.bits = 0
+            self.values.clear()
+            self.replications.clear()
+            self.operators.clear()
+            self._seen = 0
+
+    def __repr__(self):
+        return "DecodeStats(messages=%d, times=%r, bits=%d)" %(self.messages, self.times, self.bits)
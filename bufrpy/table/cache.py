@@ -0,0 +1,213 @@
+"""
+Persistent cache of parsed libbufr tables.
+
+Parsing the text tables with :func:`bufrpy.table.libbufr.read_tables`
+takes tens of milliseconds, which short-lived processes pay on every
+start. :func:`read_tables_cached` stores the parsed tables in a
+compact binary form in a cache directory and loads them from there
+when the table files have not changed.
+
+A cache entry records the modification time, size and SHA-256 hash of
+each table file. If the modification time or size of a file differs
+from the recorded one, the file is hashed again, and the entry is used
+only if the hash still matches. Entries that cannot be read, fail
+their checksum, hold malformed descriptors or were written by another
+version of the format are rebuilt.
+
+Sequences are stored with the codes of their constituent descriptors,
+not expanded. Like :func:`bufrpy.table.libbufr.read_tables`, the
+cached table holds them as :class:`.LazySequenceDescriptor` objects
+that look their constituents up in the table, and D-tables may refer
+to codes missing from the B-table, which cannot be expanded at all.
+Sequences are expanded once per message layout by the decoding plans,
+see :mod:`bufrpy.plan`, so expanding them when loading would only
+move that work to every start.
+"""
+
+from bufrpy.descriptors import ElementDescriptor, ReplicationDescriptor, OperatorDescriptor, LazySequenceDescriptor, DescriptorTable
+from bufrpy.table import libbufr
+import hashlib
+import marshal
+import os
+import tempfile
+import zlib
+
+MAGIC = b'BUFRPYTB'
+FORMAT_VERSION = 1
+
+# Tags of descriptor types in cache entries
+_ELEMENT = 0
+_REPLICATION = 1
+_OPERATOR = 2
+_SEQUENCE = 3
+
+def default_cache_dir():
+    """
+    Directory of cached tables.
+
+    Taken from the BUFRPY_CACHE_DIR environment variable if set,
+    otherwise ``bufrpy`` under ``$XDG_CACHE_HOME`` or ``~/.cache``.
+
+    :rtype: str
+    """
+    cache_dir = os.environ.get("BUFRPY_CACHE_DIR")
+    if cache_dir:
+        return cache_dir
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "bufrpy")
+
+def _entry_path(cache_dir, paths):
+    key = hashlib.sha256("\0".join(os.path.realpath(p) for p in paths).encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, "tables-%s.bin" %key[:32])
+
+def _file_info(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+def _hash_file(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _dump(table, infos):
+    rows = []
+    for descriptor in table.table.values():
+        if isinstance(descriptor, ElementDescriptor):
+            rows.append((_ELEMENT, tuple(descriptor)))
+        elif isinstance(descriptor, ReplicationDescriptor):
+            rows.append((_REPLICATION, tuple(descriptor)))
+        elif isinstance(descriptor, OperatorDescriptor):
+            rows.append((_OPERATOR, tuple(descriptor)))
+        elif isinstance(descriptor, LazySequenceDescriptor):
+            rows.append((_SEQUENCE, (descriptor.code, tuple(descriptor.descriptor_codes), descriptor.significance)))
+        else:
+            raise ValueError("Cannot cache descriptor %r" %(descriptor,))
+    payload = marshal.dumps((FORMAT_VERSION, tuple(infos), tuple(rows)))
+    return MAGIC + zlib.crc32(payload).to_bytes(4, 'big') + payload
+
+def _load(data):
+    """
+    Load cache entry. Returns (file infos, rows), or None if the entry is invalid.
+    """
+    header = len(MAGIC) + 4
+    if len(data) < header or data[:len(MAGIC)] != MAGIC:
+        return None
+    payload = data[header:]
+    if zlib.crc32(payload).to_bytes(4, 'big') != data[len(MAGIC):header]:
+        return None
+    try:
+        version, infos, rows = marshal.loads(payload)
+    except (ValueError, EOFError, TypeError):
+        return None
+    if version != FORMAT_VERSION:
+        return None
+    return infos, rows
+
+def _build(rows):
+    descriptors = {}
+    table = DescriptorTable(descriptors)
+    for kind, fields in rows:
+        if kind == _ELEMENT:
+            descriptor = ElementDescriptor(*fields)
+        elif kind == _REPLICATION:
+            descriptor = ReplicationDescriptor(*fields)
+        elif kind == _OPERATOR:
+            descriptor = OperatorDescriptor(*fields)
+        else:
+            code, codes, significance = fields
+            descriptor = LazySequenceDescriptor(code, list(codes), significance, table)
+        descriptors[descriptor.code] = descriptor
+    return table
+
+def _write(entry, data):
+    # Write to a temporary file and rename, so that readers never see partial entries
+    directory = os.path.dirname(entry)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, entry)
+    except Exception:
+        os.unlink(tmp)
+        raise
+
+def _parse(datas):
+    lines = [data.decode('utf-8').splitlines(True) for data in datas]
+    return libbufr.read_tables(*lines)
+
+def read_tables_cached(b_path, d_path=None, cache_dir=None):
+    """
+    Read BUFR tables from libbufr text files, using a persistent cache.
+
+    Returns the same table as :func:`bufrpy.table.libbufr.read_tables`
+    called with the contents of the files. Failure to write the cache
+    is not an error, the tables are then just parsed every time.
+
+    :param str b_path: Path of the B-table file
+    :param str d_path: Path of the D-table file, optional
+    :param str cache_dir: Cache directory, defaults to :func:`default_cache_dir`
+    :return: Mapping from FXY integers to descriptors
+    :rtype: DescriptorTable
+    """
+    if cache_dir is None:
+        cache_dir = default_cache_dir()
+    paths = [b_path] if d_path is None else [b_path, d_path]
+    entry = _entry_path(cache_dir, paths)
+
+    try:
+        with open(entry, 'rb') as f:
+            cached = _load(f.read())
+    except (IOError, OSError):
+        cached = None
+
+    if cached is not None:
+        infos, rows = cached
+        current = [_file_info(path) for path in paths]
+        if len(infos) == len(current):
+            changed = [i for i, (info, cur) in enumerate(zip(infos, current)) if info[:2] != cur]
+            table = None
+            if all(_hash_file(paths[i]) == infos[i][2] for i in changed):
+                try:
+                    table = _build(rows)
+                except (TypeError, ValueError, KeyError):
+                    # Malformed rows, the entry is rebuilt
+                    pass
+            if table is not None:
+                if changed:
+                    # Same contents, record the new modification times
+                    new_infos = [(cur[0], cur[1], info[2]) for info, cur in zip(infos, current)]
+                    try:
+                        _write(entry, _dump(table, new_infos))
+                    except (IOError, OSError):
+                        pass
+                return table
+
+    datas = []
+    infos = []
+    for path in paths:
+        # Stat before reading, so that a concurrent change makes the entry stale rather than wrong
+        mtime, size = _file_info(path)
+        with open(path, 'rb') as f:
+            data = f.read()
+        datas.append(data)
+        infos.append((mtime, size, hashlib.sha256(data).hexdigest()))
+    table = _parse(datas)
+    try:
+        _write(entry, _dump(table, infos))
+    except (IOError, OSError):
+        pass
+    return table
+
+def clear_cache(cache_dir=None):
+    """
+    Remove all cached tables.
+
+    :param str cache_dir: Cache directory, defaults to :func:`default_cache_dir`
+    """
+    if cache_dir is None:
+        cache_dir = default_cache_dir()
+    if not os.path.isdir(cache_dir):
+        return
+    for name in os.listdir(cache_dir):
+        if name.startswith("tables-") and name.endswith(".bin"):
+            os.unlink(os.path.join(cache_dir, name))
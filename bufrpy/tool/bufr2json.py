@@ -1,31 +1,109 @@
+"""
+Convert BUFR messages into JSON.
+
+Usage::
+
+    python -m bufrpy.tool.bufr2json [--subsets] <templatefile> <bufrfile>
+    python -m bufrpy.tool.bufr2json [--subsets] <b-table-file> <bufrfile>
+    python -m bufrpy.tool.bufr2json [--subsets] <b-table-file> <d-table-file> <bufrfile>
+
+Each message in the BUFR file is written as one line of JSON in the
+form of :func:`bufrpy.to_json` as soon as it is decoded, so files with
+many messages are converted with memory for one message at a time.
+With ``--subsets``, each message is written as a line with its
+descriptors followed by a line for each subset, i.e. as NDJSON. Use
+``-`` as the BUFR file to read standard input.
+
+Messages that fail to decode are reported on standard error and
+skipped, and the exit status is then 1.
+"""
+
 from __future__ import print_function
 from __future__ import absolute_import
 
 import bufrpy
+from bufrpy.json import to_json_subsets
 from bufrpy.template import safnwc
 from bufrpy.table import libbufr
+from bufrpy.table.cache import read_tables_cached
+import argparse
 import json
 import sys
-import time
 import codecs
 
-bufr_fname = None
-if len(sys.argv) == 4:
-    # b-table and d-table
-    table = libbufr.read_tables(codecs.open(sys.argv[1], 'rb', 'utf-8'), codecs.open(sys.argv[2], 'rb', 'utf-8'))
-    bufr_fname = sys.argv[3]
-else:
-    # either just b-table or a template file
-    bufr_fname = sys.argv[2]
+def read_table(paths):
+    """
+    Read descriptor table from libbufr table files or a SAFNWC template.
+
+    :param paths: Paths of B and D tables, or of a single B table or template
+    """
+    if len(paths) == 2:
+        # b-table and d-table
+        return read_tables_cached(paths[0], paths[1])
     try:
         # First try reading as safnwc template
-        table = safnwc.read_template(codecs.open(sys.argv[1], 'rb', 'utf-8'))
+        return safnwc.read_template(codecs.open(paths[0], 'rb', 'utf-8'))
     except Exception as e:
         # Try reading as libbufr table
-        table = libbufr.read_tables(codecs.open(sys.argv[1], 'rb', 'utf-8'))
+        return libbufr.read_tables(codecs.open(paths[0], 'rb', 'utf-8'))
+
+def write_message(out, msg, index, subsets=False):
+    """
+    Write message as JSON, one subset at a time.
+
+    Without subsets, writes the same line as ``json.dumps(bufrpy.to_json(msg))``.
+    With subsets, writes a line with the index of the message and its
+    descriptors, and a line with the indices of the message and the
+    subset and its data for each subset.
+
+    :param out: Text stream to write to
+    :param Message msg: Message to write
+    :param int index: Index of the message in its file, counting messages that failed to decode
+    :param bool subsets: Write each subset on its own line
+    """
+    descriptors = json.dumps(msg.section3.descriptors)
+    if subsets:
+        out.write('{"message": %d, "descriptors": %s}\n' %(index, descriptors))
+        for i, data in enumerate(to_json_subsets(msg)):
+            out.write('{"message": %d, "subset": %d, "data": %s}\n' %(index, i, json.dumps(data)))
+    else:
+        out.write('{"descriptors": %s, "data": [' %descriptors)
+        for i, data in enumerate(to_json_subsets(msg)):
+            if i:
+                out.write(', ')
+            out.write(json.dumps(data))
+        out.write(']}\n')
+
+def main(argv=None, out=None):
+    parser = argparse.ArgumentParser(prog="python -m bufrpy.tool.bufr2json", description="Convert BUFR messages into JSON, one message per line")
+    parser.add_argument("--subsets", action="store_true", help="Write each subset on its own line, after a line with the descriptors of its message")
+    parser.add_argument("files", nargs="+", metavar="file", help="SAFNWC template, libbufr B table, or libbufr B and D tables, followed by the BUFR file to convert, - for standard input")
+    args = parser.parse_args(argv)
+    if not 2 <= len(args.files) <= 3:
+        parser.error("expected one or two table files and a BUFR file")
+    tables, bufr_file = args.files[:-1], args.files[-1]
+    if out is None:
+        out = sys.stdout
+
+    table = read_table(tables)
+    if bufr_file == '-':
+        source = getattr(sys.stdin, 'buffer', sys.stdin)
+    else:
+        # Files are framed without reading them into memory
+        source = bufr_file
 
-msg = bufrpy.decode_file(open(bufr_fname, 'rb'), table)
-out = json.dumps(bufrpy.to_json(msg))
-dec = bufrpy.from_json(json.loads(out))
+    status = 0
+    index = 0
+    for result in bufrpy.iter_messages(source, table):
+        if isinstance(result, bufrpy.MessageError):
+            offset = result.location.offset if result.location is not None else None
+            print("Skipping message at offset %s: %s" %(offset, result.error), file=sys.stderr)
+            status = 1
+        else:
+            write_message(out, result, index, args.subsets)
+        index += 1
+    out.flush()
+    return status
 
-print(out)
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,8 @@
 from itertools import islice
+import mmap
+
+# Buffer types that can be decoded directly with ReadableBuffer
+BUFFER_TYPES = (bytes, bytearray, memoryview, mmap.mmap)
 
 class ByteStream(object):
     """
@@ -51,6 +55,62 @@ class ReadableStream(object):
         else:
             raise IOError("Premature end of stream")
 
+    def readview(self, n):
+        """ Read n bytes as a bytes-like object """
+        res = b"".join(islice(self.stream, n))
+        if len(res) == n:
+            return res
+        else:
+            raise IOError("Premature end of stream")
+
+    def skip(self, n):
+        """ Skip n bytes """
+        self.readview(n)
+
+class ReadableBuffer(object):
+    """Reader for BUFR data held in a buffer
+
+    Provides the same operations as :class:`ReadableStream` for
+    :py:class:`bytes`, :py:class:`bytearray`, :py:class:`memoryview`
+    and :py:class:`mmap.mmap` objects. Data is read directly from the
+    buffer, and :py:meth:`readview` returns views into the buffer
+    without copying.
+
+    :ivar int pos: Current position in the buffer, in bytes
+    """
+    def __init__(self, buf, pos=0):
+        self.buf = memoryview(buf).cast('B')
+        self.pos = pos
+
+    def readview(self, n):
+        """ Read n bytes as a memoryview into the buffer """
+        start = self.pos
+        end = start + n
+        if n < 0 or end > len(self.buf):
+            raise IOError("Premature end of stream")
+        self.pos = end
+        return self.buf[start:end]
+
+    def readstr(self, n):
+        """ Read n bytes as CCITT IA5 String """
+        # TODO CCITT IA5 rather than ISO-8859-1
+        return self.readview(n).tobytes().decode('iso-8859-1')
+
+    def readbytes(self, n):
+        """ Read n bytes as list of ints """
+        return self.readview(n).tolist()
+
+    def readint(self, n):
+        """ Read n-byte big-endian integer """
+        if n == 1 and self.pos < len(self.buf):
+            self.pos += 1
+            return self.buf[self.pos-1]
+        return int.from_bytes(self.readview(n), 'big')
+
+    def skip(self, n):
+        """ Skip n bytes """
+        self.readview(n)
+
 def slices(s, slicing):
     """
     Slice object into segments of given length.
@@ -1,6 +1,5 @@
 from collections import namedtuple
 from bufrpy.descriptors import OpCode
-import codecs
 
 class BufrValue(namedtuple('BufrValue', ['raw_value', 'value', 'descriptor'])):
     """Contains single value
@@ -8,25 +7,104 @@ class BufrValue(namedtuple('BufrValue', ['raw_value', 'value', 'descriptor'])):
     Contains single value, both in raw and decoded form, plus a link
     to its descriptor.
 
-    :ivar str|int raw_value: Raw value. Either as hex-encoded string for textual values or an unsigned integer for numeric values
+    :ivar bytes|int raw_value: Raw value. Either the bytes of textual values or an unsigned integer for numeric values
     :ivar str|int|float|None value: Decoded value. Value decoded according to its descriptor. Textual values are strings and numeric values floats or ints. Missing value is indicated by :py:data:`None`.
     :ivar ElementDescriptor descriptor: The descriptor of this value
     """
     __slots__ = ()
 
-def _decode_raw_value(raw_value, descriptor, operators={}):
-    if descriptor.unit == 'CCITTIA5': # Textual
-        value = codecs.decode(raw_value.encode('iso-8859-1'),'hex_codec').decode('iso-8859-1') # CCITT IA5 is pretty close to ASCII, which is a subset of ISO-8859-1
-    else:
-        bits = _calculate_read_length(descriptor, operators)
-        scale = _calculate_scale(descriptor, operators)
-        ref = _calculate_ref(descriptor, operators)
-        if raw_value ^ ((1 << bits)-1) == 0: # Missing value, all-ones
+    @property
+    def raw_hex(self):
+        """
+        Raw value with textual values as hex-encoded strings
+
+        Earlier versions kept the raw value of textual values as a
+        hex-encoded string, this returns it in that form. Numeric raw
+        values are returned as they are.
+        """
+        raw_value = self.raw_value
+        if isinstance(raw_value, bytes):
+            return raw_value.hex()
+        return raw_value
+
+# Kinds of values produced by converters
+TEXT = "text"
+INT = "int"
+FLOAT = "float"
+
+class Converter(namedtuple("_Converter", ["descriptor", "width", "missing", "factor", "ref", "kind"])):
+    """
+    Converts raw values of an element into :class:`BufrValue` objects.
+
+    Holds everything needed to decode values of one descriptor with
+    the operators in effect, computed once by :func:`converter`. A
+    numeric value is ``factor * (raw_value + ref)``, or None if the raw
+    value equals missing.
+
+    :ivar ElementDescriptor descriptor: Descriptor of the values
+    :ivar int width: Width of raw values, in bits
+    :ivar int missing: Raw value that indicates a missing value, all ones of width bits
+    :ivar int|float factor: Multiplier of the scale, ``10**-scale``
+    :ivar int|float ref: Reference value, added to raw values before scaling
+    :ivar str kind: Kind of decoded values, :data:`TEXT`, :data:`INT` or :data:`FLOAT`
+    """
+    __slots__ = ()
+
+    def __call__(self, raw_value):
+        """
+        Decode raw value
+
+        :param bytes|str|int raw_value: Bytes or hex-encoded string for textual values or unsigned integer for numeric values
+        :rtype: BufrValue
+        """
+        if self.kind == TEXT:
+            if isinstance(raw_value, str):
+                raw_value = bytes.fromhex(raw_value)
+            value = raw_value.decode('iso-8859-1') # CCITT IA5 is pretty close to ASCII, which is a subset of ISO-8859-1
+        elif raw_value == self.missing: # Missing value, all-ones
             value = None
         else:
-            value = 10**-scale * (raw_value + ref)
-            
-    return BufrValue(raw_value, value, descriptor)
+            value = self.factor * (raw_value + self.ref)
+        return BufrValue(raw_value, value, self.descriptor)
+
+#: Maximum number of converters to cache, the cache is emptied when full
+CONVERTER_CACHE_SIZE = 4096
+
+_converters = {}
+
+def converter(descriptor, operators={}):
+    """
+    Get converter of descriptor for operators in effect.
+
+    Converters are cached by the descriptor and the operators in
+    effect, so they are shared by all values of an element, also
+    across messages.
+
+    :param ElementDescriptor descriptor: Descriptor of the values
+    :param dict operators: Operators in effect, indexed by opcode
+    :rtype: Converter
+    """
+    if operators:
+        key = (descriptor, tuple([(opcode, op.operand) for opcode, op in operators.items()]))
+    else:
+        key = descriptor
+    conv = _converters.get(key, None)
+    if conv is None:
+        width = _calculate_read_length(descriptor, operators)
+        if descriptor.unit == 'CCITTIA5':
+            conv = Converter(descriptor, width, None, None, None, TEXT)
+        else:
+            factor = 10**-_calculate_scale(descriptor, operators)
+            ref = _calculate_ref(descriptor, operators)
+            kind = FLOAT if isinstance(factor, float) or isinstance(ref, float) else INT
+            conv = Converter(descriptor, width, (1 << width)-1, factor, ref, kind)
+        if len(_converters) >= CONVERTER_CACHE_SIZE:
+            _converters.clear()
+        _converters[key] = conv
+    return conv
+
+def _decode_raw_value(raw_value, descriptor, operators={}):
+    return converter(descriptor, operators)(raw_value)
 
 def get_op(operators, opcodes):
     """
@@ -0,0 +1,104 @@
+"""
+Vectorized decoding of compressed Section 4 data.
+
+In compressed messages each element is encoded as a reference value,
+a 6-bit increment width and one fixed-width increment per subset. When
+NumPy is available, the increments of numeric elements are unpacked and
+converted for all subsets at once. NumPy is optional: without it, or
+when :data:`use_numpy` is False, the pure Python path is used.
+"""
+
+from bufrpy.value import BufrValue, FLOAT
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+#: Use NumPy to decode compressed elements, if it is installed
+use_numpy = numpy is not None
+
+#: Minimum number of subsets for which the vectorized path is used
+MIN_SUBSETS = 16
+
+# Widest increment that is decoded with 64-bit integer arithmetic
+_MAX_WIDTH = 52
+
+# Bound of the magnitude of 64-bit integers
+_INT64_LIMIT = 1 << 63
+
+def applicable(conv, n_bits, n_subsets):
+    """
+    Tell if increments of a compressed element can be decoded with NumPy.
+
+    Raw values plus the reference value must fit in 64-bit integers,
+    and so must the values of integer elements, which are multiplied
+    by the factor of the scale. Other elements are decoded with Python
+    integers, which do not overflow.
+
+    :param Converter conv: Converter of the element, from :func:`bufrpy.value.converter`
+    :param int n_bits: Width of increments
+    :param int n_subsets: Number of subsets
+    """
+    descriptor = conv.descriptor
+    if not (use_numpy and n_subsets >= MIN_SUBSETS and 0 < n_bits <= _MAX_WIDTH
+            and conv.width <= _MAX_WIDTH and descriptor.length <= _MAX_WIDTH
+            and descriptor.unit != 'CCITTIA5'):
+        return False
+    # Raw values are a reference value plus an increment, or all ones
+    # of the width of the descriptor for missing values
+    bound = (1 << max(conv.width, descriptor.length)) + (1 << n_bits) + abs(conv.ref)
+    if conv.kind != FLOAT:
+        bound *= conv.factor
+    return bound < _INT64_LIMIT
+
+def unpack_uints(data, pos, width, count):
+    """
+    Unpack fixed-width unsigned integers from a buffer.
+
+    :param data: Buffer to unpack from
+    :param int pos: Bit position of the first integer
+    :param int width: Width of each integer, in bits
+    :param int count: Number of integers
+    :return: Unpacked integers
+    :rtype: numpy.ndarray of uint64
+    """
+    start_byte = pos >> 3
+    end_byte = (pos + width*count + 7) >> 3
+    raw = numpy.frombuffer(data, dtype=numpy.uint8, count=end_byte-start_byte, offset=start_byte)
+    skip = pos - start_byte*8
+    bits = numpy.unpackbits(raw)[skip:skip + width*count].reshape(count, width)
+    weights = numpy.left_shift(numpy.uint64(1), numpy.arange(width-1, -1, -1, dtype=numpy.uint64))
+    return bits.dot(weights)
+
+def decode_increments(data, pos, n_bits, n_subsets, ref_value, conv, raw=False):
+    """
+    Decode values of a compressed numeric element for all subsets.
+
+    Produces the same values as decoding each increment with
+    :func:`bufrpy.value._decode_raw_value`.
+
+    :param data: Section 4 data
+    :param int pos: Bit position of the first increment
+    :param int n_bits: Width of increments
+    :param int n_subsets: Number of subsets
+    :param int ref_value: Reference value of the element
+    :param Converter conv: Converter of the element, from :func:`bufrpy.value.converter`
+    :param bool raw: Return the raw values instead of values
+    :return: List of values or of raw values, one per subset
+    """
+    increments = unpack_uints(data, pos, n_bits, n_subsets)
+    raws = increments.astype(numpy.int64) + ref_value
+    # Missing increments decode to the missing value of the descriptor
+    raws[increments == (1 << n_bits)-1] = (1 << conv.descriptor.length)-1
+    if raw:
+        return raws.tolist()
+
+    if conv.kind == FLOAT:
+        values = (raws + conv.ref).astype(numpy.float64) * conv.factor
+    else:
+        values = (raws + conv.ref) * conv.factor
+
+    missing = (raws == conv.missing).tolist()
+    descriptor = conv.descriptor
+    return [BufrValue(r, None if m else v, descriptor) for r, v, m in zip(raws.tolist(), values.tolist(), missing)]
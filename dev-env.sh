@@ -1,5 +1,3 @@
 #! /bin/sh
-virtualenv py
-py/bin/pip install bitstring sphinx
-virtualenv -p python3 py3
-py3/bin/pip install bitstring
+virtualenv -p python3 py
+py/bin/pip install -e .[numpy] sphinx
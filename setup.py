@@ -2,13 +2,13 @@ from setuptools import setup
 import ast
 
 path = 'bufrpy/__init__.py'
-with open(path, 'rU') as file:
+with open(path) as file:
     t = compile(file.read(), path, 'exec', ast.PyCF_ONLY_AST)
     for node in t.body:
         if isinstance(node, ast.Assign) and len(node.targets) == 1:
             name = node.targets[0]
             if isinstance(name, ast.Name) and name.id == '__version__':
-                version = node.value.s
+                version = ast.literal_eval(node.value)
                 break
     else:
         raise ValueError("Could not determine software version")
@@ -23,18 +23,18 @@ setup(name="bufrpy",
       author_email="tuure@laurinolli.net",
       zip_safe=False,
       keywords=["bufr"],
-      install_requires=["bitstring>=3.1.2"],
+      python_requires=">=3.7",
+      extras_require={"numpy": ["numpy"]},
       test_suite="tests",
       classifiers=[
           "Programming Language :: Python",
-          "Programming Language :: Python :: 2",
-          "Programming Language :: Python :: 2.6",
-          "Programming Language :: Python :: 2.7",
           "Programming Language :: Python :: 3",
-          "Programming Language :: Python :: 3.3",
-          "Programming Language :: Python :: 3.4",
-          "Programming Language :: Python :: 3.5",
-          "Programming Language :: Python :: 3.6",
+          "Programming Language :: Python :: 3 :: Only",
+          "Programming Language :: Python :: 3.7",
+          "Programming Language :: Python :: 3.8",
+          "Programming Language :: Python :: 3.9",
+          "Programming Language :: Python :: 3.10",
+          "Programming Language :: Python :: 3.11",
           "Intended Audience :: Developers",
           "License :: OSI Approved :: GNU General Public License v2 or later (GPLv2+)",
           "Topic :: Scientific/Engineering"
@@ -0,0 +1,66 @@
+import unittest
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import bufrpy
+from bufrpy import aio, framing
+from .util import read_table, read_file_all, B_TABLE, D_TABLE, IOZX11
+
+async def _serve(data, chunk_size):
+    # Local server that sends data in chunks and closes the connection
+    async def handle(reader, writer):
+        for i in range(0, len(data), chunk_size):
+            writer.write(data[i:i+chunk_size])
+            await writer.drain()
+            await asyncio.sleep(0)
+        writer.close()
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+async def _receive(data, chunk_size, **kwargs):
+    table = read_table()
+    server = await _serve(data, chunk_size)
+    try:
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        results = [result async for result in aio.iter_messages(reader, table, **kwargs)]
+        writer.close()
+        return results
+    finally:
+        server.close()
+        await server.wait_closed()
+
+class TestAsync(unittest.TestCase):
+    def test_server(self):
+        expected, _ = read_file_all(B_TABLE, D_TABLE, IOZX11)
+        with open(IOZX11, 'rb') as f:
+            data = f.read()
+        for chunk_size in (7, 1000, len(data)):
+            assert asyncio.run(_receive(data, chunk_size)) == expected
+
+    def test_executor(self):
+        expected, _ = read_file_all(B_TABLE, D_TABLE, IOZX11)
+        with open(IOZX11, 'rb') as f:
+            data = f.read()
+        with ThreadPoolExecutor(2) as executor:
+            assert asyncio.run(_receive(data, 500, executor=executor)) == expected
+        assert asyncio.run(_receive(data, 500, executor=True)) == expected
+
+    def test_errors(self):
+        with open(IOZX11, 'rb') as f:
+            data = bytearray(f.read())
+        index = framing.index_messages(data)
+        # Set master table of the second message to an unsupported value
+        data[index[1].offset+11] = 1
+        data = b'BUFRxx' + bytes(data) + b'BUFR\x00\x00\x20\x04'
+        results = asyncio.run(_receive(data, 64))
+        errors = [r for r in results if isinstance(r, bufrpy.MessageError)]
+        assert len(results) == 12
+        assert [type(e.error) for e in errors] == [framing.FramingError, ValueError, framing.FramingError]
+        assert errors[1].location.offset == index[1].offset + 6
+
+    def test_predicate(self):
+        expected, _ = read_file_all(B_TABLE, D_TABLE, IOZX11)
+        with open(IOZX11, 'rb') as f:
+            data = f.read()
+        predicate = lambda section0, section1, section3: section3.n_subsets > 1
+        with ThreadPoolExecutor(2) as executor:
+            assert asyncio.run(_receive(data, 500, executor=executor, predicate=predicate)) == [msg for msg in expected if msg.section3.n_subsets > 1]
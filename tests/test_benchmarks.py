@@ -0,0 +1,46 @@
+import unittest
+import bufrpy
+from bufrpy.value import BufrSubset
+from benchmarks import synth, run
+from .util import read_table
+
+class TestSynthetic(unittest.TestCase):
+    def test_decodes(self):
+        table = read_table()
+        for layout in synth.LAYOUTS:
+            for n_subsets in (1, 17):
+                msg = bufrpy.decode(synth.generate(layout, n_subsets, table), table)
+                assert msg.section3.n_subsets == n_subsets, layout.name
+                assert len(msg.section4.subsets) == n_subsets, layout.name
+
+    def test_compressed_same_values(self):
+        table = read_table()
+        for name in ("synop", "nested", "operators"):
+            layout = synth.layout(name)._replace(fixed_counts=True)
+            msg1 = bufrpy.decode(synth.generate(layout, 20, table), table)
+            msg2 = bufrpy.decode(synth.generate(synth.layout(name + "_compressed"), 20, table), table)
+            # Operators that can only be used in uncompressed data are at the end
+            n_values = len(msg2.section4.subsets[0].values)
+            assert [BufrSubset(s.values[:n_values]) for s in msg1.section4.subsets] == msg2.section4.subsets, name
+
+    def test_split(self):
+        table = read_table()
+        saved = synth.MAX_SUBSETS
+        try:
+            synth.MAX_SUBSETS = 5
+            messages = synth.generate_all(synth.layout("synop_compressed"), 12, table)
+        finally:
+            synth.MAX_SUBSETS = saved
+        assert [bufrpy.decode(m, table).section3.n_subsets for m in messages] == [5, 5, 2]
+
+class TestRun(unittest.TestCase):
+    def test_run(self):
+        results = run.run(["synop", "operators"], max_subsets=1, repeat=1, min_time=0)
+        assert len(results["results"]) == 2 * len(run.OPERATIONS)
+        for result in results["results"]:
+            if result["layout"] == "synop":
+                assert result["messages_per_s"] > 0
+                assert result["n_values"] > 0
+                assert result["peak_memory_bytes"] > 0
+        # to_json and from_json do not support operators
+        assert len(run.compare(results, results)) == 2 * len(run.OPERATIONS) - 2
@@ -0,0 +1,91 @@
+import unittest
+import marshal
+import glob
+import json
+import pickle
+import bufrpy
+from bufrpy import binary
+from bufrpy.compact import CompactSubset
+from bufrpy.value import BufrValue, BufrSubset
+from benchmarks import synth
+from .util import read_table, flatten_values
+
+class TestBinary(unittest.TestCase):
+    def setUp(self):
+        self.table = read_table()
+
+    def assertSameMessage(self, msg, msg2):
+        for section, section2 in zip(msg, msg2):
+            self.assertEqual(section, section2)
+
+    def test_round_trip(self):
+        n_messages = 0
+        for path in sorted(glob.glob("data/*.bufr")):
+            with open(path, 'rb') as f:
+                data = f.read()
+            for compact in (False, True):
+                for msg in bufrpy.decode_all(data, self.table, compact=compact)[0]:
+                    msg2 = bufrpy.from_binary(bufrpy.to_binary(msg))
+                    self.assertSameMessage(msg, msg2)
+                    for subset in msg2.section4.subsets:
+                        self.assertTrue(isinstance(subset, CompactSubset))
+                    n_messages += 1
+        self.assertTrue(n_messages > 20)
+
+    def test_synthetic(self):
+        for layout in synth.LAYOUTS:
+            msg = bufrpy.decode(synth.generate(layout, 17, self.table), self.table)
+            data = bufrpy.to_binary(msg)
+            self.assertSameMessage(msg, bufrpy.from_binary(data))
+            # Both forms of subsets are stored the same way
+            self.assertEqual(bufrpy.to_binary(bufrpy.decode(synth.generate(layout, 17, self.table), self.table, compact=True)), data, layout.name)
+
+    def test_repetition_shared(self):
+        with open("data/delayed_repetition.bufr", 'rb') as f:
+            msg = bufrpy.decode(f.read(), self.table)
+        values = bufrpy.from_binary(bufrpy.to_binary(msg)).section4.subsets[0].values
+        self.assertTrue(len(values[0]) > 1)
+        self.assertTrue(values[0][0] is values[0][1])
+
+    def test_from_json(self):
+        # Messages read from JSON have only Sections 3 and 4
+        with open("data/tempLow_200707271955.bufr", 'rb') as f:
+            msg = bufrpy.decode(f.read(), self.table)
+        msg2 = bufrpy.from_json(json.loads(json.dumps(bufrpy.to_json(msg))))
+        msg3 = bufrpy.from_binary(bufrpy.to_binary(msg2))
+        self.assertEqual(msg3.section3.descriptors, msg.section3.descriptors)
+        self.assertEqual(msg3.section4.subsets, msg.section4.subsets)
+        self.assertEqual((msg3.section0, msg3.section1, msg3.section3.flags), (None, None, None))
+        self.assertTrue(pickle.loads(pickle.dumps(msg3)) == msg3)
+
+    def test_raw_values_computed(self):
+        with open("data/IOZX11_LFVW_060300.bufr", 'rb') as f:
+            msg = bufrpy.decode_all(f.read(), self.table)[0][0]
+        values = [BufrValue(None, v.value, v.descriptor) for v in flatten_values(msg.section4.subsets[0].values)]
+        subset = BufrSubset(values)
+        msg2 = bufrpy.from_binary(bufrpy.to_binary(msg._replace(section4=bufrpy.Section4(None, [subset]))))
+        self.assertEqual(list(flatten_values(msg2.section4.subsets[0].values)), list(flatten_values(msg.section4.subsets[0].values)))
+
+    def test_errors(self):
+        with open("data/tempLow_200707271955.bufr", 'rb') as f:
+            data = f.read()
+        self.assertRaises(ValueError, bufrpy.to_binary, bufrpy.decode(data, self.table, columnar=True))
+        serialized = bufrpy.to_binary(bufrpy.decode(data, self.table))
+        self.assertRaises(ValueError, bufrpy.from_binary, data)
+        self.assertRaises(ValueError, bufrpy.from_binary, serialized[:20])
+        header = len(binary.MAGIC) + 3
+        version = (binary.FORMAT_VERSION + 1).to_bytes(2, 'big')
+        self.assertRaises(ValueError, bufrpy.from_binary, binary.MAGIC + version + serialized[len(binary.MAGIC)+2:])
+        self.assertRaises(ValueError, bufrpy.from_binary, serialized[:header-1] + bytes([marshal.version + 1]) + serialized[header:])
+        # Payloads of the wrong shape
+        payload = marshal.loads(serialized[header:])
+        arrays = payload[4]
+        bad_payloads = [(1, 2, 3, 4, 5, 6), (), None,
+                        payload[:4] + (arrays[:-1],) + payload[5:],
+                        payload[:4] + ((arrays[0][:-1],) + arrays[1:],) + payload[5:],
+                        payload[:4] + ((arrays[0], arrays[1][:-4]) + arrays[2:],) + payload[5:],
+                        payload[:3] + (((99,) + payload[3][0][1:],) + payload[3][1:],) + payload[4:],
+                        ((payload[0][0] + (1,),) + payload[0][1:],) + payload[1:],
+                        payload[:5] + (payload[5][:-1],)]
+        for bad in bad_payloads:
+            self.assertRaises(ValueError, bufrpy.from_binary, serialized[:header] + marshal.dumps(bad))
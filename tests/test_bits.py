@@ -0,0 +1,70 @@
+import unittest
+import random
+from bufrpy.bits import BitReader, BitWriter
+
+def _pack(fields):
+    # Pack (width, value) pairs into bytes, padded with zero bits
+    value = 0
+    n_bits = 0
+    for width, v in fields:
+        value = (value << width) | v
+        n_bits += width
+    pad = -n_bits % 8
+    return (value << pad).to_bytes((n_bits + pad) // 8, 'big')
+
+class TestBitReader(unittest.TestCase):
+    def test_readuint(self):
+        rnd = random.Random(1)
+        fields = [(w, rnd.getrandbits(w)) for w in [rnd.choice([1, 3, 6, 8, 12, 16, 25, 64, 300]) for _ in range(500)]]
+        for data in (_pack(fields), memoryview(_pack(fields))):
+            reader = BitReader(data)
+            assert [reader.readuint(w) for w, v in fields] == [v for w, v in fields]
+
+    def test_readhex(self):
+        reader = BitReader(bytes(bytearray([0xab, 0xcd, 0xef])))
+        assert reader.readhex(8) == "ab"
+        assert reader.readhex(4) == "c"
+        assert reader.readhex(8) == "de"
+        assert reader.readhex(0) == ""
+        assert reader.readhex(4) == "f"
+
+    def test_readbytes(self):
+        for data in (b"\x48\x45\x4c", memoryview(b"\x48\x45\x4c")):
+            reader = BitReader(data)
+            assert reader.readbytes(16) == b"HE"
+            assert reader.readbytes(0) == b""
+            assert reader.readbytes(8) == b"L"
+        reader = BitReader(_pack([(3, 5), (24, 0x48454c), (5, 1)]))
+        assert reader.readuint(3) == 5
+        assert reader.readbytes(24) == b"HEL"
+        assert reader.readuint(5) == 1
+        self.assertRaises(ValueError, reader.readbytes, 4)
+        self.assertRaises(IOError, BitReader(b"ab").readbytes, 24)
+
+    def test_readuints(self):
+        rnd = random.Random(2)
+        for width in (1, 5, 8, 13, 64, 600):
+            values = [rnd.getrandbits(width) for _ in range(100)]
+            reader = BitReader(_pack([(3, 5)] + [(width, v) for v in values] + [(7, 99)]))
+            assert reader.readuint(3) == 5
+            assert reader.readuints(width, len(values)) == values
+            assert reader.readuint(7) == 99
+        assert BitReader(b'').readuints(0, 3) == [0, 0, 0]
+
+    def test_end_of_data(self):
+        reader = BitReader(b'\xff\xff')
+        reader.skip(10)
+        self.assertRaises(IOError, reader.readuint, 7)
+        self.assertRaises(IOError, reader.readuints, 2, 4)
+        assert reader.readuint(6) == 63
+
+class TestBitWriter(unittest.TestCase):
+    def test_write(self):
+        rnd = random.Random(3)
+        fields = [(w, rnd.getrandbits(w)) for w in [rnd.choice([1, 3, 6, 8, 12, 16, 25, 64, 300]) for _ in range(2000)]]
+        writer = BitWriter()
+        for w, v in fields:
+            writer.write(v, w)
+        self.assertEqual(writer.n_bits, sum(w for w, v in fields))
+        self.assertEqual(writer.getvalue(), _pack(fields))
+        self.assertEqual(BitWriter().getvalue(), b'')
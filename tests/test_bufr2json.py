@@ -0,0 +1,56 @@
+import unittest
+import io
+import json
+import os
+import shutil
+import tempfile
+import bufrpy
+from bufrpy.tool import bufr2json
+from .util import read_table, B_TABLE, D_TABLE
+
+class TestBufr2Json(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.saved = os.environ.get("BUFRPY_CACHE_DIR")
+        os.environ["BUFRPY_CACHE_DIR"] = self.cache_dir
+
+    def tearDown(self):
+        if self.saved is None:
+            del os.environ["BUFRPY_CACHE_DIR"]
+        else:
+            os.environ["BUFRPY_CACHE_DIR"] = self.saved
+        shutil.rmtree(self.cache_dir)
+
+    def _run(self, path, *options):
+        out = io.StringIO()
+        status = bufr2json.main(list(options) + [B_TABLE, D_TABLE, path], out)
+        return status, out.getvalue().splitlines()
+
+    def _expected(self, path):
+        with open(path, 'rb') as f:
+            return bufrpy.decode_all(f.read(), read_table())[0]
+
+    def test_messages(self):
+        path = "data/IOZX11_LFVW_060300.bufr"
+        status, lines = self._run(path)
+        msgs = self._expected(path)
+        self.assertEqual(status, 0)
+        self.assertTrue(len(msgs) > 1)
+        self.assertEqual(lines, [json.dumps(bufrpy.to_json(msg)) for msg in msgs])
+
+    def test_subsets(self):
+        path = "data/3xBUFRSYNOP-com.bufr"
+        status, lines = self._run(path, "--subsets")
+        msg = self._expected(path)[0]
+        objs = [json.loads(line) for line in lines]
+        self.assertEqual(len(objs), 1 + len(msg.section4.subsets))
+        self.assertEqual([obj.get("subset") for obj in objs], [None, 0, 1, 2])
+        expected = json.loads(json.dumps(bufrpy.to_json(msg)))
+        self.assertEqual(objs[0]["descriptors"], expected["descriptors"])
+        self.assertEqual([obj["data"] for obj in objs[1:]], expected["data"])
+
+    def test_errors(self):
+        # Messages that fail to decode are skipped
+        status, lines = self._run("data/substituted.bufr")
+        self.assertEqual(status, 1)
+        self.assertEqual(lines, [])
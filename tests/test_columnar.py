@@ -0,0 +1,48 @@
+import unittest
+from collections import Counter
+import bufrpy
+from bufrpy.plan import compile_plan, DELAYED_REPLICATE
+from .util import _do_read, B_TABLE, D_TABLE, FILES, flatten_values
+
+def read_both(bufr_file):
+    def read(f, table):
+        data = f.read()
+        return bufrpy.decode(data, table), bufrpy.decode(data, table, columnar=True)
+    return _do_read(B_TABLE, D_TABLE, bufr_file, read)
+
+class TestColumnar(unittest.TestCase):
+    def test_same_values(self):
+        for bufr_file in FILES:
+            msg, col_msg = read_both(bufr_file)
+            section4 = col_msg.section4
+            assert isinstance(section4, bufrpy.ColumnarSection4)
+            assert section4.n_subsets == len(msg.section4.subsets)
+            plan = compile_plan(msg.section3.descriptors)
+            for i, subset in enumerate(msg.section4.subsets):
+                expected = Counter((v.descriptor.code, v.value) for v in flatten_values(subset.values))
+                actual = Counter()
+                for column in section4.columns:
+                    if plan.instructions[column.position][0] == DELAYED_REPLICATE:
+                        continue
+                    if column.offsets is None:
+                        indices = [i]
+                    else:
+                        indices = range(column.offsets[i], column.offsets[i+1])
+                    for j in indices:
+                        value = None if column.missing[j] else column.values[j]
+                        actual[(column.descriptor.code, value)] += 1
+                assert expected == actual, bufr_file
+
+    def test_compressed_same_columns(self):
+        for uncompressed, compressed in [("data/207003.bufr", "data/207003_compressed.bufr"),
+                                         ("data/change_refval.bufr", "data/change_refval_compressed.bufr")]:
+            _, msg1 = read_both(uncompressed)
+            _, msg2 = read_both(compressed)
+            assert msg1.section4.columns == msg2.section4.columns
+
+    def test_repetition_offsets(self):
+        msg, col_msg = read_both("data/delayed_repetition_compressed.bufr")
+        for column in col_msg.section4.columns:
+            if column.offsets is not None:
+                assert len(column.offsets) == col_msg.section4.n_subsets + 1
+                assert column.offsets[-1] == len(column.values) == len(column.missing)
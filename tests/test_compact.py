@@ -0,0 +1,58 @@
+import unittest
+import pickle
+import bufrpy
+from bufrpy.compact import CompactSubset
+from .util import _do_read, B_TABLE, D_TABLE, FILES, IOZX11, flatten_values
+
+def read_both(bufr_file, **kwargs):
+    def read(f, table):
+        data = f.read()
+        return bufrpy.decode_all(data, table)[0], bufrpy.decode_all(data, table, compact=True, **kwargs)[0]
+    return _do_read(B_TABLE, D_TABLE, bufr_file, read)
+
+class TestCompact(unittest.TestCase):
+    def test_same_values(self):
+        for bufr_file in FILES + [IOZX11]:
+            msgs, compact_msgs = read_both(bufr_file)
+            assert len(msgs) == len(compact_msgs)
+            for msg, compact_msg in zip(msgs, compact_msgs):
+                assert compact_msg == msg
+                for subset, compact_subset in zip(msg.section4.subsets, compact_msg.section4.subsets):
+                    assert isinstance(compact_subset, CompactSubset)
+                    assert compact_subset.values == subset.values
+                    assert compact_subset.converters is compact_msg.section4.subsets[0].converters
+
+    def test_repetition_shared(self):
+        msgs, compact_msgs = read_both("data/delayed_repetition_compressed.bufr")
+        values = compact_msgs[0].section4.subsets[0].values
+        assert len(values[0]) == 3
+        assert values[0][0] is values[0][1]
+
+    def test_text(self):
+        msgs, compact_msgs = read_both("data/tempLow_200707271955.bufr")
+        subset = compact_msgs[0].section4.subsets[0]
+        texts = [v for v in flatten_values(subset.values) if isinstance(v.raw_value, bytes)]
+        assert texts
+        assert [subset.value(i) for i in range(len(subset))] == list(flatten_values(subset.values))
+
+    def test_select_and_lazy(self):
+        codes = [v.descriptor.code for v in flatten_values(read_both("data/3xBUFRSYNOP-com.bufr")[0][0].section4.subsets[0].values)][::2]
+        msgs, compact_msgs = read_both("data/3xBUFRSYNOP-com.bufr", select=codes, lazy=True)
+        selected = _do_read(B_TABLE, D_TABLE, "data/3xBUFRSYNOP-com.bufr", lambda f, table: bufrpy.decode(f.read(), table, select=codes))
+        assert compact_msgs[0].section4 == selected.section4
+
+    def test_pickle(self):
+        msgs, compact_msgs = read_both("data/delayed_repetition.bufr")
+        assert pickle.loads(pickle.dumps(compact_msgs[0])) == msgs[0]
+
+    def test_nbytes(self):
+        msgs, compact_msgs = read_both("data/3xBUFRSYNOP-com.bufr")
+        subset = compact_msgs[0].section4.subsets[0]
+        assert len(subset) == len(list(flatten_values(subset.values)))
+        assert len(subset) * 12 < subset.nbytes < len(subset) * 24
+
+    def test_columnar(self):
+        with open("data/3xBUFRSYNOP-com.bufr", 'rb') as f:
+            data = f.read()
+        table = _do_read(B_TABLE, D_TABLE, "data/3xBUFRSYNOP-com.bufr", lambda f, table: table)
+        self.assertRaises(ValueError, bufrpy.decode, data, table, columnar=True, compact=True)
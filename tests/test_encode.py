@@ -0,0 +1,117 @@
+import unittest
+import glob
+import json
+import bufrpy
+from bufrpy import framing
+from bufrpy.bits import mask
+from bufrpy.bufrenc import encode
+from bufrpy.descriptors import ASSOCIATED_FIELD
+from bufrpy.value import BufrValue, BufrSubset
+from benchmarks import synth
+from .util import read_table, flatten_values
+
+# Uncompressed messages that cannot be compressed
+UNCOMPRESSIBLE = {"data/208035.bufr": NotImplementedError, "data/join.bufr": ValueError}
+
+def _uncompressed_value(value):
+    # Value of compressed data decoded from uncompressed data
+    descriptor = value.descriptor
+    if descriptor.unit == 'CCITTIA5':
+        return value.value.ljust(descriptor.length // 8)
+    if descriptor.code == ASSOCIATED_FIELD and value.value is None:
+        return mask(descriptor.length)
+    return value.value
+
+def _values_only(values):
+    # Values without raw values, like values built by hand
+    return [_values_only(v) if isinstance(v, list) else BufrValue(None, v.value, v.descriptor) for v in values]
+
+class TestEncode(unittest.TestCase):
+    def setUp(self):
+        self.table = read_table()
+
+    def _read(self, path):
+        with open(path, 'rb') as f:
+            return bufrpy.decode_all(f.read(), self.table)[0]
+
+    def assertRoundTrip(self, msg, data):
+        msg2 = bufrpy.decode(data, self.table)
+        self.assertEqual(msg2.section1, msg.section1)
+        self.assertEqual(msg2.section2, msg.section2)
+        self.assertEqual(msg2.section3.descriptors, msg.section3.descriptors)
+        self.assertEqual(msg2.section3.n_subsets, msg.section3.n_subsets)
+        self.assertEqual(msg2.section4.subsets, msg.section4.subsets)
+
+    def test_round_trip(self):
+        n_messages = 0
+        for path in sorted(glob.glob("data/*.bufr")):
+            with open(path, 'rb') as f:
+                data = f.read()
+            msgs, errors = bufrpy.decode_all(data, self.table)
+            for msg, location in zip(msgs, framing.index_messages(data)):
+                encoded = encode(msg)
+                self.assertRoundTrip(msg, encoded)
+                # Uncompressed data is written bit by bit as it was
+                if not msg.section3.flags & bufrpy.bufrdec.FLAG_COMPRESSED:
+                    self.assertEqual(encoded, data[location.offset:location.offset+location.length], path)
+                n_messages += 1
+        self.assertTrue(n_messages > 10)
+
+    def test_compress(self):
+        n_messages = 0
+        for path in sorted(glob.glob("data/*.bufr")):
+            for msg in self._read(path):
+                compressed = msg.section3.flags & bufrpy.bufrdec.FLAG_COMPRESSED
+                if path in UNCOMPRESSIBLE:
+                    self.assertRaises(UNCOMPRESSIBLE[path], encode, msg, compressed=True)
+                    continue
+                msg2 = bufrpy.decode(encode(msg, compressed=not compressed), self.table)
+                self.assertEqual(msg2.section3.descriptors, msg.section3.descriptors)
+                self.assertEqual(len(msg2.section4.subsets), len(msg.section4.subsets))
+                for subset, subset2 in zip(msg.section4.subsets, msg2.section4.subsets):
+                    expected = list(flatten_values(subset.values))
+                    if compressed:
+                        expected = [_uncompressed_value(value) for value in expected]
+                    else:
+                        expected = [value.value for value in expected]
+                    self.assertEqual([value.value for value in flatten_values(subset2.values)], expected, path)
+                n_messages += 1
+        self.assertTrue(n_messages > 10)
+
+    def test_compressed_size(self):
+        for name in ("synop", "nested_compressed"):
+            data = synth.generate(synth.layout(name), 200, self.table)
+            msg = bufrpy.decode(data, self.table)
+            compressed = encode(msg, compressed=True)
+            uncompressed = encode(msg, compressed=False)
+            self.assertTrue(len(compressed) < len(uncompressed))
+            # The smallest reference values and increment widths are used
+            self.assertTrue(len(compressed) <= len(data))
+            self.assertRoundTrip(msg, compressed)
+
+    def test_from_json(self):
+        for path in ("data/tempLow_200707271955.bufr", "data/IOZX11_LFVW_060300.bufr", "data/delayed_repetition_compressed.bufr"):
+            msg = self._read(path)[0]
+            msg2 = bufrpy.from_json(json.loads(json.dumps(bufrpy.to_json(msg))))
+            self.assertRoundTrip(msg, encode(msg2, section1=msg.section1))
+            # Without Section 1 an edition 4 message is written
+            msg3 = bufrpy.decode(encode(msg2), self.table)
+            self.assertEqual(msg3.section0.edition, 4)
+            self.assertEqual(msg3.section4.subsets, msg.section4.subsets)
+
+    def test_values(self):
+        # Raw values are computed from the decoded values when missing
+        for path in ("data/3xBUFRSYNOP-com.bufr", "data/tempLow_200707271955.bufr", "data/IOZX11_LFVW_060300.bufr", "data/change_refval.bufr"):
+            msg = self._read(path)[0]
+            subsets = [BufrSubset(_values_only(subset.values)) for subset in msg.section4.subsets]
+            self.assertRoundTrip(msg, encode(msg._replace(section4=bufrpy.Section4(None, subsets))))
+
+    def test_errors(self):
+        msg = self._read("data/tempLow_200707271955.bufr")[0]
+        values = msg.section4.subsets[0].values
+        for bad in (values[:-1], values + values[-1:], [[]] + values[1:]):
+            self.assertRaises(ValueError, encode, msg._replace(section4=bufrpy.Section4(None, [BufrSubset(bad)])))
+        # Replication counts differ between subsets
+        self.assertRaises(ValueError, encode, self._read("data/join.bufr")[0], compressed=True)
+        self.assertRaises(NotImplementedError, encode, self._read("data/208035.bufr")[0], compressed=True)
+        self.assertRaises(ValueError, encode, bufrpy.decode(encode(msg), self.table, columnar=True))
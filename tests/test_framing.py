@@ -0,0 +1,49 @@
+import unittest
+import io
+import bufrpy
+from bufrpy import framing
+from .util import _do_read, B_TABLE, D_TABLE, IOZX11
+
+class TestFraming(unittest.TestCase):
+    def test_index(self):
+        index = framing.index_messages(IOZX11)
+        assert len(index) == 10
+        assert framing.count_messages(IOZX11) == 10
+        with open(IOZX11, 'rb') as f:
+            data = f.read()
+        for location in index:
+            assert data[location.offset:location.offset+4] == b'BUFR'
+            assert data[location.offset+location.length-4:location.offset+location.length] == b'7777'
+            assert location.edition == 3
+        assert framing.index_messages(data) == index
+        with open(IOZX11, 'rb') as f:
+            assert framing.index_messages(f) == index
+
+    def test_scan_file_blocks(self):
+        with open(IOZX11, 'rb') as f:
+            data = b'BU' + f.read() + b'BUFR\x00\x00\x20\x04'
+        expected = list(framing.scan_buffer(data))
+        for block_size in (1, 5, 100, 1 << 20):
+            frames = list(framing.scan_file(io.BytesIO(data), block_size))
+            assert [frame for frame, _ in frames if not isinstance(frame, framing.FramingError)] == [frame for frame in expected if not isinstance(frame, framing.FramingError)]
+            assert isinstance(frames[-1][0], framing.FramingError)
+            for frame, message in frames[:-1]:
+                assert message == data[frame.offset:frame.offset+frame.length]
+
+    def test_corrupt_message_skipped(self):
+        with open(IOZX11, 'rb') as f:
+            data = bytearray(f.read())
+        index = framing.index_messages(data)
+        # Set master table of the second message to an unsupported value
+        data[index[1].offset+11] = 1
+        msgs, errors = _do_read(B_TABLE, D_TABLE, IOZX11,
+                                lambda f, table: bufrpy.decode_all(bytes(data), table))
+        assert len(msgs) == 9
+        assert len(errors) == 1
+        assert not isinstance(errors[0], framing.FramingError)
+
+    def test_garbage(self):
+        frames = list(framing.scan_buffer(b'xxBUFRxx\x00\x00BUFR\x00\x00\x0c\x047777'))
+        assert isinstance(frames[0], framing.FramingError)
+        assert frames[0].offset == 2
+        assert frames[1] == framing.MessageLocation(10, 12, 4)
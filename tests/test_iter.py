@@ -0,0 +1,113 @@
+import unittest
+import io
+import os
+import shutil
+import tempfile
+import bufrpy
+from bufrpy import framing
+from .util import read_table, read_file_all, B_TABLE, D_TABLE, IOZX11
+
+class _OneMessageFile(object):
+    """
+    File that fails after the first message has been read
+    """
+    def __init__(self, data, length):
+        self.f = io.BytesIO(data[:length])
+
+    def read(self, n):
+        data = self.f.read(n)
+        if not data:
+            raise IOError("Read past first message")
+        return data
+
+class TestIterMessages(unittest.TestCase):
+    def test_sources(self):
+        expected, _ = read_file_all(B_TABLE, D_TABLE, IOZX11)
+        table = read_table()
+        with open(IOZX11, 'rb') as f:
+            data = f.read()
+        with open(IOZX11, 'rb') as f:
+            assert list(bufrpy.iter_messages(f, table)) == expected
+        with open(IOZX11, 'rb') as f:
+            assert list(bufrpy.iter_messages(bufrpy.util.ByteStream(f), table)) == expected
+        assert list(bufrpy.iter_messages(IOZX11, table)) == expected
+        assert list(bufrpy.iter_messages(data, table)) == expected
+        assert list(bufrpy.iter_messages(memoryview(data), table)) == expected
+
+    def test_incremental(self):
+        with open(IOZX11, 'rb') as f:
+            data = f.read()
+        first = framing.index_messages(data)[0]
+        messages = bufrpy.iter_messages(_OneMessageFile(data, first.offset + first.length), read_table())
+        msg = next(messages)
+        assert msg.section0.length == first.length
+
+    def test_errors(self):
+        with open(IOZX11, 'rb') as f:
+            data = bytearray(f.read())
+        index = framing.index_messages(data)
+        # Set master table of the second message to an unsupported value
+        data[index[1].offset+11] = 1
+        data += b'BUFR\x00\x00\x20\x04'
+
+        tmp = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp, "corrupt.bufr")
+            with open(path, 'wb') as f:
+                f.write(data)
+            results = list(bufrpy.iter_messages(path, read_table()))
+        finally:
+            shutil.rmtree(tmp)
+
+        errors = [r for r in results if isinstance(r, bufrpy.MessageError)]
+        assert len(results) == 11
+        assert len(errors) == 2
+        assert errors[0].location == index[1]
+        assert isinstance(errors[0].error, ValueError)
+        assert isinstance(errors[1].error, framing.FramingError)
+        assert errors[1].location.offset == len(data) - 8
+        assert results[1] is errors[0]
+
+    def test_break(self):
+        # Stopping early closes the memory map
+        messages = bufrpy.iter_messages(IOZX11, read_table())
+        next(messages)
+        messages.close()
+
+    def test_predicate(self):
+        table = read_table()
+        with open(IOZX11, 'rb') as f:
+            data = bytearray(f.read())
+        with open("data/3xBUFRSYNOP-com.bufr", 'rb') as f:
+            data += f.read()
+        expected = list(bufrpy.iter_messages(bytes(data), table))
+
+        # Make Section 4 of the first message undecodable, it is not decoded when rejected
+        first = expected[0]
+        section4 = framing.index_messages(data)[0].offset + 8 + first.section1.length + first.section3.length
+        assert first.section1.optional_section == 0
+        data[section4:section4+3] = b'\x00\x00\x04'
+        data = bytes(data)
+
+        calls = []
+        def predicate(section0, section1, section3):
+            calls.append((section0, section1, section3))
+            return section3.n_subsets > 1 or section1.data_category == 0
+        selected = [msg for msg in expected if predicate(msg.section0, msg.section1, msg.section3)]
+        assert len(selected) == 4
+        del calls[:]
+
+        assert list(bufrpy.iter_messages(data, table, predicate=predicate)) == selected
+        assert calls == [(msg.section0, msg.section1, msg.section3) for msg in expected]
+        assert list(bufrpy.iter_messages(io.BytesIO(data), table, predicate=predicate)) == selected
+        assert list(bufrpy.iter_messages(bufrpy.util.ByteStream(io.BytesIO(data)), table, predicate=predicate)) == selected
+        assert list(bufrpy.iter_messages(iter(bufrpy.util.ByteStream(io.BytesIO(data))), table, predicate=predicate)) == selected
+        assert bufrpy.decode_all(data, table, lazy=True, predicate=predicate) == (selected, [])
+
+    def test_predicate_error(self):
+        def predicate(section0, section1, section3):
+            raise KeyError(section1.data_category)
+        results = list(bufrpy.iter_messages(IOZX11, read_table(), predicate=predicate))
+        assert len(results) == 10
+        for result in results:
+            assert isinstance(result.error, KeyError)
@@ -0,0 +1,56 @@
+import unittest
+import json
+import bufrpy
+from bufrpy import json as bufrjson
+from bufrpy.json import JsonSubset
+from benchmarks import synth
+from .util import read_table, flatten_values
+
+def _round_trip(msg):
+    return json.loads(json.dumps(bufrpy.to_json(msg)))
+
+class TestJson(unittest.TestCase):
+    def setUp(self):
+        self.table = read_table()
+
+    def _messages(self):
+        for path in ("data/tempLow_200707271955.bufr", "data/IOZX11_LFVW_060300.bufr", "data/delayed_repetition_compressed.bufr", "data/3xBUFRSYNOP-com.bufr"):
+            with open(path, 'rb') as f:
+                for msg in bufrpy.decode_all(f.read(), self.table)[0]:
+                    yield msg
+        yield bufrpy.decode(synth.generate(synth.layout("nested"), 7, self.table), self.table)
+
+    def test_round_trip(self):
+        for msg in self._messages():
+            msg2 = bufrpy.from_json(_round_trip(msg))
+            self.assertEqual(msg2.section4.subsets, msg.section4.subsets)
+            for subset, subset2 in zip(msg.section4.subsets, msg2.section4.subsets):
+                for v, v2 in zip(flatten_values(subset.values), flatten_values(subset2.values)):
+                    self.assertEqual((type(v.raw_value), type(v.value)), (type(v2.raw_value), type(v2.value)))
+
+    def test_lazy(self):
+        for msg in self._messages():
+            obj = _round_trip(msg)
+            msg2 = bufrpy.from_json(obj, lazy=True)
+            self.assertTrue(all(isinstance(subset, JsonSubset) for subset in msg2.section4.subsets))
+            self.assertTrue(msg2.section4.subsets[0].data is obj["data"][0])
+            self.assertEqual(msg2.section4.subsets, msg.section4.subsets)
+            self.assertEqual(msg2.section3, bufrpy.from_json(obj).section3)
+
+    def test_shared_descriptors(self):
+        msgs = list(self._messages())[1:3]
+        msg1, msg2 = [bufrpy.from_json(_round_trip(msg), lazy=True) for msg in msgs]
+        self.assertEqual(msg1.section3.descriptors, msg2.section3.descriptors)
+        self.assertTrue(msg1.section3.descriptors[0] is msg2.section3.descriptors[0])
+        self.assertTrue(msg1.section4.subsets[0].converters is msg2.section4.subsets[0].converters)
+
+    def test_cache_size(self):
+        size = bufrjson.DESCRIPTOR_CACHE_SIZE
+        bufrjson.DESCRIPTOR_CACHE_SIZE = 2
+        bufrjson._descriptor_sets.clear()
+        try:
+            for msg in self._messages():
+                bufrpy.from_json(_round_trip(msg))
+                self.assertLessEqual(len(bufrjson._descriptor_sets), 2)
+        finally:
+            bufrjson.DESCRIPTOR_CACHE_SIZE = size
@@ -0,0 +1,122 @@
+import unittest
+import bufrpy
+from bufrpy import MessageCache
+from bufrpy.cache import message_size
+from benchmarks import synth
+from .util import read_table
+
+class TestMessageCache(unittest.TestCase):
+    def setUp(self):
+        self.table = read_table()
+        with open("data/IOZX11_LFVW_060300.bufr", 'rb') as f:
+            self.data = f.read()
+
+    def test_duplicates(self):
+        cache = MessageCache()
+        msgs, errors = bufrpy.decode_all(self.data * 3, self.table, cache=cache)
+        n = len(msgs) // 3
+        self.assertTrue(n > 1)
+        self.assertEqual((cache.misses, cache.hits, len(cache)), (n, 2 * n, n))
+        for i in range(n):
+            self.assertTrue(msgs[i] is msgs[i + n] is msgs[i + 2 * n])
+        self.assertEqual(msgs[:n], bufrpy.decode_all(self.data, self.table)[0])
+        self.assertEqual(cache.nbytes, sum(message_size(msg) for msg in msgs[:n]))
+
+        cache.clear()
+        self.assertEqual((cache.misses, cache.hits, len(cache), cache.nbytes), (0, 0, 0, 0))
+
+    def test_decode(self):
+        cache = MessageCache()
+        data = synth.generate(synth.layout("synop"), 3, self.table)
+        msg = bufrpy.decode(data, self.table, cache=cache)
+        self.assertTrue(bufrpy.decode(bytearray(data), self.table, cache=cache) is msg)
+        self.assertTrue(bufrpy.decode(data + b'trailing', self.table, cache=cache) is msg)
+        self.assertEqual((cache.misses, cache.hits), (1, 2))
+        self.assertEqual(bufrpy.decode(data, self.table), msg)
+
+    def test_options(self):
+        cache = MessageCache()
+        data = synth.generate(synth.layout("synop"), 3, self.table)
+        msgs = [bufrpy.decode(data, self.table, cache=cache),
+                bufrpy.decode(data, self.table, compact=True, cache=cache),
+                bufrpy.decode(data, self.table, select=["001001"], cache=cache),
+                bufrpy.decode(data, self.table, select=["001002"], cache=cache),
+                bufrpy.decode(data, read_table(), cache=cache)]
+        self.assertEqual((cache.misses, cache.hits), (5, 0))
+        self.assertTrue(bufrpy.decode(data, self.table, select=("001001",), cache=cache) is msgs[2])
+
+    def test_predicate(self):
+        cache = MessageCache()
+        msgs = bufrpy.decode_all(self.data, self.table, cache=cache)[0]
+        lengths = sorted(set(msg.section0.length for msg in msgs))
+        self.assertTrue(len(lengths) > 1)
+        selected = bufrpy.decode_all(self.data, self.table, predicate=lambda s0, s1, s3: s0.length == lengths[0], cache=cache)[0]
+        self.assertEqual(selected, [msg for msg in msgs if msg.section0.length == lengths[0]])
+        self.assertEqual(cache.hits, len(msgs))
+
+    def test_errors(self):
+        cache = MessageCache()
+        with open("data/substituted.bufr", 'rb') as f:
+            data = f.read()
+        for _ in range(2):
+            msgs, errors = bufrpy.decode_all(data, self.table, cache=cache)
+            self.assertEqual((len(msgs), len(errors)), (0, 1))
+        self.assertEqual((cache.misses, cache.hits, len(cache)), (2, 0, 0))
+
+    def test_eviction(self):
+        msgs = bufrpy.decode_all(self.data, self.table)[0]
+        sizes = [message_size(msg) for msg in msgs]
+        cache = MessageCache(maxsize=2)
+        bufrpy.decode_all(self.data, self.table, cache=cache)
+        self.assertEqual((len(cache), cache.nbytes), (2, sum(sizes[-2:])))
+        # Least recently used messages are evicted
+        bufrpy.decode_all(self.data, self.table, cache=cache)
+        self.assertEqual(cache.hits, 0)
+
+        cache = MessageCache(maxbytes=sum(sizes[-3:]))
+        bufrpy.decode_all(self.data, self.table, cache=cache)
+        self.assertEqual((len(cache), cache.nbytes), (3, sum(sizes[-3:])))
+
+        cache = MessageCache(maxsize=0)
+        bufrpy.decode_all(self.data * 2, self.table, cache=cache)
+        self.assertEqual((len(cache), cache.hits, cache.nbytes), (0, 0, 0))
+
+    def test_message_size(self):
+        # Decoded messages are counted by their memory, not their length
+        data = synth.generate(synth.layout("synop"), 200, self.table)
+        msg = bufrpy.decode(data, self.table)
+        size = message_size(msg)
+        self.assertTrue(size > 10 * len(data))
+        self.assertTrue(message_size(bufrpy.decode(data, self.table, compact=True)) < size)
+        self.assertTrue(message_size(bufrpy.decode(data, self.table, columnar=True)) < size)
+
+        lazy = bufrpy.decode(data, self.table, lazy=True)
+        self.assertTrue(message_size(lazy) < 2 * len(data))
+        self.assertFalse(lazy[4].decoded)
+        lazy.section4
+        self.assertEqual(message_size(lazy), size)
+
+    def test_lazy(self):
+        # Lazy messages are counted again once they have been decoded
+        data = synth.generate(synth.layout("synop"), 200, self.table)
+        other = synth.generate(synth.layout("synop"), 3, self.table)
+        cache = MessageCache()
+        lazy = bufrpy.decode(data, self.table, lazy=True, cache=cache)
+        undecoded = cache.nbytes
+        lazy.section4
+        self.assertTrue(bufrpy.decode(data, self.table, lazy=True, cache=cache) is lazy)
+        self.assertEqual(cache.nbytes, message_size(lazy))
+        self.assertTrue(cache.nbytes > 10 * undecoded)
+
+        cache = MessageCache()
+        lazy = bufrpy.decode(data, self.table, lazy=True, cache=cache)
+        lazy.section4
+        msg = bufrpy.decode(other, self.table, lazy=True, cache=cache)
+        self.assertEqual(cache.nbytes, message_size(lazy) + message_size(msg))
+
+        # Decoded lazy messages are evicted when they no longer fit
+        cache = MessageCache(maxbytes=2 * undecoded)
+        lazy = bufrpy.decode(data, self.table, lazy=True, cache=cache)
+        lazy.section4
+        bufrpy.decode(data, self.table, lazy=True, cache=cache)
+        self.assertEqual((len(cache), cache.nbytes), (0, 0))
@@ -0,0 +1,36 @@
+import unittest
+import bufrpy
+from bufrpy.framing import FramingError
+from .util import read_file_all, read_table, B_TABLE, D_TABLE
+
+FILES = ["data/IOZX11_LFVW_060300.bufr", "data/associated.bufr", "data/multiple_qc.bufr", "data/207003_compressed.bufr"]
+
+def _expected():
+    messages = []
+    for bufr_file in FILES:
+        msgs, errors = read_file_all(B_TABLE, D_TABLE, bufr_file)
+        messages.extend(msgs)
+    return messages
+
+class TestParallel(unittest.TestCase):
+    def test_in_process(self):
+        results = list(bufrpy.decode_many(FILES, read_table(), workers=1))
+        assert [r.message for r in results if r.error is None] == _expected()
+        assert [r.source for r in results if r.error is not None] == [2]
+        assert isinstance(results[0].location.offset, int)
+
+    def test_pool(self):
+        results = list(bufrpy.decode_many(FILES, read_table, workers=2, chunk_size=3))
+        assert [r.message for r in results if r.error is None] == _expected()
+        errors = [r for r in results if r.error is not None]
+        assert len(errors) == 1
+        assert isinstance(errors[0].error, KeyError)
+
+    def test_unordered_buffers(self):
+        with open(FILES[0], 'rb') as f:
+            data = b'BUFR' + f.read()
+        results = list(bufrpy.decode_many([data], read_table(), workers=2, ordered=False, chunk_size=2))
+        assert len([r for r in results if r.error is None]) == 10
+        framing_errors = [r for r in results if isinstance(r.error, FramingError)]
+        assert len(framing_errors) == 1
+        assert framing_errors[0].location.offset == 0
@@ -0,0 +1,74 @@
+import unittest
+import sys
+from bufrpy.bufrdec import decode_section4
+from bufrpy.descriptors import ElementDescriptor, ReplicationDescriptor
+from bufrpy.plan import plan_cache, compile_plan, PlanCache, REPLICATE, DELAYED_REPLICATE, SIGNIFY_LOCAL, ELEMENT
+from bufrpy.util import ReadableBuffer, fxy2int
+from .util import read_file, read_file_all, read_table, B_TABLE, D_TABLE
+
+class TestPlan(unittest.TestCase):
+    def test_plan_reused(self):
+        plan_cache.clear()
+        msgs, errors = read_file_all(B_TABLE, D_TABLE, "data/IOZX11_LFVW_060300.bufr")
+        self.assertEqual(len(msgs), 10)
+        self.assertTrue(plan_cache.hits > 0)
+        self.assertTrue(plan_cache.misses < 10)
+
+    def test_plan_per_table(self):
+        plan_cache.clear()
+        msg1 = read_file(B_TABLE, D_TABLE, "data/delayed_repetition.bufr")
+        msg2 = read_file(B_TABLE, D_TABLE, "data/delayed_repetition.bufr")
+        # Tables are read again, so the plan is built again for the new table
+        self.assertEqual(plan_cache.misses, 2)
+        self.assertEqual(msg1, msg2)
+
+    def test_plan_instructions(self):
+        msg = read_file(B_TABLE, D_TABLE, "data/delayed_repetition.bufr")
+        plan = compile_plan(msg.section3.descriptors)
+        kinds = [instruction[0] for instruction in plan.instructions]
+        self.assertTrue(REPLICATE in kinds or DELAYED_REPLICATE in kinds)
+        for instruction in plan.instructions:
+            if instruction[0] in (REPLICATE, DELAYED_REPLICATE):
+                self.assertTrue(instruction[2] <= len(plan.instructions))
+
+    def test_signify_data_width(self):
+        # Operator 206 gives the width of the following local descriptor
+        table = read_table()
+        descriptors = [table[fxy2int(code)].strong() for code in ("206012", "012101", "001001")]
+        plan = compile_plan(descriptors)
+        self.assertEqual([instruction[0] for instruction in plan.instructions], [SIGNIFY_LOCAL, ELEMENT])
+        self.assertEqual(plan.instructions[0][1].length, 12)
+        # 12-bit value 291 and 7-bit value 5
+        section4 = decode_section4(ReadableBuffer(b"\x00\x00\x07\x00\x12\x30\xa0"), descriptors, 1, False, plan)
+        self.assertEqual([v.raw_value for v in section4.subsets[0].values], [291, 5])
+        with self.assertRaisesRegex(NotImplementedError, "206"):
+            decode_section4(ReadableBuffer(b"\x00\x00\x07\x00\x12\x30\xa0"), descriptors, 1, True, plan)
+
+    def test_lru_eviction(self):
+        cache = PlanCache(maxsize=2)
+        table = {}
+        for i in range(3):
+            cache.get((i,), table, lambda: compile_plan([]))
+        self.assertEqual(len(cache), 2)
+        cache.get((2,), table, lambda: compile_plan([]))
+        self.assertEqual(cache.hits, 1)
+        cache.get((0,), table, lambda: compile_plan([]))
+        self.assertEqual(cache.misses, 4)
+
+    def test_deep_nesting(self):
+        # Replications nested deeper than the recursion limit
+        depth = sys.getrecursionlimit() + 100
+        element = ElementDescriptor(12001, 8, 0, 0, "TEMPERATURE", "K")
+        descriptors = [ReplicationDescriptor(16385, 0, depth-k, 1, "") for k in range(depth)] + [element]
+        plan = compile_plan(descriptors)
+        self.assertEqual(plan.instructions[0], (REPLICATE, 1, depth+1))
+        # One 8-bit value, and the same value compressed for two subsets
+        for data, n_subsets, compressed in ((b"\x00\x00\x05\x00\x2a", 1, False), (b"\x00\x00\x06\x00\x2a\x00", 2, True)):
+            section4 = decode_section4(ReadableBuffer(data), descriptors, n_subsets, compressed, plan)
+            self.assertEqual(len(section4.subsets), n_subsets)
+            for subset in section4.subsets:
+                values = subset.values
+                for _ in range(depth):
+                    (replication,) = values
+                    (values,) = replication
+                self.assertEqual([v.value for v in values], [42])
@@ -1,6 +1,6 @@
 import unittest
 import bufrpy
-from .util import read_file, read_file_all, read_file_debug, flatten_descriptors
+from .util import read_file, read_file_all, read_file_debug, read_file_buffer, read_file_mmap, read_file_all_buffer, read_file_lazy, read_table, flatten_descriptors
 
 class TestReadBufr(unittest.TestCase):
     def test_sequence(self):
@@ -31,6 +31,15 @@ class TestReadBufr(unittest.TestCase):
         # Has operators 1, 2 and 4
         msg = read_file("data/bt/B0000000000098013001.TXT", "data/bt/D0000000000098013001.TXT", "data/associated.bufr")
 
+    def test_interned_descriptors(self):
+        # Associated fields and overlays of changed reference values share descriptors
+        for path in ("data/associated.bufr", "data/change_refval.bufr", "data/change_refval_compressed.bufr"):
+            msg = read_file("data/bt/B0000000000098013001.TXT", "data/bt/D0000000000098013001.TXT", path)
+            descriptors = {}
+            for subset in msg.section4.subsets:
+                for value in _flatten(subset.values):
+                    self.assertIs(descriptors.setdefault(value.descriptor, value.descriptor), value.descriptor)
+
     def test_change_refval(self):
         # Has operators 1 and 3
         msg = read_file("data/bt/B0000000000098013001.TXT", "data/bt/D0000000000098013001.TXT", "data/change_refval.bufr")
@@ -63,6 +72,41 @@ class TestReadBufr(unittest.TestCase):
         assert len(msgs) == 10
         assert len(errors) == 0
 
+    def test_IOZX11_buffer(self):
+        msgs1, errors1 = read_file_all("data/bt/B0000000000098013001.TXT", "data/bt/D0000000000098013001.TXT", "data/IOZX11_LFVW_060300.bufr")
+        msgs2, errors2 = read_file_all_buffer("data/bt/B0000000000098013001.TXT", "data/bt/D0000000000098013001.TXT", "data/IOZX11_LFVW_060300.bufr")
+        assert len(errors2) == 0
+        assert msgs1 == msgs2
+
+    def test_buffers(self):
+        msg = read_file("data/bt/B0000000000098013001.TXT", "data/bt/D0000000000098013001.TXT", "data/tempLow_200707271955.bufr")
+        for buffer_type in (bytes, bytearray, memoryview):
+            assert msg == read_file_buffer("data/bt/B0000000000098013001.TXT", "data/bt/D0000000000098013001.TXT", "data/tempLow_200707271955.bufr", buffer_type)
+        assert msg == read_file_mmap("data/bt/B0000000000098013001.TXT", "data/bt/D0000000000098013001.TXT", "data/tempLow_200707271955.bufr")
+
+    def test_lazy(self):
+        for bufr_file in ("data/tempLow_200707271955.bufr", "data/3xBUFRSYNOP-com.bufr", "data/delayed_repetition_compressed.bufr"):
+            msg = read_file("data/bt/B0000000000098013001.TXT", "data/bt/D0000000000098013001.TXT", bufr_file)
+            # The memory map is closed before Section 4 is decoded
+            lazy = read_file_lazy("data/bt/B0000000000098013001.TXT", "data/bt/D0000000000098013001.TXT", bufr_file)
+            assert lazy.section3 == msg.section3
+            raw = lazy[4]
+            assert isinstance(raw, bufrpy.LazySection4)
+            assert not raw.decoded
+            assert raw.length == msg.section4.length
+            assert lazy.section4 == msg.section4
+            assert raw.decoded
+            assert lazy.section4 is lazy.section4
+            assert lazy == msg
+
+    def test_lazy_all(self):
+        msgs1, errors1 = read_file_all("data/bt/B0000000000098013001.TXT", "data/bt/D0000000000098013001.TXT", "data/IOZX11_LFVW_060300.bufr")
+        with open("data/IOZX11_LFVW_060300.bufr", 'rb') as f:
+            msgs2, errors2 = bufrpy.decode_all(f.read(), read_table(), lazy=True)
+        assert len(errors2) == 0
+        assert not any(msg[4].decoded for msg in msgs2)
+        assert msgs1 == msgs2
+
 def _check_equal(msg1, msg2):
     """
     Equality check that should match between compressed and uncompressed versions of a message.
@@ -76,3 +120,11 @@ def _check_equal(msg1, msg2):
     assert msg1.section3.descriptors == msg2.section3.descriptors
     assert msg1.section4.subsets == msg2.section4.subsets
     assert msg1.section5 == msg2.section5
+
+def _flatten(values):
+    for value in values:
+        if isinstance(value, list):
+            for v in _flatten(value):
+                yield v
+        else:
+            yield value
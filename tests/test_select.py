@@ -0,0 +1,108 @@
+import unittest
+import bufrpy
+from bufrpy.plan import compile_selection, compile_plan, ELEMENT, REPLICATE, DELAYED_REPLICATE
+from bufrpy.util import fxy2int, int2fxy
+from .util import read_table, FILES, IOZX11, flatten_values
+
+ASSOCIATED = fxy2int("999999")
+
+def _project(values, codes):
+    # Values of selected elements, with the associated fields of the selected elements
+    values = list(flatten_values(values))
+    result = []
+    for i, value in enumerate(values):
+        if value.descriptor.code in codes:
+            result.append(value)
+        elif value.descriptor.code == ASSOCIATED and i+1 < len(values) and values[i+1].descriptor.code in codes:
+            result.append(value)
+    return result
+
+def _element_codes(msg):
+    codes = []
+    for subset in msg.section4.subsets:
+        for value in flatten_values(subset.values):
+            if value.descriptor.code != ASSOCIATED and value.descriptor.code not in codes:
+                codes.append(value.descriptor.code)
+    return codes
+
+class TestSelect(unittest.TestCase):
+    def setUp(self):
+        self.table = read_table()
+
+    def _read(self, path, **kwargs):
+        with open(path, 'rb') as f:
+            return bufrpy.decode_all(f.read(), self.table, **kwargs)[0]
+
+    def test_projection(self):
+        for path in FILES + [IOZX11]:
+            with open(path, 'rb') as f:
+                data = f.read()
+            for frame in bufrpy.framing.scan_buffer(data):
+                message = data[frame.offset:frame.offset+frame.length]
+                full = bufrpy.decode(message, self.table)
+                codes = _element_codes(full)
+                for selection in (codes[::2], codes[1::2], codes[-1:]):
+                    msg = bufrpy.decode(message, self.table, select=selection)
+                    self.assertEqual(len(msg.section4.subsets), len(full.section4.subsets))
+                    for subset, full_subset in zip(msg.section4.subsets, full.section4.subsets):
+                        self.assertEqual(list(flatten_values(subset.values)), _project(full_subset.values, set(selection)), path)
+
+    def test_fxy(self):
+        with open("data/3xBUFRSYNOP-com.bufr", 'rb') as f:
+            data = f.read()
+        msg1 = bufrpy.decode(data, self.table)
+        codes = _element_codes(msg1)[2:4]
+        msg2 = bufrpy.decode(data, self.table, select=[int2fxy(codes[0]), codes[1]])
+        self.assertEqual(msg1.section0, msg2.section0)
+        self.assertEqual(msg1.section3, msg2.section3)
+        for subset in msg2.section4.subsets:
+            self.assertEqual(set(v.descriptor.code for v in subset.values), set(codes))
+
+    def test_empty(self):
+        msgs = self._read("data/IOZX11_LFVW_060300.bufr", select=[])
+        self.assertEqual(len(msgs), 10)
+        for msg in msgs:
+            for subset in msg.section4.subsets:
+                self.assertEqual(subset.values, [])
+
+    def test_replication_structure(self):
+        for path in ("data/delayed_repetition.bufr", "data/delayed_repetition_compressed.bufr"):
+            full = self._read(path)[0]
+            code = full.section4.subsets[0].values[0][0][0].descriptor.code
+            msg = self._read(path, select=[code])[0]
+            for subset in msg.section4.subsets:
+                self.assertEqual(len(subset.values), 1)
+                self.assertEqual(len(subset.values[0]), 3)
+                for vs in subset.values[0]:
+                    self.assertEqual([v.descriptor.code for v in vs], [code])
+
+    def test_lazy(self):
+        for path in ("data/3xBUFRSYNOP-com.bufr", "data/tempLow_200707271955.bufr"):
+            codes = _element_codes(self._read(path)[0])[::3]
+            self.assertEqual(self._read(path, select=codes), self._read(path, select=codes, lazy=True))
+
+    def test_columnar(self):
+        for path in ("data/tempLow_200707271955.bufr", "data/3xBUFRSYNOP-com.bufr", "data/delayed_repetition_compressed.bufr"):
+            full = self._read(path, columnar=True)[0].section4
+            codes = set(column.descriptor.code for column in full.columns[::2])
+            msg = self._read(path, columnar=True, select=codes)[0].section4
+            full_columns = dict(((column.position, column.descriptor.code), column) for column in full.columns)
+            for column in msg.columns:
+                self.assertEqual(list(column.values), list(full_columns[(column.position, column.descriptor.code)].values))
+            # Counts of delayed replications may be included as well
+            self.assertEqual([column.position for column in msg.columns if column.descriptor.code in codes],
+                             [column.position for column in full.columns if column.descriptor.code in codes])
+
+class TestCompileSelection(unittest.TestCase):
+    def test_replications(self):
+        table = read_table()
+        codes = ["001001", "102002", "012004", "010004", "101000", "031001", "020001", "012004"]
+        plan = compile_plan(table[fxy2int(code)] for code in codes)
+        kinds = [instruction[0] for instruction in plan.instructions]
+        self.assertEqual(kinds, [ELEMENT, REPLICATE, ELEMENT, ELEMENT, DELAYED_REPLICATE, ELEMENT, ELEMENT])
+        self.assertEqual(compile_selection(plan, ["010004"]), (False, True, False, True, False, False, False))
+        self.assertEqual(compile_selection(plan, [fxy2int("001001")]), (True, False, False, False, False, False, False))
+        self.assertEqual(compile_selection(plan, ["031001"]), (False, False, False, False, True, False, False))
+        self.assertEqual(compile_selection(plan, ["020001"]), (False, False, False, False, True, True, False))
+        self.assertEqual(compile_selection(plan, ["012004"]), (False, True, True, False, False, False, True))
+        self.assertEqual(compile_selection(plan, []), (False,) * len(plan.instructions))
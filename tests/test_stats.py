@@ -0,0 +1,108 @@
+import unittest
+import bufrpy
+from bufrpy import DecodeStats
+from bufrpy.stats import N_SECTIONS
+from bufrpy.util import fxy2int, int2fxy
+from .util import read_table, flatten_values
+
+class TestDecodeStats(unittest.TestCase):
+    def setUp(self):
+        self.table = read_table()
+
+    def _read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_sections(self):
+        stats = DecodeStats()
+        msgs, errors = bufrpy.decode_all(self._read("data/IOZX11_LFVW_060300.bufr"), self.table, stats=stats)
+        self.assertEqual(stats.messages, len(msgs))
+        self.assertEqual(len(stats.times), N_SECTIONS)
+        self.assertTrue(all(t >= 0 for t in stats.times))
+        self.assertTrue(stats.times[4] > 0)
+        # Section 4 is read up to its padding to an even number of octets
+        data_bits = sum((msg.section4.length - 4) * 8 for msg in msgs)
+        self.assertTrue(data_bits - 16 * len(msgs) < stats.bits <= data_bits)
+
+        values = [value.descriptor.code for msg in msgs for subset in msg.section4.subsets for value in flatten_values(subset.values)]
+        self.assertEqual(sum(stats.values.values()), len(values))
+        for code in set(values):
+            self.assertEqual(stats.values[code], values.count(code))
+
+    def test_outputs(self):
+        # Values are counted the same way from all forms of Section 4
+        data = self._read("data/207003.bufr")
+        stats = DecodeStats()
+        bufrpy.decode(data, self.table, stats=stats)
+        compact = DecodeStats()
+        bufrpy.decode(data, self.table, compact=True, stats=compact)
+        self.assertEqual(compact.values, stats.values)
+        columnar = DecodeStats()
+        bufrpy.decode(data, self.table, columnar=True, stats=columnar)
+        # Columns also hold the counts of delayed replications
+        counts = columnar.values - stats.values
+        self.assertTrue(counts)
+        self.assertTrue(all(int2fxy(code).startswith("031") for code in counts))
+        self.assertEqual(columnar.values - counts, stats.values)
+        self.assertEqual((compact.bits, columnar.bits), (stats.bits, stats.bits))
+
+    def test_replications(self):
+        stats = DecodeStats()
+        msg = bufrpy.decode(self._read("data/tempLow_200707271955.bufr"), self.table, stats=stats)
+        counts = [len(value) for value in msg.section4.subsets[0].values if isinstance(value, list)]
+        self.assertEqual(sum(stats.replications.values()), len(counts))
+        for count in counts:
+            self.assertTrue(stats.replications[count] > 0)
+
+        # Repetitions are counted by the number of times they are repeated
+        for path in ("data/delayed_repetition.bufr", "data/delayed_repetition_compressed.bufr"):
+            stats = DecodeStats()
+            msg = bufrpy.decode(self._read(path), self.table, stats=stats)
+            repeated = [len(value) for value in msg.section4.subsets[0].values if isinstance(value, list)]
+            self.assertEqual(list(stats.replications.elements()), repeated)
+
+    def test_operators(self):
+        for path in ("data/207003.bufr", "data/207003_compressed.bufr"):
+            stats = DecodeStats()
+            bufrpy.decode(self._read(path), self.table, stats=stats)
+            self.assertTrue(stats.operators[7] > 0, path)
+        stats = DecodeStats()
+        bufrpy.decode(self._read("data/associated.bufr"), self.table, stats=stats)
+        self.assertTrue(stats.operators[4] > 0)
+        self.assertTrue(stats.values[fxy2int("999999")] > 0)
+
+    def test_interval(self):
+        data = self._read("data/IOZX11_LFVW_060300.bufr")
+        profiled = []
+        stats = DecodeStats(interval=3, callback=profiled.append)
+        msgs, errors = bufrpy.decode_all(data, self.table, stats=stats)
+        self.assertEqual(stats.messages, (len(msgs) + 2) // 3)
+        self.assertEqual(len(profiled), stats.messages)
+        self.assertTrue(all(p.messages == 1 for p in profiled))
+        self.assertEqual(sum(p.bits for p in profiled), stats.bits)
+
+        stats.clear()
+        self.assertEqual((stats.messages, stats.bits, stats.times), (0, 0, [0.0] * N_SECTIONS))
+        self.assertEqual(len(stats.values), 0)
+        # Profiling does not change the results
+        self.assertEqual(bufrpy.decode_all(data, self.table, stats=DecodeStats())[0], msgs)
+
+    def test_lazy(self):
+        stats = DecodeStats()
+        msg = bufrpy.decode(self._read("data/207003.bufr"), self.table, lazy=True, stats=stats)
+        self.assertEqual((stats.messages, stats.bits, len(stats.values)), (1, 0, 0))
+        self.assertTrue(msg.section4.subsets)
+
+        stats = DecodeStats()
+        msg = bufrpy.decode(self._read("data/207003.bufr"), self.table, skip_data=True, stats=stats)
+        self.assertEqual((stats.messages, stats.bits, len(stats.values)), (1, 0, 0))
+
+    def test_errors(self):
+        # Messages that fail to decode are profiled up to the error
+        data = bytearray(self._read("data/207003.bufr"))
+        data[-4:] = b'7776'
+        stats = DecodeStats()
+        self.assertRaises(ValueError, bufrpy.decode, bytes(data), self.table, stats=stats)
+        self.assertEqual(stats.messages, 1)
+        self.assertTrue(stats.bits > 0)
+        self.assertEqual(len(stats.values), 0)
@@ -0,0 +1,98 @@
+import unittest
+import marshal
+import os
+import shutil
+import tempfile
+import zlib
+from bufrpy.table import cache
+from bufrpy.util import fxy2int
+from .util import read_table, B_TABLE, D_TABLE
+
+def _contents(table):
+    return dict((code, (type(d), d.strong())) for code, d in table.table.items() if _resolvable(d))
+
+def _resolvable(descriptor):
+    try:
+        descriptor.strong()
+        return True
+    except KeyError:
+        return False
+
+class TestTableCache(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.dir, "cache")
+        self.b_table = os.path.join(self.dir, "B.TXT")
+        self.d_table = os.path.join(self.dir, "D.TXT")
+        shutil.copy(B_TABLE, self.b_table)
+        shutil.copy(D_TABLE, self.d_table)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def read(self):
+        return cache.read_tables_cached(self.b_table, self.d_table, self.cache_dir)
+
+    def entry(self):
+        entries = os.listdir(self.cache_dir)
+        assert len(entries) == 1
+        return os.path.join(self.cache_dir, entries[0])
+
+    def test_same_as_parsed(self):
+        expected = _contents(read_table())
+        table1 = self.read()
+        table2 = self.read()
+        assert len(table2.table) == len(table1.table) == len(read_table().table)
+        assert _contents(table1) == expected
+        assert _contents(table2) == expected
+
+    def test_touched(self):
+        self.read()
+        os.utime(self.b_table, (0, 0))
+        assert _contents(self.read()) == _contents(read_table())
+
+    def test_stale(self):
+        self.read()
+        with open(self.b_table, 'rb') as f:
+            lines = f.read().splitlines(True)
+        # Drop the first element descriptor
+        with open(self.b_table, 'wb') as f:
+            f.writelines(lines[1:])
+        os.utime(self.b_table, (0, 0))
+        code = fxy2int(lines[0][1:7].decode('ascii'))
+        assert read_table().table.get(code) is not None
+        assert self.read().table.get(code) is None
+
+    def test_corrupt(self):
+        self.read()
+        with open(self.entry(), 'r+b') as f:
+            f.seek(100)
+            f.write(b'garbage')
+        assert _contents(self.read()) == _contents(read_table())
+        with open(self.entry(), 'wb') as f:
+            f.write(b'BUFR')
+        assert _contents(self.read()) == _contents(read_table())
+        assert cache._load(open(self.entry(), 'rb').read()) is not None
+
+    def test_malformed(self):
+        self.read()
+        with open(self.entry(), 'rb') as f:
+            infos, rows = cache._load(f.read())
+        # Valid checksum and format, but rows that do not make descriptors
+        for bad in [((cache._ELEMENT, (1,)),), ((cache._SEQUENCE, (1, 2)),), (None,)]:
+            payload = marshal.dumps((cache.FORMAT_VERSION, infos, bad))
+            with open(self.entry(), 'wb') as f:
+                f.write(cache.MAGIC + zlib.crc32(payload).to_bytes(4, 'big') + payload)
+            assert _contents(self.read()) == _contents(read_table())
+            with open(self.entry(), 'rb') as f:
+                assert cache._load(f.read())[1] == rows
+
+    def test_unwritable(self):
+        with open(self.cache_dir, 'wb'):
+            pass
+        assert _contents(self.read()) == _contents(read_table())
+
+    def test_clear(self):
+        self.read()
+        cache.clear_cache(self.cache_dir)
+        assert os.listdir(self.cache_dir) == []
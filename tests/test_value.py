@@ -0,0 +1,56 @@
+import unittest
+from bufrpy import value
+from bufrpy.value import converter, TEXT, INT, FLOAT
+from bufrpy.descriptors import ElementDescriptor, ChangeDataWidth, ChangeScale, IncreaseSrw, ChangeTextWidth, OpCode
+
+TEMPERATURE = ElementDescriptor(12004, 12, 1, 0, "DRY BULB TEMPERATURE AT 2M", "K")
+PRESSURE = ElementDescriptor(10004, 14, -1, 0, "PRESSURE", "PA")
+CODE = ElementDescriptor(20003, 9, 0, 0, "PRESENT WEATHER", "CODE TABLE 20003")
+TEXTUAL = ElementDescriptor(1015, 160, 0, 0, "STATION OR SITE NAME", "CCITTIA5")
+
+class TestConverter(unittest.TestCase):
+    def test_numeric(self):
+        conv = converter(TEMPERATURE)
+        self.assertEqual((conv.width, conv.missing, conv.factor, conv.ref, conv.kind), (12, 4095, 10**-1, 0, FLOAT))
+        self.assertEqual(conv(2731), value.BufrValue(2731, 10**-1 * 2731, TEMPERATURE))
+        self.assertEqual(conv(4095).value, None)
+
+        conv = converter(PRESSURE)
+        self.assertEqual(conv.kind, INT)
+        self.assertEqual(conv(10132).value, 101320)
+
+    def test_text(self):
+        conv = converter(TEXTUAL)
+        self.assertEqual(conv.kind, TEXT)
+        self.assertEqual(conv(b"HELSINKI"), value.BufrValue(b"HELSINKI", "HELSINKI", TEXTUAL))
+        # Hex-encoded raw values of earlier versions are accepted
+        self.assertEqual(conv("48454c53494e4b49"), conv(b"HELSINKI"))
+        self.assertEqual(conv(b"HELSINKI").raw_hex, "48454c53494e4b49")
+        self.assertEqual(converter(TEMPERATURE)(2731).raw_hex, 2731)
+
+    def test_operators(self):
+        ops = {OpCode.CHANGE_DATA_WIDTH: ChangeDataWidth(130), OpCode.CHANGE_SCALE: ChangeScale(129)}
+        conv = converter(TEMPERATURE, ops)
+        self.assertEqual((conv.width, conv.factor), (14, 10**-2))
+        # Operators do not apply to code tables
+        self.assertEqual(converter(CODE, ops).width, 9)
+
+        conv = converter(TEMPERATURE, {OpCode.INCREASE_SRW: IncreaseSrw(1)})
+        self.assertEqual((conv.width, conv.factor, conv.ref), (12 + IncreaseSrw(1).bits(), 10**-(1 + IncreaseSrw(1).scale()), 0))
+        self.assertEqual(converter(TEXTUAL, {OpCode.CHANGE_CCITTIA5_WIDTH: ChangeTextWidth(16)}).width, 128)
+
+    def test_cache(self):
+        ops = {OpCode.CHANGE_DATA_WIDTH: ChangeDataWidth(130)}
+        self.assertIs(converter(TEMPERATURE), converter(TEMPERATURE, {}))
+        self.assertIs(converter(TEMPERATURE, ops), converter(TEMPERATURE, {OpCode.CHANGE_DATA_WIDTH: ChangeDataWidth(130)}))
+        self.assertIsNot(converter(TEMPERATURE, ops), converter(TEMPERATURE, {OpCode.CHANGE_DATA_WIDTH: ChangeDataWidth(131)}))
+
+    def test_cache_size(self):
+        size = value.CONVERTER_CACHE_SIZE
+        value.CONVERTER_CACHE_SIZE = 4
+        try:
+            for length in range(1, 20):
+                converter(ElementDescriptor(12004, length, 1, 0, "TEMPERATURE", "K"))
+                self.assertLessEqual(len(value._converters), 4)
+        finally:
+            value.CONVERTER_CACHE_SIZE = size
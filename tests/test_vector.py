@@ -0,0 +1,49 @@
+import unittest
+from bufrpy import vector
+from bufrpy.descriptors import intern_descriptor
+from bufrpy.util import fxy2int
+from bufrpy.value import converter
+from .util import read_file_all, B_TABLE, D_TABLE, flatten_values
+
+COMPRESSED_FILES = ["data/207003_compressed.bufr", "data/change_refval_compressed.bufr", "data/delayed_repetition_compressed.bufr", "data/3xBUFRSYNOP-com.bufr"]
+
+def _read(bufr_file, use_numpy):
+    saved = vector.use_numpy, vector.MIN_SUBSETS
+    try:
+        vector.use_numpy = use_numpy
+        vector.MIN_SUBSETS = 1
+        return read_file_all(B_TABLE, D_TABLE, bufr_file)
+    finally:
+        vector.use_numpy, vector.MIN_SUBSETS = saved
+
+@unittest.skipIf(vector.numpy is None, "NumPy not installed")
+class TestVector(unittest.TestCase):
+    def test_same_as_python(self):
+        for bufr_file in COMPRESSED_FILES:
+            msgs1, errors1 = _read(bufr_file, False)
+            msgs2, errors2 = _read(bufr_file, True)
+            assert len(msgs1) == 1
+            assert len(errors2) == 0
+            assert msgs1 == msgs2
+            for s1, s2 in zip(msgs1[0].section4.subsets, msgs2[0].section4.subsets):
+                assert [type(v.value) for v in flatten_values(s1.values)] == [type(v.value) for v in flatten_values(s2.values)]
+
+    def test_overflow(self):
+        # Integer values that could overflow 64 bits are decoded with Python integers
+        saved = vector.MIN_SUBSETS
+        try:
+            vector.MIN_SUBSETS = 1
+            wide = converter(intern_descriptor(fxy2int("001001"), 50, -5, 0, "WIDE", "NUMERIC"))
+            narrow = converter(intern_descriptor(fxy2int("001001"), 30, -5, 0, "NARROW", "NUMERIC"))
+            scaled = converter(intern_descriptor(fxy2int("001001"), 50, 5, 0, "SCALED", "NUMERIC"))
+            big_ref = converter(intern_descriptor(fxy2int("001001"), 8, 0, -(1 << 63), "REFERENCE", "NUMERIC"))
+            self.assertFalse(vector.applicable(wide, 8, 100))
+            self.assertTrue(vector.applicable(narrow, 8, 100))
+            self.assertTrue(vector.applicable(scaled, 8, 100))
+            self.assertFalse(vector.applicable(big_ref, 8, 100))
+        finally:
+            vector.MIN_SUBSETS = saved
+
+    def test_unpack_uints(self):
+        data = bytes(bytearray([0b10110011, 0b01011100, 0b11110000]))
+        assert vector.unpack_uints(data, 3, 5, 3).tolist() == [0b10011, 0b01011, 0b10011]
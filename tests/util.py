@@ -1,6 +1,20 @@
 import bufrpy
 from bufrpy.table import libbufr
 import codecs
+import mmap
+
+B_TABLE = "data/bt/B0000000000098013001.TXT"
+D_TABLE = "data/bt/D0000000000098013001.TXT"
+
+# Files with a single message decodable with B_TABLE and D_TABLE,
+# covering compression, operators, replications and repetitions
+FILES = ["data/tempLow_200707271955.bufr", "data/1xBUFRSYNOP-ed4.bufr", "data/3xBUFRSYNOP-com.bufr",
+         "data/207003.bufr", "data/207003_compressed.bufr", "data/208035.bufr", "data/associated.bufr",
+         "data/change_refval.bufr", "data/change_refval_compressed.bufr",
+         "data/delayed_repetition.bufr", "data/delayed_repetition_compressed.bufr"]
+
+# Bulletin of several messages, with a GTS header
+IOZX11 = "data/IOZX11_LFVW_060300.bufr"
 
 # handle reading of tables and read file using given function
 def _do_read(b_table_file, d_table_file, bufr_file, read_func):
@@ -21,6 +35,28 @@ def read_file_all(b_table_file, d_table_file, bufr_file):
     return _do_read(b_table_file, d_table_file, bufr_file,
                     lambda f, table: bufrpy.decode_all(bufrpy.util.ByteStream(f), table))
 
+def read_file_buffer(b_table_file, d_table_file, bufr_file, buffer_type=bytes):
+    return _do_read(b_table_file, d_table_file, bufr_file,
+                    lambda f, table: bufrpy.decode(buffer_type(f.read()), table))
+
+def read_file_mmap(b_table_file, d_table_file, bufr_file):
+    def read_mmap(f, table):
+        m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with m:
+            return bufrpy.decode(m, table)
+    return _do_read(b_table_file, d_table_file, bufr_file, read_mmap)
+
+def read_file_all_buffer(b_table_file, d_table_file, bufr_file):
+    return _do_read(b_table_file, d_table_file, bufr_file,
+                    lambda f, table: bufrpy.decode_all(f.read(), table))
+
+def read_file_lazy(b_table_file, d_table_file, bufr_file):
+    def read_mmap(f, table):
+        m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with m:
+            return bufrpy.decode(m, table, lazy=True)
+    return _do_read(b_table_file, d_table_file, bufr_file, read_mmap)
+
 def read_file_debug(b_table_file, d_table_file, bufr_file):
     return _do_read(b_table_file, d_table_file, bufr_file,
                     lambda f, table: bufrpy.decode(bufrpy.util.ByteStream(f), table, skip_data=True))
@@ -32,3 +68,16 @@ def flatten_descriptors(descriptors):
                 yield _d
         else:
             yield d
+
+def flatten_values(values):
+    for value in values:
+        if isinstance(value, list):
+            for v in flatten_values(value):
+                yield v
+        else:
+            yield value
+
+def read_table(b_table_file=B_TABLE, d_table_file=D_TABLE):
+    with codecs.open(b_table_file, 'rb', 'utf-8') as b_file:
+        with codecs.open(d_table_file, 'rb', 'utf-8') as d_file:
+            return libbufr.read_tables(b_file, d_file)